@@ -1,16 +1,20 @@
-from flask import Flask, render_template, request, jsonify, send_file
+import time
+# referencia para medir el tiempo de arranque hasta que el modelo está listo
+APP_START = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, send_file, g, Response
 import os
-import joblib
 import pandas as pd
 import numpy as np
-import sqlite3
 import json
-from datetime import datetime
-from database import Database
+import uuid
+from datetime import datetime, timedelta, timezone
+from database import Database, PREDICTION_CLASSES
 
 # === added: create Flask app and upload folder early ===
 app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config.setdefault('UPLOAD_FOLDER', os.path.join(os.getcwd(), 'uploads'))
+app.config.setdefault('BATCH_CHUNK_SIZE', int(os.environ.get('BATCH_CHUNK_SIZE', 50_000)))
 
 import preprocessing  # Asegúrate de que preprocessing.py esté en el mismo directorio o en el path
 
@@ -23,12 +27,168 @@ try:
 except AttributeError:
     raise ImportError("No se encontró la clase RidePreprocessor en preprocessing.py")
 
-# Cargar el modelo
-MODEL_PATH = os.path.join('models', 'booking_status_rf_model.joblib')
-model = joblib.load(MODEL_PATH)
-
-# Inicializar base de datos
-db = Database()
+from batch import score_stream, DEFAULT_CHUNKSIZE
+from formats import detect_format, normalize_format, extension, mimetype_for, FORMATS
+from jobs import JobManager
+from sharded import ShardedScorer
+from model_registry import ModelRegistry, ModelNotReady
+from coalescer import RequestCoalescer, CoalescerTimeout
+from prediction_cache import PredictionCache
+from metrics import (StageTimer, registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE,
+                     REQUESTS, REQUEST_SECONDS, IN_FLIGHT, ROWS_SCORED, ROWS_REJECTED, record_stages, record_batch)
+from validation import InputValidator, ValidationError
+from bulk import (NDJSON_MIMETYPES, ENCODINGS, DTYPES, PayloadTooLarge, read_body, frame_from_columns,
+                  frame_from_ndjson, encode_probabilities, gzip_body)
+
+# formato del artefacto del modelo: joblib (pipeline sklearn) | compiled
+MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'joblib')
+# segundos que una petición espera a que termine la carga inicial antes de responder 503
+MODEL_READY_TIMEOUT = float(os.environ.get('MODEL_READY_TIMEOUT', 30))
+# micro-batching de /predict: PREDICT_COALESCE=1 agrupa peticiones concurrentes
+PREDICT_COALESCE = os.environ.get('PREDICT_COALESCE', '0') == '1'
+# caché de /predict (LRU + TTL), invalidada cuando cambia la versión del modelo servido
+PREDICT_CACHE = os.environ.get('PREDICT_CACHE', '1') == '1'
+PREDICT_CACHE_PERSIST_HITS = os.environ.get('PREDICT_CACHE_PERSIST_HITS', '1') == '1'
+# scoring por lotes repartido en SCORING_WORKERS procesos (1 = en el proceso actual)
+SCORING_WORKERS = int(os.environ.get('SCORING_WORKERS', 1))
+# arranque de los pools de procesos: forkserver (por defecto donde existe) | spawn | fork.
+# fork copia el modelo sin recargarlo, pero este proceso tiene hilos y el hijo puede bloquearse
+MP_START_METHOD = os.environ.get('MP_START_METHOD') or None
+# versión -> motor de lotes; se reemplaza en cada cambio de modelo
+_batch_engines = {}
+# Validación de la entrada contra el vocabulario del modelo: strict rechaza
+# categorías desconocidas, lenient las deja pasar, off desactiva la validación
+INPUT_VALIDATION = os.environ.get('INPUT_VALIDATION', 'strict')
+if INPUT_VALIDATION not in ('strict', 'lenient', 'off'):
+    raise ValueError(f"INPUT_VALIDATION debe ser strict, lenient u off, recibido: {INPUT_VALIDATION}")
+# versión -> InputValidator
+_validators = {}
+# /predict_bulk: máximo de filas por petición y de bytes del cuerpo ya descomprimido
+BULK_MAX_ROWS = int(os.environ.get('BULK_MAX_ROWS', 100_000))
+BULK_MAX_BYTES = int(os.environ.get('BULK_MAX_BYTES', 256 * 1024 * 1024))
+# ?explain=N: máximo de características por explicación local
+EXPLAIN_MAX_FEATURES = int(os.environ.get('EXPLAIN_MAX_FEATURES', 20))
+# versión -> importancias globales ordenadas (las sirve /feature_importance)
+_importances = {}
+
+# Componentes con estado (los crea create_app): registro del modelo, micro-batching,
+# caché, base de datos y cola de trabajos por lotes
+registry = None
+coalescer = None
+prediction_cache = None
+db = None
+jobs = None
+
+
+def _on_model_swap(previous, handle):
+    if coalescer is not None:
+        coalescer.engine = handle.engine
+    if SCORING_WORKERS > 1:
+        _batch_engines[handle.version] = ShardedScorer(handle.path, SCORING_WORKERS, engine=handle.engine,
+                                                       start_method=MP_START_METHOD)
+    if INPUT_VALIDATION != 'off':
+        _validators[handle.version] = InputValidator.from_pipeline(
+            handle.pipeline, unknown_categories='reject' if INPUT_VALIDATION == 'strict' else 'allow')
+    jobs.set_model(handle.path, handle.engine, handle.version, validator=_validators.get(handle.version))
+    if previous is not None and previous.version != handle.version:
+        _validators.pop(previous.version, None)
+        _importances.pop(previous.version, None)
+        old = _batch_engines.pop(previous.version, None)
+        if old is not None:
+            old.shutdown()
+
+
+def batch_engine_for(handle):
+    return _batch_engines.get(handle.version, handle.engine)
+
+
+def validator_for(handle):
+    return _validators.get(handle.version)
+
+
+def create_app():
+    """Crea los componentes con estado y arranca la carga del modelo (una sola vez)."""
+    global registry, coalescer, prediction_cache, db, jobs
+    if registry is not None:
+        return app
+    # Registro del modelo: carga en segundo plano (MODEL_LOAD=background|lazy|eager),
+    # warmup con example_batch.csv y recarga en caliente cuando aparece en models/
+    # una versión nueva (<base>-<versión>.joblib). MODEL_FORMAT=compiled usa el
+    # bosque aplanado por compiled_forest.py (arrays mapeados en memoria).
+    registry = ModelRegistry(
+        models_dir=os.environ.get('MODEL_DIR', 'models'),
+        base_name=os.environ.get('MODEL_NAME', 'booking_status_rf_model'),
+        model_format=MODEL_FORMAT,
+        warmup_path=os.environ.get('MODEL_WARMUP_PATH', 'example_batch.csv'),
+        poll_interval=float(os.environ.get('MODEL_WATCH_INTERVAL', 5)),
+        started_at=APP_START,
+    )
+    if PREDICT_COALESCE:
+        coalescer = RequestCoalescer(
+            None,
+            max_wait_ms=float(os.environ.get('PREDICT_COALESCE_MAX_WAIT_MS', 5)),
+            max_batch_size=int(os.environ.get('PREDICT_COALESCE_MAX_BATCH', 64)),
+            # espera máxima de una petición agrupada antes de responder 503
+            timeout_ms=float(os.environ.get('PREDICT_COALESCE_TIMEOUT_MS', 5000)),
+        )
+    # caché de /predict (LRU + TTL), invalidada cuando cambia la versión del modelo servido
+    if PREDICT_CACHE:
+        round_digits = os.environ.get('PREDICT_CACHE_ROUND_DIGITS')
+        prediction_cache = PredictionCache(
+            max_entries=int(os.environ.get('PREDICT_CACHE_MAX_ENTRIES', 10_000)),
+            max_bytes=int(os.environ.get('PREDICT_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+            ttl_seconds=float(os.environ.get('PREDICT_CACHE_TTL', 300)),
+            round_digits=int(round_digits) if round_digits else None,
+            version_fn=lambda: registry.version,
+        )
+
+    # Inicializar base de datos (WAL + synchronous configurable para escrituras masivas)
+    db = Database(
+        synchronous=os.environ.get('DB_SYNCHRONOUS', 'NORMAL'),
+        bulk_chunk_size=int(os.environ.get('DB_BULK_CHUNK_SIZE', 5000)),
+        rollups=os.environ.get('DB_ROLLUPS', '1') == '1'
+    )
+
+    # Cola de trabajos por lotes (pool de procesos local + tabla batch_jobs); el
+    # modelo se fija al activarse cada versión
+    jobs = JobManager(db, max_workers=int(os.environ.get('BATCH_JOB_WORKERS', 2)),
+                      scoring_workers=SCORING_WORKERS, start_method=MP_START_METHOD)
+
+    registry.add_listener(_on_model_swap)
+    registry.start(os.environ.get('MODEL_LOAD', 'background'))
+    return app
+
+
+# Instrumentación: METRICS_ENABLED=0 desactiva /metrics y el registro por petición;
+# PROFILE_HEADER (vacío = desactivado) devuelve el desglose por etapa de esa petición
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+PROFILE_HEADER = os.environ.get('PROFILE_HEADER', 'X-Profile')
+
+model_ready_gauge = metrics_registry.gauge('ride_model_ready', "1 si hay un modelo cargado y calentado")
+model_info_gauge = metrics_registry.gauge('ride_model_info', "Versión del modelo servido", ('version',))
+startup_gauge = metrics_registry.gauge('ride_model_startup_to_ready_seconds', "Arranque hasta modelo listo")
+cache_gauge = metrics_registry.gauge('ride_prediction_cache', "Contadores de la caché de /predict", ('stat',))
+coalescer_gauge = metrics_registry.gauge('ride_coalescer', "Micro-batching de /predict", ('stat',))
+
+
+def _collect_component_metrics():
+    info = registry.stats()
+    model_ready_gauge.set(int(info['ready']))
+    if info['ready']:
+        model_info_gauge.clear()
+        model_info_gauge.set(1, version=info['version'])
+    if info['startup_to_ready_seconds'] is not None:
+        startup_gauge.set(info['startup_to_ready_seconds'])
+    if prediction_cache is not None:
+        for stat, value in prediction_cache.stats().items():
+            if isinstance(value, (int, float)):
+                cache_gauge.set(value, stat=stat)
+    if coalescer is not None:
+        for stat, value in coalescer.stats().items():
+            coalescer_gauge.set(value, stat=stat)
+
+
+metrics_registry.add_collector(_collect_component_metrics)
 
 # Categorías para los selectores
 VEHICLE_TYPES = ['Auto', 'eBike', 'Go Sedan', 'Prime Sedan', 'Prime SUV']
@@ -38,87 +198,46 @@ PAYMENT_METHODS = ['Cash', 'Credit Card', 'Debit Card', 'UPI', 'Wallet']
 DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 
           'July', 'August', 'September', 'October', 'November', 'December']
-
-# --- added: helper para crear features que espera el pipeline ---
-def prepare_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    # asegurar tipos
-    if 'date' in df.columns:
-        df['date'] = pd.to_datetime(df['date'], errors='coerce')
-        df['day_of_week'] = df['date'].dt.day_name()
-        df['is_weekend'] = (df['date'].dt.dayofweek >= 5).astype(int)
-        df['month'] = df['date'].dt.month
-    if 'time' in df.columns:
-        # intento 1: formato HH:MM (rápido y consistente)
-        df['time'] = pd.to_datetime(df['time'], format='%H:%M', errors='coerce')
-        # si todo salió NaT, intentar inferencia (fallback)
-        if df['time'].isna().all():
-            df['time'] = pd.to_datetime(df['time'].astype(str), errors='coerce')
-        df['hour'] = df['time'].dt.hour.fillna(0).astype(int)
-    if 'day' not in df.columns and 'day_of_week' in df.columns:
-        df['day'] = df['day_of_week']
-
-    # --- added: garantizar columnas que el pipeline espera (rellenar con NaN/0) ---
-    expected_cols = [
-        'avg_vtat', 'avg_ctat', 'booking_value', 'ride_distance',
-        'driver_ratings', 'customer_rating',
-        'month', 'day_of_week', 'is_weekend', 'hour'
-    ]
-    for c in expected_cols:
-        if c not in df.columns:
-            df[c] = np.nan
-
-    return df
-
-# helper: persist batch to DB (tries Database API, else sqlite fallback)
-def _save_batch_results(df_results: pd.DataFrame, filename: str, report: dict):
-    """Guarda predicciones en detailed_predictions solamente."""
-    try:
-        db_path = os.path.join(os.getcwd(), "predictions.db")
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-
-        # Crear tabla si no existe
-        table_name = "detailed_predictions"
-        cur.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT,
-                created_at TEXT
-            )
-        """)
-
-        # Añadir columnas faltantes
-        cur.execute(f"PRAGMA table_info({table_name})")
-        existing_cols = {row[1] for row in cur.fetchall()}
-        
-        for col in df_results.columns:
-            safe_col = col.replace(" ", "_").replace("-", "_")
-            if safe_col not in existing_cols:
-                cur.execute(f'ALTER TABLE {table_name} ADD COLUMN "{safe_col}" TEXT')
-
-        # Insertar registros
-        now = datetime.utcnow().isoformat()
-        cols = [c.replace(" ", "_").replace("-", "_") for c in df_results.columns]
-        placeholders = ", ".join(["?"] * (2 + len(cols)))
-        col_quoted = ", ".join([f'"{c}"' for c in cols])
-        
-        insert_sql = f'INSERT INTO {table_name} (filename, created_at, {col_quoted}) VALUES ({placeholders})'
-        
-        rows = []
-        for _, r in df_results.iterrows():
-            vals = [filename, now] + [str(r.get(c, "")) for c in df_results.columns]
-            rows.append(vals)
-        
-        cur.executemany(insert_sql, rows)
-        conn.commit()
-        print(f"Saved {len(rows)} predictions to database")
-        
-        return True
-
-    except Exception as e:
-        print(f"Error saving to database: {e}")
-        return False
+HISTORY_PAGE_SIZE = 50
+
+def _endpoint():
+    return request.endpoint or 'unknown'
+
+@app.before_request
+def _start_request_metrics():
+    g.timer = StageTimer()
+    g.started = time.perf_counter()
+    if METRICS_ENABLED:
+        IN_FLIGHT.inc(endpoint=_endpoint())
+
+@app.after_request
+def _finish_request_metrics(response):
+    elapsed = time.perf_counter() - g.started
+    if METRICS_ENABLED:
+        endpoint = _endpoint()
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        record_stages(endpoint, g.timer.stages)
+    if PROFILE_HEADER and request.headers.get(PROFILE_HEADER) == '1':
+        profile = {stage: seconds * 1000 for stage, seconds in g.timer.stages.items()}
+        profile['total'] = elapsed * 1000
+        response.headers['Server-Timing'] = ', '.join(f"{k};dur={v:.3f}" for k, v in profile.items())
+        body = response.get_json(silent=True) if response.is_json else None
+        if isinstance(body, dict):
+            body['profile_ms'] = profile
+            response.set_data(json.dumps(body))
+    return response
+
+@app.teardown_request
+def _end_request_metrics(exc):
+    if METRICS_ENABLED and 'started' in g:
+        IN_FLIGHT.dec(endpoint=_endpoint())
+
+@app.route('/metrics')
+def metrics():
+    if not METRICS_ENABLED:
+        return jsonify({'error': 'metrics disabled'}), 404
+    return Response(metrics_registry.render(), mimetype=METRICS_CONTENT_TYPE)
 
 @app.route('/')
 def index():
@@ -129,53 +248,255 @@ def index():
                          days=DAYS,
                          months=MONTHS)
 
+def _score_single(df, handle, explain=0):
+    """Predicción de la fila de /predict con el modelo de ``handle``: (etiqueta, {clase: probabilidad}, explicación)."""
+    # Realizar predicción (prepare_features + transform + predict_proba una sola vez),
+    # agrupada con otras peticiones concurrentes si el coalescer está activo
+    if coalescer is not None and not explain:
+        result = coalescer.predict_with_proba(df, engine=handle.engine)
+    else:
+        result = handle.engine.predict_with_proba(df, explain=explain)
+    g.timer.add_inference(result.timings)
+    prediction = str(result.labels[0])
+    prob_dict = {str(cls): float(prob) for cls, prob in zip(handle.engine.classes, result.probabilities[0])}
+    explanation = handle.engine.explainer.describe(result.explanation)[0] if explain else None
+    return prediction, prob_dict, explanation
+
+def _explain_option(args):
+    """``?explain=N``: número de características por explicación (0 = sin explicación)."""
+    top_k = args.get('explain', '0')
+    if not top_k.isdigit() or int(top_k) > EXPLAIN_MAX_FEATURES:
+        raise ValueError(f"explain debe ser un entero entre 0 y {EXPLAIN_MAX_FEATURES}")
+    return int(top_k)
+
+# campos de un payload de /predict
+SINGLE_FIELDS = ('date', 'time', 'vehicle_type', 'pickup_location', 'drop_location', 'avg_vtat', 'avg_ctat',
+                 'booking_value', 'ride_distance', 'driver_ratings', 'customer_rating', 'payment_method',
+                 'day', 'month')
+
+def _single_frame(data, validator=None):
+    if validator is not None:
+        # los campos tal cual llegan; la validación convierte tipos o lanza ValidationError
+        df = pd.DataFrame([{c: data.get(c) for c in SINGLE_FIELDS if c in data}])
+        return validator.validate_one(df)
+    return pd.DataFrame([{
+        'date': pd.to_datetime(data['date']),
+        'time': pd.to_datetime(data['time'], format='%H:%M'),
+        'vehicle_type': data['vehicle_type'],
+        'pickup_location': data['pickup_location'],
+        'drop_location': data['drop_location'],
+        'avg_vtat': float(data['avg_vtat']),
+        'avg_ctat': float(data['avg_ctat']),
+        'booking_value': float(data['booking_value']),
+        'ride_distance': float(data['ride_distance']),
+        'driver_ratings': float(data['driver_ratings']),
+        'customer_rating': float(data['customer_rating']),
+        'payment_method': data['payment_method'],
+        'day': data.get('day', None),
+        'month': data.get('month', None)
+    }])
+
+@app.errorhandler(ModelNotReady)
+def model_not_ready(e):
+    return jsonify({'success': False, 'error': str(e), 'model': registry.stats()}), 503
+
+@app.errorhandler(CoalescerTimeout)
+def coalescer_timeout(e):
+    return jsonify({'success': False, 'error': str(e)}), 503
+
 @app.route('/predict', methods=['POST'])
 def predict():
+    # un solo handle por petición: un cambio de modelo en curso no la afecta
+    handle = registry.get(timeout=MODEL_READY_TIMEOUT)
     try:
-        data = request.json
-        # Crear DataFrame con los datos
-        df = pd.DataFrame([{
-            'date': pd.to_datetime(data['date']),
-            'time': pd.to_datetime(data['time'], format='%H:%M'),
-            'vehicle_type': data['vehicle_type'],
-            'pickup_location': data['pickup_location'],
-            'drop_location': data['drop_location'],
-            'avg_vtat': float(data['avg_vtat']),
-            'avg_ctat': float(data['avg_ctat']),
-            'booking_value': float(data['booking_value']),
-            'ride_distance': float(data['ride_distance']),
-            'driver_ratings': float(data['driver_ratings']),
-            'customer_rating': float(data['customer_rating']),
-            'payment_method': data['payment_method'],
-            'day': data.get('day', None),
-            'month': data.get('month', None)
-        }])
+        explain = _explain_option(request.args)
+        with g.timer.time('parse'):
+            data = request.json
+            # Crear DataFrame con los datos (validado contra el vocabulario del modelo)
+            # antes de consultar la caché: la clave redondea los numéricos y un valor
+            # fuera de rango podría caer en la entrada de una fila válida
+            validator = validator_for(handle)
+            df = _single_frame(data, validator) if validator is not None else None
+        cached = cache_key = None
+        # las explicaciones no se guardan en la caché
+        if prediction_cache is not None and not explain:
+            with g.timer.time('cache'):
+                try:
+                    cache_key = prediction_cache.make_key(data)
+                except (KeyError, TypeError, ValueError):
+                    # payload incompleto o no canónico: sin caché; la validación explica qué falla
+                    cache_key = None
+                cached = prediction_cache.get(cache_key) if cache_key is not None else None
+            # una entrada calculada con otra versión (carrera con un cambio de modelo) no vale
+            if cached is not None and cached[2] != handle.version:
+                cached = None
+
+        explanation = None
+        if cached is not None:
+            prediction, prob_dict, _ = cached
+        else:
+            if df is None:
+                with g.timer.time('parse'):
+                    df = _single_frame(data)
+            prediction, prob_dict, explanation = _score_single(df, handle, explain)
+            ROWS_SCORED.inc(endpoint='predict')
+            if prediction_cache is not None and cache_key is not None:
+                prediction_cache.put(cache_key, (prediction, prob_dict, handle.version))
+
+        # Guardar en base de datos (los aciertos de caché solo si PREDICT_CACHE_PERSIST_HITS=1)
+        if cached is None or PREDICT_CACHE_PERSIST_HITS:
+            with g.timer.time('db_write'):
+                db.save_prediction(data, prediction, prob_dict, model_version=handle.version)
         
-        # preparar features requeridas por el pipeline
-        df = prepare_features(df)
-        
-        # Realizar predicción
-        prediction = model.predict(df)[0]
-        probabilities = model.predict_proba(df)[0]
-        
-        # Obtener las clases
-        classes = model.named_steps['model'].classes_
-        prob_dict = {cls: float(prob) for cls, prob in zip(classes, probabilities)}
-        
-        # Guardar en base de datos
-        db.save_prediction(data, prediction, prob_dict)
-        
-        return jsonify({
+        response = {
             'success': True,
             'prediction': prediction,
-            'probabilities': prob_dict
-        })
-        
+            'probabilities': prob_dict,
+            'cached': cached is not None,
+            'model_version': handle.version
+        }
+        if explanation is not None:
+            response['explanation'] = explanation
+        return jsonify(response)
+
+    except ValidationError as e:
+        ROWS_REJECTED.inc(endpoint='predict')
+        return jsonify({'success': False, 'error': str(e), 'errors': e.reasons}), 400
+    except CoalescerTimeout:
+        raise
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+def _bulk_options(args):
+    encoding = args.get('encoding', 'json')
+    if encoding not in ENCODINGS:
+        raise ValueError(f"encoding debe ser uno de {list(ENCODINGS)}")
+    dtype = args.get('dtype', 'float32')
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype debe ser uno de {list(DTYPES)}")
+    decimals = args.get('decimals', type=int)
+    if decimals is not None and not 0 <= decimals <= 15:
+        raise ValueError("decimals debe estar entre 0 y 15")
+    return {
+        'encoding': encoding,
+        'dtype': dtype,
+        'decimals': decimals,
+        'persist': args.get('persist', '1') != '0',
+        'probabilities': args.get('probabilities', '1') != '0',
+        'explain': _explain_option(args),
+    }
+
+@app.route('/predict_bulk', methods=['POST'])
+def predict_bulk():
+    """Puntúa muchos viajes en una petición: JSON columnar o NDJSON, opcionalmente con gzip.
+
+    Query string: ``persist=0`` no guarda las filas en la base de datos,
+    ``probabilities=0`` las omite, ``decimals=N`` las redondea y
+    ``encoding=base64`` (con ``dtype=float32|float64``) las devuelve como buffer binario.
+    ``explain=N`` añade ``explanations``: las N características que más aportan a cada predicción.
+    """
+    handle = registry.get(timeout=MODEL_READY_TIMEOUT)
+    try:
+        options = _bulk_options(request.args)
+        with g.timer.time('parse'):
+            body = read_body(request.get_data(cache=False), request.headers.get('Content-Encoding'), BULK_MAX_BYTES)
+            if request.mimetype in NDJSON_MIMETYPES:
+                df = frame_from_ndjson(body)
+            else:
+                df = frame_from_columns(body)
+        n = len(df)
+        if n == 0:
+            return jsonify({'success': False, 'error': 'No hay filas'}), 400
+        if n > BULK_MAX_ROWS:
+            return jsonify({'success': False, 'error': f'Máximo {BULK_MAX_ROWS} filas por petición'}), 413
+
+        # filas válidas: convertidas para inferir y tal cual llegaron para guardar
+        features, rows, rejected = df, df, None
+        validator = validator_for(handle)
+        if validator is not None:
+            with g.timer.time('validate'):
+                checked = validator.validate(df)
+            features = checked.valid
+            if checked.reason_counts:
+                rows, rejected = df.iloc[checked.kept], checked.rejected
+                ROWS_REJECTED.inc(len(rejected), endpoint='predict_bulk')
+
+        classes = handle.engine.classes
+        batch_id = uuid.uuid4().hex
+        labels = np.full(n, None, dtype=object)
+        probs = np.full((n, len(classes)), np.nan)
+        explanations = [None] * n
+        if len(features):
+            result = batch_engine_for(handle).predict_with_proba(features, explain=options['explain'])
+            g.timer.add_inference(result.timings)
+            if rejected is None:
+                labels, probs = result.labels, result.probabilities
+            else:
+                labels[checked.kept], probs[checked.kept] = result.labels, result.probabilities
+            if options['explain']:
+                described = handle.engine.explainer.describe(result.explanation, options['decimals'])
+                if rejected is None:
+                    explanations = described
+                else:
+                    for i, e in zip(checked.kept.tolist(), described):
+                        explanations[i] = e
+            if options['persist']:
+                with g.timer.time('db_write'):
+                    db.save_predictions_bulk(rows, result.labels, result.probabilities, classes,
+                                             batch_id=batch_id, model_version=handle.version)
+            ROWS_SCORED.inc(len(features), endpoint='predict_bulk')
+            record_batch('predict_bulk', len(features), time.perf_counter() - g.started)
+
+        with g.timer.time('serialize'):
+            missing = None if rejected is None else (rejected['row_number'].to_numpy() - 1).tolist()
+            payload = {
+                'success': True,
+                'model_version': handle.version,
+                'batch_id': batch_id if options['persist'] else None,
+                'rows': n,
+                'scored': len(features),
+                'classes': [str(c) for c in classes],
+                'predictions': labels.tolist(),
+            }
+            if options['probabilities']:
+                payload['probabilities'] = encode_probabilities(probs, options['encoding'], options['decimals'],
+                                                                options['dtype'], missing)
+            if options['explain']:
+                payload['explanations'] = explanations
+            if rejected is not None:
+                payload['rejected'] = [{'index': i, 'reason': r}
+                                       for i, r in zip(missing, rejected['reject_reason'].tolist())]
+            body = json.dumps(payload, separators=(',', ':')).encode()
+            response = Response(body, mimetype='application/json')
+            if 'gzip' in request.accept_encodings:
+                response.set_data(gzip_body(body))
+                response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+    except PayloadTooLarge as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/cache/stats')
+def cache_stats():
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **prediction_cache.stats()})
+
+def _output_format(input_format):
+    requested = request.args.get('format') or request.form.get('format')
+    if requested:
+        return normalize_format(requested)
+    for mimetype in request.accept_mimetypes.values():
+        if mimetype in (FORMATS['parquet'][1], FORMATS['feather'][1]):
+            return normalize_format(mimetype)
+    return input_format
+
 @app.route('/batch_predict', methods=['POST'])
 def batch_predict():
+    handle = registry.get(timeout=MODEL_READY_TIMEOUT)
     try:
         if 'file' not in request.files:
             return jsonify({'success': False, 'error': 'No file uploaded'}), 400
@@ -184,56 +505,77 @@ def batch_predict():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No file selected'}), 400
 
-        # Leer CSV y preparar datos
-        df = pd.read_csv(file)
-        df_prepared = prepare_features(df.copy())
-
-        # Realizar predicciones
-        preds = model.predict(df_prepared)
-        probs = model.predict_proba(df_prepared)
-        classes = list(model.named_steps['model'].classes_)
-
-        # Guardar cada predicción usando el mismo método que predicciones individuales
-        for idx, row in df.iterrows():
-            data = row.to_dict()
-            prediction = preds[idx]
-            probabilities = {cls: float(prob) for cls, prob in zip(classes, probs[idx])}
-            
-            # Usar el mismo método de guardado que predict()
-            db.save_prediction(data, prediction, probabilities)
-
-        # Generar reporte y CSV de resultados
-        results = df.copy()
-        results['prediction'] = preds
-        for i, cls in enumerate(classes):
-            results[f"prob_{cls}"] = probs[:, i]
-
-        # Guardar CSV en uploads
+        # Tamaño de bloque configurable por petición (?chunksize=N) o por BATCH_CHUNK_SIZE
+        chunksize = request.args.get('chunksize', type=int) or request.form.get('chunksize', type=int) \
+            or app.config.get('BATCH_CHUNK_SIZE', DEFAULT_CHUNKSIZE)
+        if chunksize <= 0:
+            return jsonify({'success': False, 'error': 'chunksize must be positive'}), 400
+        # ?explain=N: columnas reason_1..N con las características que más aportan a cada predicción
+        explain = _explain_option(request.args)
+
+        # Formato de entrada por mimetype/extensión/firma; salida por ?format=, Accept o igual a la entrada
+        input_format = detect_format(file.filename, file.mimetype, file.stream)
+        output_format = _output_format(input_format)
+
+        job_id = uuid.uuid4().hex
         timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-        out_filename = f"predictions_{timestamp}.csv"
+        out_filename = f"predictions_{timestamp}_{job_id[:8]}{extension(output_format)}"
         uploads_dir = app.config.get('UPLOAD_FOLDER', os.path.join(os.getcwd(), 'uploads'))
         os.makedirs(uploads_dir, exist_ok=True)
         out_path = os.path.join(uploads_dir, out_filename)
-        results.to_csv(out_path, index=False)
-
-        # Preparar reporte
-        report = {
-            "total": len(results),
-            "counts": results['prediction'].value_counts().to_dict(),
-            "mean_probability_by_class": {
-                str(c): float(results[f"prob_{c}"].mean()) 
-                for c in classes
-            },
-            "saved_file": out_filename,
-            "saved_at": datetime.utcnow().isoformat(),
-            "download_url": f"/download_predictions/{out_filename}"
-        }
-
-        return jsonify({'success': True, 'report': report}), 200
+        # filas que no pasan la validación, con su número de fila y el motivo
+        rejects_filename = f"rejects_{timestamp}_{job_id[:8]}.csv"
+        rejects_path = os.path.join(uploads_dir, rejects_filename)
+
+        # ?sync=1 conserva el comportamiento anterior (todo dentro de la petición)
+        if request.args.get('sync', type=int):
+            # Leer, predecir y guardar (archivo + DB) bloque a bloque: memoria acotada
+            running = score_stream(file.stream, out_path, batch_engine_for(handle), db=db, chunksize=chunksize,
+                                   batch_id=job_id, input_format=input_format, output_format=output_format,
+                                   model_version=handle.version, timer=g.timer,
+                                   validator=validator_for(handle), rejects_path=rejects_path,
+                                   explain=explain)
+            record_batch('batch_predict', running.total, time.perf_counter() - g.started)
+            if running.rejected:
+                ROWS_REJECTED.inc(running.rejected, endpoint='batch_predict')
+
+            # Preparar reporte
+            report = running.to_dict()
+            report.update({
+                "model_version": handle.version,
+                "saved_file": out_filename,
+                "saved_at": datetime.utcnow().isoformat(),
+                "download_url": f"/download_predictions/{out_filename}"
+            })
+            if running.rejected:
+                report.update({
+                    "rejects_file": rejects_filename,
+                    "rejects_url": f"/download_predictions/{rejects_filename}"
+                })
+            return jsonify({'success': True, 'report': report}), 200
+
+        # Por defecto: guardar el archivo y encolar; el cliente consulta /jobs/<job_id>
+        input_path = os.path.join(uploads_dir, f"upload_{job_id}{extension(input_format)}")
+        file.save(input_path)
+        jobs.submit(job_id, input_path, out_path, chunksize=chunksize,
+                    input_format=input_format, output_format=output_format, rejects_path=rejects_path,
+                    explain=explain)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status_url': f"/jobs/{job_id}"
+        }), 202
 
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 400
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    status = jobs.status(job_id)
+    if status is None:
+        return jsonify({'success': False, 'error': 'job not found'}), 404
+    return jsonify({'success': True, **status})
+
 # reemplazar/añadir endpoint para descargar archivo por nombre
 @app.route('/download_predictions/<filename>')
 def download_predictions(filename):
@@ -241,53 +583,94 @@ def download_predictions(filename):
     path = os.path.join(uploads_dir, filename)
     if not os.path.exists(path):
         return jsonify({'error': 'file not found'}), 404
-    return send_file(path, as_attachment=True)
+    return send_file(path, as_attachment=True, mimetype=mimetype_for(filename))
+
+def _history_filters(args):
+    """Filtros de historial desde la query string (fechas YYYY-MM-DD en UTC, ``end`` inclusivo)."""
+    def epoch(value, days=0):
+        if not value:
+            return None
+        day = datetime.strptime(value, '%Y-%m-%d') + timedelta(days=days)
+        return int(day.replace(tzinfo=timezone.utc).timestamp())
+
+    return {
+        'start': epoch(args.get('start')),
+        'end': epoch(args.get('end'), days=1),
+        'prediction': args.get('prediction') or None,
+        'vehicle_type': args.get('vehicle_type') or None,
+        'batch_id': args.get('batch_id') or None,
+    }
 
 @app.route('/history')
 def history():
-    predictions = []
+    predictions, next_cursor = db.query_history(limit=HISTORY_PAGE_SIZE)
+    return render_template('history.html', predictions=predictions, next_cursor=next_cursor,
+                           vehicle_types=VEHICLE_TYPES, prediction_classes=PREDICTION_CLASSES)
+
+@app.route('/api/history')
+def api_history():
     try:
-        # 1) intenta usar Database wrapper (probablemente falla o retorna vacío)
-        if 'db' in globals() and db is not None and hasattr(db, 'get_all_predictions'):
-            try:
-                predictions = db.get_all_predictions() or []
-            except Exception as e:
-                print("db.get_all_predictions() failed:", e)
-                predictions = []
-
-        # 2) fallback sqlite (probablemente no encuentra la tabla o está vacía)
-        if not predictions:
-            db_path = os.path.join(os.getcwd(), "predictions.db")
-            if os.path.exists(db_path):
-                conn = sqlite3.connect(db_path)
-                conn.row_factory = sqlite3.Row
-                cur = conn.cursor()
-                cur.execute("SELECT * FROM detailed_predictions ORDER BY id DESC LIMIT 500")
-                rows = cur.fetchall()
-                for r in rows:
-                    d = {k: (v if v is not None else "") for k, v in dict(r).items()}
-                    predictions.append(d)
-                conn.close()
-    except Exception as e:
-        print("Error loading history:", e)
+        filters = _history_filters(request.args)
+        limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+        items, next_cursor = db.query_history(limit=limit, cursor=request.args.get('cursor'), **filters)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, 'items': items, 'next_cursor': next_cursor})
+
+@app.route('/stats')
+def stats():
+    # Agregados por bucket (hour/day) desde prediction_rollups; end inclusivo como en /api/history
+    try:
+        filters = _history_filters(request.args)
+        result = db.rollup_stats(
+            granularity=request.args.get('granularity', 'day'),
+            dimension=request.args.get('dimension', 'all'),
+            start=filters['start'],
+            end=filters['end'],
+            value=request.args.get('value'),
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    return jsonify({'success': True, **result})
 
-    return render_template('history.html', predictions=predictions)
+@app.route('/ready')
+def ready():
+    # readiness: 200 solo con un modelo cargado y calentado
+    info = registry.stats()
+    return jsonify(info), 200 if info['ready'] else 503
+
+@app.route('/model')
+def model_info():
+    return jsonify(registry.stats())
 
 @app.route('/feature_importance')
 def feature_importance():
-    # Obtener importancia de características
-    feature_names = model.named_steps['prep'].get_feature_names()
-    importances = model.named_steps['model'].feature_importances_
-    
-    # Ordenar por importancia
-    indices = np.argsort(importances)[::-1][:15]
-    
-    data = {
-        'features': [feature_names[i] for i in indices],
-        'importances': [float(importances[i]) for i in indices]
-    }
-    
+    # Importancia de características: se calcula una vez por versión del modelo
+    handle = registry.get(timeout=MODEL_READY_TIMEOUT)
+    data = _importances.get(handle.version)
+    if data is None:
+        model = handle.pipeline
+        feature_names = model.named_steps['prep'].get_feature_names()
+        importances = model.named_steps['model'].feature_importances_
+
+        # Ordenar por importancia
+        indices = np.argsort(importances)[::-1][:15]
+
+        data = {
+            'features': [feature_names[i] for i in indices],
+            'importances': [float(importances[i]) for i in indices],
+            'model_version': handle.version
+        }
+        _importances[handle.version] = data
+
     return jsonify(data)
 
+# Los procesos de los pools (forkserver/spawn) reimportan el script principal
+# como __mp_main__: con ``python app.py`` solo necesitan las definiciones, no
+# otro registro con su carga del modelo, su hilo de recarga y su base de datos
+if __name__ != '__mp_main__':
+    create_app()
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # servidor de desarrollo (un proceso, recarga de código); en producción: gunicorn -c gunicorn.conf.py app:app
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1', host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
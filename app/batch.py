@@ -0,0 +1,149 @@
+"""Scoring por lotes en streaming.
+
+La entrada (CSV, Parquet o Feather, ver formats.py) se lee por bloques de
+``chunksize`` filas; cada bloque pasa por ``InferenceEngine.predict_with_proba``
+(prepare_features -> transform -> predict_proba) y sus resultados se anexan
+al archivo de salida y a la base de datos antes de leer el siguiente. El
+reporte se mantiene como agregados acumulados, así que la memoria no depende
+del tamaño del archivo. Con un ``InputValidator`` (validation.py) las filas
+inválidas se apartan antes de inferir y van a un CSV de rechazos con el motivo.
+"""
+import time
+
+import numpy as np
+
+from formats import CsvResultWriter, iter_chunks, result_writer
+from metrics import StageTimer
+
+DEFAULT_CHUNKSIZE = 50_000
+
+
+class RunningReport:
+    """Conteos por clase y medias de probabilidad acumuladas bloque a bloque."""
+
+    def __init__(self, classes):
+        self.classes = list(classes)
+        self.total = 0
+        self.counts = {}
+        self.prob_sums = np.zeros(len(self.classes))
+        self.rejected = 0
+        self.reject_reasons = {}
+
+    @property
+    def processed(self):
+        """Filas leídas: puntuadas más rechazadas."""
+        return self.total + self.rejected
+
+    def reject(self, rows, reason_counts):
+        self.rejected += rows
+        for reason, count in reason_counts.items():
+            self.reject_reasons[reason] = self.reject_reasons.get(reason, 0) + count
+
+    def update(self, preds, probs):
+        labels, counts = np.unique(np.asarray(preds).astype(str), return_counts=True)
+        for label, count in zip(labels, counts):
+            self.counts[label] = self.counts.get(label, 0) + int(count)
+        self.prob_sums += np.asarray(probs, dtype=float).sum(axis=0)
+        self.total += len(preds)
+
+    def to_dict(self):
+        means = self.prob_sums / self.total if self.total else self.prob_sums
+        return {
+            "total": self.total,
+            "counts": dict(sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)),
+            "mean_probability_by_class": {
+                str(c): float(m) for c, m in zip(self.classes, means)
+            },
+            "rejected": self.rejected,
+            "rejected_by_reason": dict(sorted(self.reject_reasons.items(), key=lambda kv: kv[1], reverse=True)),
+        }
+
+
+def score_stream(source, out_path, engine, db=None, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None,
+                 batch_id=None, input_format='csv', output_format=None, model_version=None, timer=None,
+                 validator=None, rejects_path=None, explain=0):
+    """Puntúa ``source`` (ruta o archivo) por bloques y escribe ``out_path`` incrementalmente.
+
+    ``output_format`` es por defecto el mismo que ``input_format``.
+    Si se pasa ``db`` cada bloque se persiste con ``save_predictions_bulk``
+    (etiquetado con ``batch_id`` y ``model_version``).
+    ``on_chunk(report)`` se llama tras cada bloque (progreso de trabajos).
+    Si se pasa ``timer`` (``metrics.StageTimer``) acumula el tiempo de cada
+    etapa: parse, validate, prepare, transform, predict, db_write y output_write.
+    Con ``validator`` las filas inválidas no se puntúan: se cuentan en el
+    reporte y, si se pasa ``rejects_path``, se escriben ahí (CSV con
+    ``row_number`` y ``reject_reason``).
+    Con ``explain=k`` la salida lleva, por fila, las ``k`` características que
+    más aportan a la clase predicha (``reason_i``, ``reason_i_contribution``)
+    y la probabilidad base de esa clase (``explain_bias``).
+    Devuelve el ``RunningReport`` final.
+    """
+    classes = list(engine.classes)
+    prob_columns = [f"prob_{cls}" for cls in classes]
+    explainer = engine.explainer if explain else None
+    # las contribuciones se escriben como las probabilidades (float32 en Parquet/Feather)
+    float_columns = prob_columns + [f"reason_{i + 1}_contribution" for i in range(explain)] + \
+        (['explain_bias'] if explain else [])
+    report = RunningReport(classes)
+    timer = timer if timer is not None else StageTimer()
+    writer = result_writer(out_path, output_format or input_format)
+    rejects = CsvResultWriter(rejects_path) if validator is not None and rejects_path else None
+    chunks = iter_chunks(source, input_format, chunksize)
+    offset = 0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            timer.add('parse', time.perf_counter() - t0)
+            if chunk is None:
+                break
+            features = chunk
+            if validator is not None:
+                with timer.time('validate'):
+                    checked = validator.validate(chunk, offset=offset)
+                    offset += len(chunk)
+                    # se infiere sobre los valores convertidos; la salida y la base de datos
+                    # reciben las filas válidas tal como llegaron
+                    features = checked.valid
+                    if checked.reason_counts:
+                        chunk = chunk.iloc[checked.kept]
+                        report.reject(len(checked.rejected), checked.reason_counts)
+                        if rejects is not None:
+                            rejects.write(checked.rejected, ())
+                if not len(chunk):
+                    if on_chunk is not None:
+                        on_chunk(report)
+                    continue
+            result = engine.predict_with_proba(features, explain=explain)
+            timer.add_inference(result.timings)
+            preds, probs = result.labels, result.probabilities
+            if db is not None:
+                with timer.time('db_write'):
+                    db.save_predictions_bulk(chunk, preds, probs, classes, batch_id=batch_id,
+                                            model_version=model_version)
+
+            with timer.time('output_write'):
+                chunk['prediction'] = preds
+                for i, col in enumerate(prob_columns):
+                    chunk[col] = probs[:, i]
+                if explainer is not None:
+                    for col, values in explainer.columns(result.explanation).items():
+                        chunk[col] = values
+                writer.write(chunk, float_columns)
+            report.update(preds, probs)
+            if on_chunk is not None:
+                on_chunk(report)
+    finally:
+        writer.close()
+
+    if report.total == 0:
+        if report.rejected:
+            reasons = ", ".join(f"{r} ({n})" for r, n in report.to_dict()["rejected_by_reason"].items())
+            raise ValueError(f"Ninguna fila válida: {report.rejected} rechazadas; {reasons}")
+        raise ValueError("El archivo no contiene filas")
+    return report
+
+
+def score_csv_stream(source, out_path, engine, **kwargs):
+    """``score_stream`` con entrada y salida CSV."""
+    return score_stream(source, out_path, engine, input_format='csv', output_format='csv', **kwargs)
@@ -0,0 +1 @@
+"""Benchmarks de la aplicación. Ejecutar desde ``app/``: ``python -m benchmarks.<modulo>``."""
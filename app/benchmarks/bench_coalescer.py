@@ -0,0 +1,81 @@
+"""Generador de carga para /predict con y sin micro-batching: p50/p99 y QPS.
+
+Ejecutar desde ``app/`` (el modelo se carga desde ``models/``):
+
+    python -m benchmarks.bench_coalescer --clients 32 --duration 10
+
+Cada cliente es un hilo con su propio ``app.test_client()`` que lanza
+peticiones seguidas; el servidor real (threaded / gthread) se comporta igual.
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_rides
+
+
+def payloads(n):
+    rides = make_rides(n, seed=1)
+    return rides.to_dict(orient='records')
+
+
+def load(flask_app, clients, duration, bodies):
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    stop_at = time.perf_counter() + duration
+
+    def client(i):
+        c = flask_app.test_client()
+        k = i
+        while time.perf_counter() < stop_at:
+            body = bodies[k % len(bodies)]
+            k += clients
+            t0 = time.perf_counter()
+            r = c.post('/predict', json=body)
+            latencies[i].append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors[i] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.concatenate([np.asarray(l) for l in latencies]) * 1e3
+    return {
+        'requests': len(lat),
+        'errors': sum(errors),
+        'qps': len(lat) / elapsed,
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p99_ms': float(np.percentile(lat, 99)),
+    }
+
+
+def run(clients, duration, max_wait_ms, max_batch):
+    import app as appmod
+    from coalescer import RequestCoalescer
+
+    bodies = payloads(1000)
+    modes = [('off', None), ('on', RequestCoalescer(appmod.registry.get().engine, max_wait_ms, max_batch))]
+    print(f"clients={clients} duration={duration}s max_wait_ms={max_wait_ms} max_batch={max_batch}")
+    print(f"{'coalesce':>9} {'requests':>9} {'errors':>7} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, coalescer in modes:
+        appmod.coalescer = coalescer
+        r = load(appmod.app, clients, duration, bodies)
+        print(f"{name:>9} {r['requests']:>9} {r['errors']:>7} {r['qps']:>8.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+        if coalescer is not None:
+            print("coalescer:", coalescer.stats())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    args = parser.parse_args()
+    run(args.clients, args.duration, args.max_wait_ms, args.max_batch)
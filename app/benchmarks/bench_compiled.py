@@ -0,0 +1,65 @@
+"""Pipeline sklearn vs bosque compilado: carga, memoria, tamaño y latencia de predict_proba.
+
+    python compiled_forest.py models/booking_status_rf_model.joblib models/booking_status_rf_model.compiled.joblib
+    python -m benchmarks.bench_compiled
+
+La memoria se mide como incremento de RSS al cargar (Linux, /proc/self/statm).
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+import preprocessing  # noqa: F401  (clases necesarias para deserializar el pipeline)
+from preprocessing import prepare_features
+from compiled_forest import load_compiled
+from benchmarks.synthetic import make_rides
+
+
+def rss_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def timed_load(loader, path):
+    rss0 = rss_mb()
+    t0 = time.perf_counter()
+    obj = loader(path)
+    return obj, time.perf_counter() - t0, rss_mb() - rss0
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(sklearn_path, compiled_path, sizes, repeat):
+    sk, sk_load, sk_rss = timed_load(joblib.load, sklearn_path)
+    cp, cp_load, cp_rss = timed_load(load_compiled, compiled_path)
+    print(f"{'':>10} {'load s':>8} {'RSS MB':>8} {'file MB':>8}")
+    print(f"{'sklearn':>10} {sk_load:>8.3f} {sk_rss:>8.1f} {os.path.getsize(sklearn_path) / 1e6:>8.1f}")
+    print(f"{'compiled':>10} {cp_load:>8.3f} {cp_rss:>8.1f} {os.path.getsize(compiled_path) / 1e6:>8.1f}")
+
+    print(f"\n{'rows':>8} {'sklearn ms':>12} {'compiled ms':>12} {'max |diff|':>12}")
+    for n in sizes:
+        X = sk[:-1].transform(prepare_features(make_rides(n)))
+        t_sk = best_of(lambda: sk[-1].predict_proba(X), repeat)
+        t_cp = best_of(lambda: cp[-1].predict_proba(X), repeat)
+        diff = np.abs(sk[-1].predict_proba(X) - cp[-1].predict_proba(X)).max()
+        print(f"{n:>8} {t_sk * 1e3:>12.2f} {t_cp * 1e3:>12.2f} {diff:>12.2g}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='models/booking_status_rf_model.joblib')
+    parser.add_argument('--compiled', default='models/booking_status_rf_model.compiled.joblib')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 100, 10_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.model, args.compiled, args.rows, args.repeat)
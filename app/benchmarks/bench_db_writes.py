@@ -0,0 +1,69 @@
+"""Filas/segundo al persistir un lote: ``save_prediction`` por fila vs ``save_predictions_bulk``.
+
+    python -m benchmarks.bench_db_writes --rows 1000 100000 1000000
+
+El camino por fila replica el bucle anterior de ``batch_predict`` (``iterrows`` +
+``row.to_dict()`` + una conexión y un commit por fila); se limita con
+``--legacy-max`` porque a 1M filas tarda horas.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from database import Database
+from benchmarks.synthetic import make_rides, make_predictions
+
+
+def legacy_save(db_path, df, preds, probs, classes):
+    # Comportamiento original: conexión nueva + INSERT + commit por cada fila
+    # sobre la antigua tabla predictions (JSON en TEXT)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                input_data TEXT,
+                prediction TEXT,
+                probabilities TEXT
+            )
+        ''')
+    for idx, row in df.iterrows():
+        conn = sqlite3.connect(db_path)
+        conn.execute('INSERT INTO predictions (input_data, prediction, probabilities) VALUES (?, ?, ?)',
+                     (json.dumps(row.to_dict()), preds[idx],
+                      json.dumps({c: float(p) for c, p in zip(classes, probs[idx])})))
+        conn.commit()
+        conn.close()
+
+
+def run(rows, legacy_max, synchronous):
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'bulk rows/s':>15}")
+    for n in rows:
+        df = make_rides(n)
+        preds, probs, classes = make_predictions(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy_rate = float('nan')
+            if n <= legacy_max:
+                path = os.path.join(tmp, 'legacy.db')
+                t0 = time.perf_counter()
+                legacy_save(path, df, preds, probs, classes)
+                legacy_rate = n / (time.perf_counter() - t0)
+
+            db = Database(os.path.join(tmp, 'bulk.db'), synchronous=synchronous)
+            t0 = time.perf_counter()
+            db.save_predictions_bulk(df, preds, probs, classes)
+            bulk_rate = n / (time.perf_counter() - t0)
+            db.close()
+        print(f"{n:>10} {legacy_rate:>15.0f} {bulk_rate:>15.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max', type=int, default=100_000)
+    parser.add_argument('--synchronous', default='NORMAL')
+    args = parser.parse_args()
+    run(args.rows, args.legacy_max, args.synchronous)
@@ -0,0 +1,76 @@
+"""Coste de las explicaciones locales (``explain=k``) frente a la inferencia sola.
+
+    python -m benchmarks.bench_explain --rows 100000 --top-k 5
+
+Sobre el mismo lote sintético mide ``predict_with_proba`` sin explicación,
+con ``explain=k`` (probabilidades y top-k del mismo recorrido) y la matriz
+completa de contribuciones (``ForestExplainer.contributions``). Comprueba
+además que las probabilidades coinciden con ``predict_proba`` y que sesgo +
+contribuciones suma la probabilidad de la clase predicha.
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+import preprocessing  # noqa: F401  (clases necesarias para deserializar el pipeline)
+from preprocessing import prepare_features
+from inference import InferenceEngine
+from explain import ForestExplainer
+from benchmarks.synthetic import make_rides
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(model_path, n, top_k, block_rows, repeat):
+    pipeline = joblib.load(model_path, mmap_mode='r')
+    engine = InferenceEngine(pipeline)
+    df = make_rides(n, seed=5)
+
+    t0 = time.perf_counter()
+    explainer = ForestExplainer.from_pipeline(pipeline, block_rows=block_rows)
+    t_build = time.perf_counter() - t0
+    engine._explainer = explainer
+
+    t_plain = best_of(lambda: engine.predict_with_proba(df), repeat)
+    t_explain = best_of(lambda: engine.predict_with_proba(df, explain=top_k), repeat)
+    X = engine.transformer.transform(prepare_features(df))
+    t_predict = best_of(lambda: engine.estimator.predict_proba(X), repeat)
+    t_full = best_of(lambda: explainer.contributions(X), repeat)
+
+    expected = engine.estimator.predict_proba(X)
+    result = engine.predict_with_proba(df, explain=top_k)
+    sample = min(n, 10_000)
+    probs, target, contributions = explainer.contributions(X[:sample])
+    rows = np.arange(sample)
+    additivity = np.abs(explainer.bias[target] + contributions.sum(axis=1) - probs[rows, target]).max()
+
+    print(f"{n} rows, {explainer.n_trees} trees, {len(explainer.leaf_proba)} leaves, "
+          f"{len(explainer.feature_names)} features; explainer built in {t_build:.2f}s")
+    print(f"  inference only              {t_plain:8.2f}s  {n / t_plain:>10,.0f} rows/s")
+    print(f"  inference + explain={top_k:<2}       {t_explain:8.2f}s  {n / t_explain:>10,.0f} rows/s  "
+          f"({t_explain / t_plain:.2f}x)")
+    print(f"  predict_proba (transformed) {t_predict:8.2f}s")
+    print(f"  full contribution matrix    {t_full:8.2f}s  ({t_full / t_predict:.2f}x predict_proba)")
+    print(f"  max |proba - predict_proba| {np.abs(result.probabilities - expected).max():.2g}; "
+          f"labels differ: {int((result.labels != engine.classes[expected.argmax(axis=1)]).sum())}; "
+          f"max additivity error {additivity:.2g}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='models/booking_status_rf_model.joblib')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--block-rows', type=int, default=8192)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.model, args.rows, args.top_k, args.block_rows, args.repeat)
@@ -0,0 +1,76 @@
+"""Tiempo de extremo a extremo y tamaño de archivo del scoring por lotes: CSV vs Parquet vs Feather.
+
+    python -m benchmarks.bench_formats --model models/booking_status_rf_model.joblib --rows 1000000
+
+Cada formato se mide con ``score_stream`` sobre el mismo lote sintético
+(lectura por bloques -> predict_with_proba -> escritura), sin base de datos.
+Se reporta también el tiempo de E/S sin el modelo (un motor que devuelve
+predicciones constantes) para separar el coste de parseo/formato.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+import preprocessing  # noqa: F401  (clases necesarias para deserializar el pipeline)
+from batch import score_stream, DEFAULT_CHUNKSIZE
+from formats import extension
+from inference import InferenceEngine, InferenceResult
+from benchmarks.synthetic import make_rides
+
+FORMATS = ('csv', 'parquet', 'feather')
+
+
+class ConstantEngine:
+    """Motor falso: mide solo lectura y escritura."""
+
+    def __init__(self, classes):
+        self.classes = np.asarray(classes)
+
+    def predict_with_proba(self, df, prepared=False):
+        n = len(df)
+        probs = np.full((n, len(self.classes)), 1.0 / len(self.classes))
+        return InferenceResult(np.repeat(self.classes[:1], n), probs, {})
+
+
+def write_input(df, path, fmt):
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        df.to_parquet(path, compression='zstd')
+    else:
+        df.to_feather(path, compression='zstd')
+
+
+def run(model_path, rows, chunksize):
+    engine = InferenceEngine(joblib.load(model_path))
+    io_engine = ConstantEngine(engine.classes)
+    df = make_rides(rows)
+    print(f"{'format':>8} {'input MB':>9} {'output MB':>10} {'I/O only s':>11} {'end-to-end s':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in FORMATS:
+            in_path = os.path.join(tmp, 'input' + extension(fmt))
+            out_path = os.path.join(tmp, 'output' + extension(fmt))
+            write_input(df, in_path, fmt)
+
+            t0 = time.perf_counter()
+            score_stream(in_path, out_path, io_engine, chunksize=chunksize, input_format=fmt)
+            io_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            score_stream(in_path, out_path, engine, chunksize=chunksize, input_format=fmt)
+            total_s = time.perf_counter() - t0
+            print(f"{fmt:>8} {os.path.getsize(in_path) / 1e6:>9.1f} {os.path.getsize(out_path) / 1e6:>10.1f} "
+                  f"{io_s:>11.2f} {total_s:>13.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default=os.path.join('models', 'booking_status_rf_model.joblib'))
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+    run(args.model, args.rows, args.chunksize)
@@ -0,0 +1,65 @@
+"""Latencia de ``query_history`` (primera página, página profunda y filtros) según el tamaño de la tabla.
+
+    python -m benchmarks.bench_history --rows 100000 1000000 10000000
+
+Las filas se reparten en el tiempo (una por segundo hacia atrás) para que los
+filtros por fecha y el cursor recorran rangos realistas.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from database import Database
+from benchmarks.synthetic import make_rides, make_predictions
+
+BLOCK = 200_000
+
+
+def fill(db, n):
+    for start in range(0, n, BLOCK):
+        size = min(BLOCK, n - start)
+        df = make_rides(size, seed=start)
+        preds, probs, classes = make_predictions(size, seed=start)
+        db.save_predictions_bulk(df, preds, probs, classes, batch_id=f"bench_{start // BLOCK}")
+    conn = db._get_connection()
+    now = int(time.time())
+    with conn:
+        conn.execute('UPDATE ride_predictions SET created_at = ? - (? - id)', (now, n))
+
+
+def timed(fn, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+def run(rows, page_size, pages):
+    print(f"{'rows':>10} {'first ms':>9} {f'page {pages} ms':>11} {'class ms':>9} {'vehicle+range ms':>17}")
+    for n in rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = Database(os.path.join(tmp, 'history.db'))
+            fill(db, n)
+
+            first_ms, (_, cursor) = timed(lambda: db.query_history(limit=page_size))
+            for _ in range(pages - 1):
+                _, cursor = db.query_history(limit=page_size, cursor=cursor)
+            deep_ms, _ = timed(lambda: db.query_history(limit=page_size, cursor=cursor))
+            class_ms, _ = timed(lambda: db.query_history(limit=page_size, prediction='Incomplete'))
+            start = int(time.time()) - n // 2
+            range_ms, _ = timed(lambda: db.query_history(limit=page_size, vehicle_type='eBike',
+                                                         start=start, end=start + 86_400))
+            db.close()
+        print(f"{n:>10} {first_ms:>9.2f} {deep_ms:>11.2f} {class_ms:>9.2f} {range_ms:>17.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--pages', type=int, default=100)
+    args = parser.parse_args()
+    run(args.rows, args.page_size, args.pages)
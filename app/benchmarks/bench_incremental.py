@@ -0,0 +1,79 @@
+"""Actualización incremental frente a reentrenamiento completo: tiempo y calidad.
+
+    python -m benchmarks.bench_incremental --data ../data/processed/UberdataResume.xlsx --periods 5
+
+El dataset se ordena por fecha. El último ``--holdout`` se reserva para
+evaluar; el resto se divide en un bloque inicial (``--initial``) y
+``--periods`` periodos que llegan uno tras otro. En cada periodo se compara:
+
+- incremental: ``update_pipeline`` con ``--trees`` árboles entrenados solo con el periodo
+- completo: el pipeline del notebook (``--full-trees`` árboles) reentrenado con todo lo visto
+
+y se reporta el tiempo de cada uno y su macro-F1 / accuracy sobre el mismo holdout.
+"""
+import argparse
+import time
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from incremental import update_pipeline
+from preprocessing import RidePreprocessor
+from train import DEFAULT_PARAMS, MIN_CAT_FREQ, RANDOM_STATE, SCORING, TARGET, evaluate, load_dataset
+
+
+def full_fit(X, y, n_estimators):
+    params = {**DEFAULT_PARAMS, 'n_estimators': n_estimators}
+    pipeline = Pipeline([
+        ('prep', RidePreprocessor(min_cat_freq=MIN_CAT_FREQ)),
+        ('model', RandomForestClassifier(**params, random_state=RANDOM_STATE, n_jobs=-1)),
+    ])
+    t0 = time.perf_counter()
+    pipeline.fit(X, y)
+    return pipeline, time.perf_counter() - t0
+
+
+def run(data, cache_dir, periods, initial, holdout, trees, full_trees):
+    df, _, _ = load_dataset(data, cache_dir)
+    df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    n_test = int(len(df) * holdout)
+    test, rest = df.iloc[len(df) - n_test:], df.iloc[:len(df) - n_test]
+    X_test, y_test = test.drop(columns=[TARGET]), test[TARGET]
+    n_initial = int(len(rest) * initial)
+    step = (len(rest) - n_initial) // periods
+
+    seen = rest.iloc[:n_initial]
+    incremental, fit_s = full_fit(seen.drop(columns=[TARGET]), seen[TARGET], full_trees)
+    score = evaluate(incremental, X_test, y_test)
+    print(f"initial: {len(seen)} rows, {full_trees} trees in {fit_s:.2f}s, {SCORING} {score[SCORING]:.4f}; "
+          f"holdout {len(test)} rows")
+    print(f"{'period':>6} {'new rows':>9} {'seen':>7} {'inc s':>7} {'full s':>7} {'speedup':>8} "
+          f"{'inc F1':>7} {'full F1':>8} {'inc acc':>8} {'full acc':>9} {'trees':>6}")
+    for p in range(periods):
+        start = n_initial + p * step
+        chunk = rest.iloc[start:start + step] if p < periods - 1 else rest.iloc[start:]
+        seen = rest.iloc[:start + len(chunk)]
+
+        t0 = time.perf_counter()
+        incremental, info = update_pipeline(incremental, chunk.drop(columns=[TARGET]), chunk[TARGET],
+                                            n_estimators=trees, random_state=RANDOM_STATE + p + 1)
+        inc_s = time.perf_counter() - t0
+        full, full_s = full_fit(seen.drop(columns=[TARGET]), seen[TARGET], full_trees)
+
+        inc, ful = evaluate(incremental, X_test, y_test), evaluate(full, X_test, y_test)
+        print(f"{p + 1:>6} {len(chunk):>9} {len(seen):>7} {inc_s:>7.2f} {full_s:>7.2f} {full_s / inc_s:>7.1f}x "
+              f"{inc[SCORING]:>7.4f} {ful[SCORING]:>8.4f} {inc['accuracy']:>8.4f} {ful['accuracy']:>9.4f} "
+              f"{info['total_trees']:>6}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default='../data/processed/UberdataResume.xlsx')
+    parser.add_argument('--cache-dir', default='.train_cache')
+    parser.add_argument('--periods', type=int, default=5)
+    parser.add_argument('--initial', type=float, default=0.5, help="fracción inicial (sin holdout)")
+    parser.add_argument('--holdout', type=float, default=0.15, help="fracción final reservada para evaluar")
+    parser.add_argument('--trees', type=int, default=50, help="árboles por actualización incremental")
+    parser.add_argument('--full-trees', type=int, default=DEFAULT_PARAMS['n_estimators'])
+    args = parser.parse_args()
+    run(args.data, args.cache_dir, args.periods, args.initial, args.holdout, args.trees, args.full_trees)
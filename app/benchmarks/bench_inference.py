@@ -0,0 +1,54 @@
+"""Micro-benchmark: ``predict`` + ``predict_proba`` vs ``InferenceEngine.predict_with_proba``.
+
+    python -m benchmarks.bench_inference --model models/booking_status_rf_model.joblib
+"""
+import argparse
+import time
+
+import joblib
+
+import preprocessing  # noqa: F401  (clases necesarias para deserializar el pipeline)
+from preprocessing import prepare_features
+from inference import InferenceEngine
+from benchmarks.synthetic import make_rides
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(model_path, sizes, repeat):
+    model = joblib.load(model_path)
+    engine = InferenceEngine(model)
+    print(f"{'rows':>8} {'predict+proba ms':>18} {'single pass ms':>16} {'speedup':>8}")
+    for n in sizes:
+        df = make_rides(n)
+
+        def legacy():
+            X = prepare_features(df)
+            model.predict(X)
+            model.predict_proba(X)
+
+        def single():
+            engine.predict_with_proba(df)
+
+        t_legacy = best_of(legacy, repeat)
+        t_single = best_of(single, repeat)
+        print(f"{n:>8} {t_legacy * 1e3:>18.2f} {t_single * 1e3:>16.2f} {t_legacy / t_single:>7.2f}x")
+
+    stats = engine.stats()
+    print("stage totals (s):", {k: round(v, 4) for k, v in stats['seconds'].items()})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='models/booking_status_rf_model.joblib')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 10_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.model, args.rows, args.repeat)
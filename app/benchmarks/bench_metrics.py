@@ -0,0 +1,52 @@
+"""Sobrecoste de la instrumentación: /predict con y sin métricas, y coste de un ``observe``.
+
+Ejecutar desde ``app/`` (el modelo se carga desde ``models/``):
+
+    python -m benchmarks.bench_metrics --clients 8 --duration 10
+
+Reutiliza el generador de carga de ``bench_coalescer`` con la caché de
+/predict desactivada (cada petición llega al modelo) y alterna
+``METRICS_ENABLED`` en el mismo proceso. Al final mide ``/metrics`` con las
+series ya pobladas.
+"""
+import argparse
+import time
+
+from metrics import Histogram
+from benchmarks.bench_coalescer import load, payloads
+
+
+def observe_cost(n=200_000):
+    h = Histogram('bench_seconds', 'bench', ('endpoint', 'stage'))
+    t0 = time.perf_counter()
+    for i in range(n):
+        h.observe(i * 1e-6, endpoint='predict', stage='predict')
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def run(clients, duration):
+    import app as appmod
+
+    appmod.prediction_cache = None
+    bodies = payloads(1000)
+    print(f"Histogram.observe: {observe_cost():.0f} ns")
+    print(f"clients={clients} duration={duration}s")
+    print(f"{'metrics':>8} {'requests':>9} {'errors':>7} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for enabled in (False, True, False, True):
+        appmod.METRICS_ENABLED = enabled
+        r = load(appmod.app, clients, duration, bodies)
+        print(f"{'on' if enabled else 'off':>8} {r['requests']:>9} {r['errors']:>7} {r['qps']:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+    c = appmod.app.test_client()
+    t0 = time.perf_counter()
+    body = c.get('/metrics').data
+    print(f"/metrics: {(time.perf_counter() - t0) * 1e3:.2f} ms, {len(body)} bytes")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+    run(args.clients, args.duration)
@@ -0,0 +1,42 @@
+"""Coste por fila de ``prepare_features`` + ``RidePreprocessor.transform``.
+
+    python -m benchmarks.bench_preprocessing --rows 1 100000
+"""
+import argparse
+import time
+
+import joblib
+
+import preprocessing  # noqa: F401  (clases necesarias para deserializar el pipeline)
+from preprocessing import prepare_features
+from benchmarks.synthetic import make_rides
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(model_path, sizes, repeat):
+    prep = joblib.load(model_path).named_steps['prep']
+    print(f"{'rows':>8} {'prepare us/row':>15} {'transform us/row':>17} {'total ms':>10}")
+    for n in sizes:
+        df = make_rides(n)
+        prepared = prepare_features(df)
+        t_prepare = best_of(lambda: prepare_features(df), repeat)
+        t_transform = best_of(lambda: prep.transform(prepared), repeat)
+        print(f"{n:>8} {t_prepare / n * 1e6:>15.2f} {t_transform / n * 1e6:>17.2f} "
+              f"{(t_prepare + t_transform) * 1e3:>10.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='models/booking_status_rf_model.joblib')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    run(args.model, args.rows, args.repeat)
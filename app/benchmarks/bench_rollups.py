@@ -0,0 +1,72 @@
+"""Coste de mantener los rollups al escribir y latencia de ``rollup_stats`` frente a agregar las filas.
+
+    python -m benchmarks.bench_rollups --rows 100000 1000000
+
+Compara ``save_predictions_bulk`` con y sin rollups, y la serie diaria por
+tipo de vehículo leída de ``prediction_rollups`` frente al mismo GROUP BY
+sobre ``ride_predictions``; comprueba además que ambos dan los mismos conteos.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from database import Database
+from benchmarks.synthetic import make_rides, make_predictions
+
+SPREAD_SECONDS = 90 * 86400
+
+RAW_SQL = '''
+    SELECT (created_at / 86400) * 86400, vehicle_type, prediction, COUNT(*)
+    FROM ride_predictions GROUP BY 1, 2, 3
+'''
+
+
+def write(path, df, preds, probs, classes, rollups):
+    db = Database(path, rollups=rollups)
+    t0 = time.perf_counter()
+    db.save_predictions_bulk(df, preds, probs, classes)
+    elapsed = time.perf_counter() - t0
+    return db, elapsed
+
+
+def spread(db, n):
+    # repartir las filas en SPREAD_SECONDS hacia atrás y recalcular los rollups
+    conn = db._get_connection()
+    now = int(time.time())
+    with conn:
+        conn.execute('UPDATE ride_predictions SET created_at = ? - (id * ?) / ?', (now, SPREAD_SECONDS, n))
+    db.backfill_rollups(rebuild=True)
+
+
+def run(rows):
+    print(f"{'rows':>10} {'plain rows/s':>13} {'rollup rows/s':>14} {'stats ms':>9} {'raw GROUP BY ms':>16}")
+    for n in rows:
+        df = make_rides(n)
+        preds, probs, classes = make_predictions(n)
+        with tempfile.TemporaryDirectory() as tmp:
+            plain, plain_s = write(os.path.join(tmp, 'plain.db'), df, preds, probs, classes, rollups=False)
+            plain.close()
+            db, rollup_s = write(os.path.join(tmp, 'rollups.db'), df, preds, probs, classes, rollups=True)
+            spread(db, n)
+
+            t0 = time.perf_counter()
+            stats = db.rollup_stats('day', 'vehicle_type')
+            stats_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            raw = db._get_connection().execute(RAW_SQL).fetchall()
+            raw_ms = (time.perf_counter() - t0) * 1000
+
+            expected = {(b, v, c): k for b, v, c, k in raw}
+            got = {(s['bucket'], s['value'], c): k
+                   for s in stats['series'] for c, k in s['counts'].items() if k}
+            assert got == expected, "los rollups no coinciden con ride_predictions"
+            db.close()
+        print(f"{n:>10} {n / plain_s:>13.0f} {n / rollup_s:>14.0f} {stats_ms:>9.2f} {raw_ms:>16.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    run(args.rows)
@@ -0,0 +1,47 @@
+"""Escalado del scoring por fragmentos con 1/2/4/8/16 procesos.
+
+    python -m benchmarks.bench_sharded --rows 200000 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+import preprocessing  # noqa: F401  (clases necesarias para deserializar el pipeline)
+from inference import InferenceEngine
+from sharded import ShardedScorer
+from benchmarks.synthetic import make_rides
+
+
+def run(model_path, rows, workers, repeat):
+    df = make_rides(rows)
+    engine = InferenceEngine(joblib.load(model_path))
+    reference = engine.predict_with_proba(df).probabilities
+    print(f"cpu_count={os.cpu_count()} rows={rows}")
+    print(f"{'workers':>8} {'seconds':>10} {'rows/s':>12} {'speedup':>8} {'efficiency':>10}")
+    base = None
+    for n in workers:
+        scorer = ShardedScorer(model_path, n, engine=engine)
+        scorer.predict_with_proba(df)  # arranque del pool fuera de la medición
+        best = float('inf')
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = scorer.predict_with_proba(df)
+            best = min(best, time.perf_counter() - t0)
+        scorer.shutdown()
+        assert np.allclose(result.probabilities, reference)
+        base = base or best
+        speedup = base / best
+        print(f"{n:>8} {best:>10.3f} {rows / best:>12.0f} {speedup:>7.2f}x {speedup / n:>9.0%}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='models/booking_status_rf_model.joblib')
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.model, args.rows, args.workers, args.repeat)
@@ -0,0 +1,93 @@
+"""Coste de ``InputValidator.validate`` frente a la inferencia sin validar.
+
+    python -m benchmarks.bench_validation --rows 1000000 --bad-fraction 0.01
+
+Se puntúa el mismo archivo sintético por bloques de ``--chunksize`` filas
+(como ``score_stream``) de dos maneras: directamente y validando cada bloque
+antes de inferir sobre las filas válidas. Una fracción ``--bad-fraction`` de
+filas lleva un error (fecha, rango, texto en un numérico o categoría
+desconocida). Se reporta también el tiempo de ``validate`` solo; el total
+puede bajar porque ``prepare_features`` recibe fechas y horas ya convertidas.
+"""
+import argparse
+import time
+
+import joblib
+import numpy as np
+
+import preprocessing  # noqa: F401  (clases necesarias para deserializar el pipeline)
+from inference import InferenceEngine
+from validation import InputValidator
+from benchmarks.synthetic import make_rides
+
+
+def corrupt(df, fraction, seed=0):
+    """Estropea ``fraction`` de las filas, repartidas entre cuatro tipos de error."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(df), int(len(df) * fraction), replace=False)
+    df = df.astype({'ride_distance': object})
+    kinds = np.array_split(rows, 4)
+    df.loc[kinds[0], 'date'] = 'not-a-date'
+    df.loc[kinds[1], 'driver_ratings'] = 9.0
+    df.loc[kinds[2], 'ride_distance'] = 'n/a'
+    df.loc[kinds[3], 'vehicle_type'] = 'Hovercraft'
+    return df
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def run(model_path, n, chunksize, bad_fraction, repeat):
+    engine = InferenceEngine(joblib.load(model_path))
+    validator = InputValidator.from_pipeline(engine.pipeline)
+    clean = make_rides(n, seed=3)
+    dirty = corrupt(clean, bad_fraction)
+    chunks = [clean.iloc[i:i + chunksize] for i in range(0, n, chunksize)]
+    dirty_chunks = [dirty.iloc[i:i + chunksize] for i in range(0, n, chunksize)]
+
+    def plain():
+        for chunk in chunks:
+            engine.predict_with_proba(chunk)
+
+    def validated(parts):
+        rejected = 0
+        for chunk in parts:
+            checked = validator.validate(chunk)
+            rejected += len(checked.rejected)
+            if len(checked.valid):
+                engine.predict_with_proba(checked.valid)
+        return rejected
+
+    def validate_only(parts):
+        for chunk in parts:
+            validator.validate(chunk)
+
+    t_plain = best_of(plain, repeat)
+    t_valid = best_of(lambda: validated(chunks), repeat)
+    t_dirty = best_of(lambda: validated(dirty_chunks), repeat)
+    t_check = best_of(lambda: validate_only(dirty_chunks), repeat)
+    rejected = validated(dirty_chunks)
+    print(f"{n} rows, chunks of {chunksize}, {engine.estimator.n_estimators} trees")
+    print(f"  inference only            {t_plain:8.2f}s  {n / t_plain:>10,.0f} rows/s")
+    print(f"  validate + inference      {t_valid:8.2f}s  overhead {(t_valid / t_plain - 1) * 100:+.1f}%")
+    print(f"  same, {bad_fraction:.1%} bad rows     {t_dirty:8.2f}s  overhead {(t_dirty / t_plain - 1) * 100:+.1f}%"
+          f"  ({rejected} rejected)")
+    print(f"  validate only (bad rows)  {t_check:8.2f}s  {t_check / n * 1e6:.2f} us/row "
+          f"({t_check / t_plain * 100:.1f}% of inference)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='models/booking_status_rf_model.joblib')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--chunksize', type=int, default=50_000)
+    parser.add_argument('--bad-fraction', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.model, args.rows, args.chunksize, args.bad_fraction, args.repeat)
@@ -0,0 +1,199 @@
+"""Servidor de desarrollo frente a gunicorn (preload + gc.freeze): QPS, latencia y memoria por proceso.
+
+Ejecutar desde ``app/`` (Linux; la memoria se lee de ``/proc/<pid>/smaps_rollup``):
+
+    python -m benchmarks.bench_wsgi --workers 4 --threads 4 --clients 16 --duration 15
+
+Cada servidor se arranca como subproceso con ``PREDICT_CACHE=0`` (todas las
+peticiones puntúan el modelo) en un directorio temporal con su propia base de
+datos; el modelo se toma de ``MODEL_DIR`` (por defecto ``models/``). Tras la
+carga se mide cada proceso del árbol:
+
+- RSS: páginas residentes, contando las compartidas en cada proceso
+- PSS: las compartidas repartidas entre quienes las usan (la suma es el consumo real)
+- USS: páginas privadas (lo que se libera al terminar ese worker)
+
+Con ``preload_app`` el modelo se carga una vez en el maestro y los workers lo
+comparten: su USS debe quedar muy por debajo del tamaño del modelo. Los
+clientes son hilos de este proceso; en una máquina con pocas CPU compiten con
+el servidor, así que para QPS absolutos conviene lanzar la carga desde otra.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.bench_coalescer import payloads
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(APP_DIR, 'gunicorn.conf.py'),
+            '--pythonpath', APP_DIR, 'app:app']
+# nombre -> (comando, variables de entorno extra)
+SERVERS = {
+    'dev': ([sys.executable, os.path.join(APP_DIR, 'app.py')], {'FLASK_DEBUG': '0'}),
+    'gunicorn': (GUNICORN, {}),
+    'gunicorn-nofreeze': (GUNICORN, {'WEB_GC_FREEZE': '0'}),
+    'gunicorn-nopreload': (GUNICORN, {'WEB_PRELOAD': '0'}),
+}
+
+
+def _request(port, method, path, body=None, timeout=30):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        conn.request(method, path, body=body, headers=headers)
+        r = conn.getresponse()
+        r.read()
+        return r.status
+    finally:
+        conn.close()
+
+
+def wait_ready(port, proc, timeout):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"el servidor terminó con código {proc.returncode}")
+        try:
+            if _request(port, 'GET', '/ready', timeout=2) == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"el servidor no estuvo listo en {timeout}s")
+
+
+def load(port, clients, duration, bodies):
+    latencies = [[] for _ in range(clients)]
+    errors = [0] * clients
+    stop_at = time.perf_counter() + duration
+
+    def client(i):
+        k = i
+        while time.perf_counter() < stop_at:
+            body = bodies[k % len(bodies)]
+            k += clients
+            t0 = time.perf_counter()
+            try:
+                ok = _request(port, 'POST', '/predict', body) == 200
+            except OSError:
+                ok = False
+            latencies[i].append(time.perf_counter() - t0)
+            errors[i] += not ok
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.concatenate([np.asarray(l) for l in latencies]) * 1e3
+    return {
+        'requests': len(lat),
+        'errors': sum(errors),
+        'qps': len(lat) / elapsed,
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p99_ms': float(np.percentile(lat, 99)),
+    }
+
+
+def _children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory(pid):
+    """RSS / PSS / USS / compartida en MB de ``pid`` según ``smaps_rollup``."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb': fields.get('Rss', 0.0),
+        'pss_mb': fields.get('Pss', 0.0),
+        'uss_mb': fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0),
+        'shared_mb': fields.get('Shared_Clean', 0.0) + fields.get('Shared_Dirty', 0.0),
+    }
+
+
+def process_tree(root):
+    """``[(rol, pid)]``: el proceso raíz y sus hijos directos (workers de gunicorn)."""
+    children = _children(root)
+    return [('master' if children else 'server', root)] + [('worker', pid) for pid in children]
+
+
+def run_server(name, port, workers, threads, clients, duration, bodies, ready_timeout):
+    cmd, extra_env = SERVERS[name]
+    # el servidor corre en un directorio temporal (predictions.db y uploads/ propios)
+    tmp = tempfile.mkdtemp(prefix='bench_wsgi_')
+    env = dict(os.environ, PORT=str(port), PREDICT_CACHE='0', WEB_WORKERS=str(workers), WEB_THREADS=str(threads),
+               MODEL_DIR=os.path.abspath(os.environ.get('MODEL_DIR', 'models')),
+               MODEL_WARMUP_PATH=os.path.abspath(os.environ.get('MODEL_WARMUP_PATH', 'example_batch.csv')),
+               MODEL_WATCH_INTERVAL='0', **extra_env)
+    proc = subprocess.Popen(cmd, cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+    try:
+        wait_ready(port, proc, ready_timeout)
+        # cada worker recibe alguna petición antes de medir
+        for body in bodies[:workers * threads * 4]:
+            _request(port, 'POST', '/predict', body)
+        result = load(port, clients, duration, bodies)
+        result['processes'] = [dict(role=role, pid=pid, **memory(pid)) for role, pid in process_tree(proc.pid)]
+        result['total_pss_mb'] = sum(p['pss_mb'] for p in result['processes'])
+        return result
+    finally:
+        if proc.poll() is None:
+            os.killpg(proc.pid, 15)
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(proc.pid, 9)
+                proc.wait()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def run(servers, port, workers, threads, clients, duration, ready_timeout, output):
+    bodies = [json.dumps(b) for b in payloads(512)]
+    results = {}
+    print(f"{'server':>20} {'QPS':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'total PSS MB':>13}")
+    for name in servers:
+        r = run_server(name, port, workers, threads, clients, duration, bodies, ready_timeout)
+        results[name] = r
+        print(f"{name:>20} {r['qps']:>8.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['errors']:>7} "
+              f"{r['total_pss_mb']:>13.1f}")
+        for p in r['processes']:
+            print(f"{'':>20}   {p['role']:>6} {p['pid']:>7}  RSS {p['rss_mb']:>7.1f}  PSS {p['pss_mb']:>7.1f}  "
+                  f"USS {p['uss_mb']:>7.1f}  shared {p['shared_mb']:>7.1f}")
+    if output:
+        with open(output, 'w') as f:
+            json.dump({'workers': workers, 'threads': threads, 'clients': clients, 'duration': duration,
+                       'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--servers', default=','.join(SERVERS), help=f"de {', '.join(SERVERS)}")
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15)
+    parser.add_argument('--ready-timeout', type=float, default=120)
+    parser.add_argument('--output', help="guarda los resultados en JSON")
+    args = parser.parse_args()
+    run(args.servers.split(','), args.port, args.workers, args.threads, args.clients, args.duration,
+        args.ready_timeout, args.output)
@@ -0,0 +1,366 @@
+"""Suite de benchmarks del servicio con resultados en JSON y detección de regresiones.
+
+Ejecutar desde ``app/`` (el modelo se carga desde ``models/``):
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --output new.json --compare results.json
+    python -m benchmarks.suite --quick --scenarios predict history
+    python -m benchmarks.suite --current new.json --compare results.json   # solo comparar
+
+Los escenarios van contra la aplicación Flask con ``app.test_client()``:
+
+- ``predict``: latencia de /predict de una en una (sin caché, cada petición llega al modelo)
+- ``batch_predict``: /batch_predict?sync=1 con CSV de 1k, 100k y 1M filas
+- ``predict_bulk``: /predict_bulk con 10k y 50k filas por petición (JSON columnar,
+  JSON con gzip y sin guardar en la base, NDJSON)
+- ``history``: /history, /api/history (primera página, paginación y filtros) y /stats
+  sobre bases de 100k y 1M filas
+- ``model_load``: arranque hasta modelo listo, carga en frío y warmup
+
+Todo se escribe en una base y una carpeta de subidas temporales, nunca en
+``predictions.db``. Cada métrica indica su sentido por el sufijo: ``_ms`` y
+``_seconds`` cuanto menos mejor, ``_per_sec`` y ``_qps`` cuanto más mejor; el
+resto es informativo y no se compara. Con ``--compare`` el proceso termina
+con código 1 si alguna métrica empeora más que ``--threshold``.
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from database import Database
+from model_registry import ModelRegistry
+from benchmarks.synthetic import make_rides, make_predictions
+
+LOWER_IS_BETTER = ('_ms', '_seconds')
+HIGHER_IS_BETTER = ('_per_sec', '_qps')
+
+DEFAULTS = {
+    'predict_requests': 500,
+    'batch_rows': [1_000, 100_000, 1_000_000],
+    'bulk_rows': [10_000, 50_000],
+    'history_rows': [100_000, 1_000_000],
+    'load_repeats': 3,
+}
+QUICK = {
+    'predict_requests': 100,
+    'batch_rows': [1_000, 10_000],
+    'bulk_rows': [1_000],
+    'history_rows': [10_000],
+    'load_repeats': 1,
+}
+
+
+def _label(n):
+    for size, suffix in ((1_000_000, 'm'), (1_000, 'k')):
+        if n >= size and n % size == 0:
+            return f"{n // size}{suffix}"
+    return str(n)
+
+
+def _median_ms(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e3)
+    return statistics.median(samples)
+
+
+def _check(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    return response
+
+
+# --- escenarios: cada uno devuelve un dict plano métrica -> valor ---
+
+def scenario_predict(appmod, client, opts, tmp):
+    cache, appmod.prediction_cache = appmod.prediction_cache, None
+    try:
+        bodies = make_rides(opts['predict_requests'], seed=1).to_dict(orient='records')
+        for body in bodies[:20]:
+            _check(client.post('/predict', json=body))
+        latencies = []
+        t0 = time.perf_counter()
+        for body in bodies:
+            t = time.perf_counter()
+            _check(client.post('/predict', json=body))
+            latencies.append((time.perf_counter() - t) * 1e3)
+        elapsed = time.perf_counter() - t0
+    finally:
+        appmod.prediction_cache = cache
+    lat = np.asarray(latencies)
+    return {
+        'requests': len(lat),
+        'p50_ms': float(np.percentile(lat, 50)),
+        'p95_ms': float(np.percentile(lat, 95)),
+        'p99_ms': float(np.percentile(lat, 99)),
+        'mean_ms': float(lat.mean()),
+        'sequential_qps': len(lat) / elapsed,
+    }
+
+
+def scenario_batch_predict(appmod, client, opts, tmp):
+    results = {}
+    for n in opts['batch_rows']:
+        label = _label(n)
+        data = make_rides(n, seed=2).to_csv(index=False).encode()
+        t0 = time.perf_counter()
+        response = _check(client.post('/batch_predict?sync=1',
+                                      data={'file': (io.BytesIO(data), f'rides_{label}.csv')},
+                                      content_type='multipart/form-data'))
+        elapsed = time.perf_counter() - t0
+        total = response.get_json()['report']['total']
+        if total != n:
+            raise RuntimeError(f"batch_predict devolvió {total} filas de {n}")
+        results[f'{label}_upload_mb'] = len(data) / 1e6
+        results[f'{label}_seconds'] = elapsed
+        results[f'{label}_rows_per_sec'] = n / elapsed
+    return results
+
+
+def scenario_predict_bulk(appmod, client, opts, tmp):
+    results = {}
+    for n in opts['bulk_rows']:
+        label = _label(n)
+        rides = make_rides(n, seed=4)
+        columnar = json.dumps({k: v.tolist() for k, v in rides.items()}).encode()
+        variants = {
+            'json': ('/predict_bulk', columnar, 'application/json', {}),
+            'json_gzip_nopersist': ('/predict_bulk?persist=0&decimals=4', gzip.compress(columnar, 1),
+                                    'application/json', {'Content-Encoding': 'gzip', 'Accept-Encoding': 'gzip'}),
+            'ndjson': ('/predict_bulk', rides.to_json(orient='records', lines=True).encode(),
+                       'application/x-ndjson', {}),
+        }
+        for name, (url, body, content_type, headers) in variants.items():
+            t0 = time.perf_counter()
+            response = _check(client.post(url, data=body, content_type=content_type, headers=headers))
+            elapsed = time.perf_counter() - t0
+            results[f'{label}_{name}_request_mb'] = len(body) / 1e6
+            results[f'{label}_{name}_response_mb'] = len(response.data) / 1e6
+            results[f'{label}_{name}_seconds'] = elapsed
+            results[f'{label}_{name}_rows_per_sec'] = n / elapsed
+    return results
+
+
+def _populate(path, n, chunk=250_000):
+    db = Database(path)
+    t0 = time.perf_counter()
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        preds, probs, classes = make_predictions(size, seed=start)
+        db.save_predictions_bulk(make_rides(size, seed=start), preds, probs, classes)
+    elapsed = time.perf_counter() - t0
+    # repartir created_at en los últimos 90 días para que los filtros por fecha tengan sentido
+    conn = db._get_connection()
+    now = int(time.time())
+    with conn:
+        conn.execute('UPDATE ride_predictions SET created_at = ? - (id * ?) / ?', (now, 90 * 86400, n))
+    db.backfill_rollups(rebuild=True)
+    return db, elapsed
+
+
+def scenario_history(appmod, client, opts, tmp):
+    results = {}
+    original = appmod.db
+    for n in opts['history_rows']:
+        label = _label(n)
+        db, populate_s = _populate(os.path.join(tmp, f'history_{label}.db'), n)
+        appmod.db = db
+        try:
+            results[f'{label}_insert_rows_per_sec'] = n / populate_s
+
+            results[f'{label}_page_ms'] = _median_ms(lambda: _check(client.get('/history')), 20)
+            results[f'{label}_api_first_ms'] = _median_ms(
+                lambda: _check(client.get('/api/history?limit=100')), 20)
+
+            # paginación profunda: 50 páginas seguidas por cursor
+            def walk(pages=50):
+                cursor = ''
+                for _ in range(pages):
+                    body = _check(client.get(f'/api/history?limit=100&cursor={cursor}')).get_json()
+                    cursor = body['next_cursor']
+                    if not cursor:
+                        break
+            results[f'{label}_api_page_ms'] = _median_ms(walk, 3) / 50
+
+            # combinación poco frecuente: el índice no basta y se recorre más
+            results[f'{label}_api_filtered_ms'] = _median_ms(lambda: _check(client.get(
+                '/api/history?limit=100&vehicle_type=Prime%20SUV&prediction=Incomplete')), 10)
+            results[f'{label}_stats_ms'] = _median_ms(
+                lambda: _check(client.get('/stats?granularity=day&dimension=vehicle_type')), 10)
+        finally:
+            appmod.db = original
+            db.close()
+    return results
+
+
+def scenario_model_load(appmod, client, opts, tmp):
+    current = appmod.registry
+    loads, warmups = [], []
+    for _ in range(opts['load_repeats']):
+        fresh = ModelRegistry(current.models_dir, current.base_name, current.model_format,
+                              current.warmup_path, poll_interval=0).start('eager')
+        handle = fresh.get()
+        loads.append(handle.load_seconds)
+        warmups.append(handle.warmup_seconds or 0.0)
+    return {
+        'startup_to_ready_seconds': current.startup_to_ready,
+        'load_seconds': statistics.median(loads),
+        'warmup_seconds': statistics.median(warmups),
+        'version': current.version,
+    }
+
+
+SCENARIOS = {
+    'predict': scenario_predict,
+    'batch_predict': scenario_batch_predict,
+    'predict_bulk': scenario_predict_bulk,
+    'history': scenario_history,
+    'model_load': scenario_model_load,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=10, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _meta(opts):
+    import pandas as pd
+    import sklearn
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'options': opts,
+    }
+
+
+def run(names, opts):
+    import app as appmod
+
+    appmod.registry.get(timeout=120)
+    report = {'meta': _meta(opts), 'scenarios': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        # todo lo que escriben los escenarios queda en tmp
+        original_db, upload_folder = appmod.db, appmod.app.config['UPLOAD_FOLDER']
+        appmod.db = Database(os.path.join(tmp, 'suite.db'))
+        appmod.app.config['UPLOAD_FOLDER'] = tmp
+        client = appmod.app.test_client()
+        try:
+            for name in names:
+                print(f"[{name}] ...", flush=True)
+                t0 = time.perf_counter()
+                result = SCENARIOS[name](appmod, client, opts, tmp)
+                report['scenarios'][name] = result
+                print(f"[{name}] {time.perf_counter() - t0:.1f}s")
+                for metric, value in result.items():
+                    print(f"    {metric:<32} {value:.4g}" if isinstance(value, float) else f"    {metric:<32} {value}")
+        finally:
+            appmod.db.close()
+            appmod.db, appmod.app.config['UPLOAD_FOLDER'] = original_db, upload_folder
+    return report
+
+
+def direction(metric):
+    """-1 si menos es mejor, 1 si más es mejor, 0 si no se compara."""
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    return 0
+
+
+def _abs_ms(metric, delta):
+    if metric.endswith('_seconds'):
+        return abs(delta) * 1e3
+    return abs(delta) if metric.endswith('_ms') else None
+
+
+def compare(baseline, current, threshold, noise_ms=1.0):
+    """Imprime la comparación y devuelve la lista de ``(escenario, métrica, cambio)`` que empeoraron.
+
+    Las diferencias de tiempo menores que ``noise_ms`` no cuentan como regresión.
+    """
+    regressions = []
+    print(f"\n{'scenario':<14} {'metric':<32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, metrics in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name, {})
+        for metric, value in metrics.items():
+            sign = direction(metric)
+            old = before.get(metric)
+            if not sign or not isinstance(old, (int, float)) or not isinstance(value, (int, float)) or not old:
+                continue
+            change = (value - old) / abs(old)
+            delta_ms = _abs_ms(metric, value - old)
+            worse = -sign * change > threshold and (delta_ms is None or delta_ms >= noise_ms)
+            better = sign * change > threshold
+            flag = 'REGRESSION' if worse else ('improved' if better else '')
+            print(f"{name:<14} {metric:<32} {old:>12.4g} {value:>12.4g} {change:>+8.1%} {flag}")
+            if worse:
+                regressions.append((name, metric, change))
+    print(f"\nbaseline {baseline.get('meta', {}).get('git_commit')} -> current "
+          f"{current.get('meta', {}).get('git_commit')}: {len(regressions)} regression(s) "
+          f"(threshold {threshold:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="JSON de una ejecución anterior")
+    parser.add_argument('--current', help="no ejecutar: comparar este JSON con --compare")
+    parser.add_argument('--threshold', type=float, default=0.15, help="empeoramiento relativo tolerado")
+    parser.add_argument('--noise-ms', type=float, default=1.0,
+                        help="diferencias de tiempo menores no cuentan como regresión")
+    parser.add_argument('--quick', action='store_true', help="tamaños reducidos para una comprobación rápida")
+    parser.add_argument('--predict-requests', type=int)
+    parser.add_argument('--batch-rows', type=int, nargs='+')
+    parser.add_argument('--bulk-rows', type=int, nargs='+')
+    parser.add_argument('--history-rows', type=int, nargs='+')
+    args = parser.parse_args(argv)
+
+    if args.current:
+        with open(args.current) as f:
+            report = json.load(f)
+    else:
+        opts = dict(QUICK if args.quick else DEFAULTS)
+        for key in ('predict_requests', 'batch_rows', 'bulk_rows', 'history_rows'):
+            if getattr(args, key) is not None:
+                opts[key] = getattr(args, key)
+        report = run(args.scenarios, opts)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Resultados en {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, report, args.threshold, args.noise_ms):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
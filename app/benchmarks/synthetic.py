@@ -0,0 +1,72 @@
+"""Generador de viajes sintéticos con el mismo esquema que ``example_batch.csv``.
+
+Las categorías son las del formulario (``VEHICLE_TYPES``, ``LOCATIONS``,
+``PAYMENT_METHODS`` de ``app.py``) con las frecuencias observadas en
+``data/processed/UberdataResume.xlsx`` (10 000 reservas): las categorías del
+dataset sin equivalente en el formulario se reparten entre las demás
+(Premier Sedan -> Prime Sedan, Uber XL -> Prime SUV, Uber Wallet -> Wallet).
+Las horas siguen el perfil diario del dataset y los numéricos sus rangos y
+cuantiles. Es vectorizado: un millón de filas tarda menos de un segundo.
+"""
+import numpy as np
+import pandas as pd
+
+VEHICLE_TYPES = ['Auto', 'eBike', 'Go Sedan', 'Prime Sedan', 'Prime SUV']
+LOCATIONS = ['Connaught Place', 'Dwarka', 'Gurgaon Sector 56', 'Jhilmil', 'Khandsa',
+             'Malviya Nagar', 'Palam Vihar', 'Shastri Nagar']
+PAYMENT_METHODS = ['Cash', 'Credit Card', 'Debit Card', 'UPI', 'Wallet']
+CLASSES = ['Cancelled by Customer', 'Cancelled by Driver', 'Completed', 'Incomplete', 'No Driver Found']
+
+# frecuencias del dataset (se normalizan al muestrear)
+VEHICLE_WEIGHTS = [0.2487, 0.069, 0.1825, 0.1204, 0.0306]
+# las recogidas del dataset (176 zonas) son prácticamente uniformes
+LOCATION_WEIGHTS = [1.0] * len(LOCATIONS)
+# solo viajes pagados ("Ride wasnt finished" no es un método de pago)
+PAYMENT_WEIGHTS = [0.1726, 0.0648, 0.0547, 0.3075, 0.084]
+CLASS_WEIGHTS = [0.0692, 0.176, 0.6219, 0.0617, 0.0712]
+# reservas por hora del día (0..23)
+HOUR_WEIGHTS = [0.010, 0.011, 0.010, 0.010, 0.010, 0.020, 0.025, 0.035, 0.042, 0.052, 0.063, 0.055,
+                0.046, 0.037, 0.046, 0.054, 0.066, 0.071, 0.086, 0.073, 0.066, 0.058, 0.037, 0.017]
+
+
+def _choice(rng, values, weights, n):
+    p = np.asarray(weights, dtype=float)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=p / p.sum())]
+
+
+def make_rides(n, seed=0):
+    """Devuelve un DataFrame de ``n`` viajes con las columnas que espera ``batch_predict``."""
+    rng = np.random.default_rng(seed)
+    # se genera cada texto una sola vez (366 días, 1440 minutos) y se indexa
+    calendar = pd.date_range('2024-01-01', periods=366, freq='D')
+    day_idx = rng.integers(0, len(calendar), n)
+    hours = rng.choice(24, n, p=np.asarray(HOUR_WEIGHTS) / sum(HOUR_WEIGHTS))
+    clock = np.array([f"{m // 60:02d}:{m % 60:02d}" for m in range(24 * 60)], dtype=object)
+    return pd.DataFrame({
+        'date': calendar.strftime('%Y-%m-%d').to_numpy(dtype=object)[day_idx],
+        'time': clock[hours * 60 + rng.integers(0, 60, n)],
+        'vehicle_type': _choice(rng, VEHICLE_TYPES, VEHICLE_WEIGHTS, n),
+        'pickup_location': _choice(rng, LOCATIONS, LOCATION_WEIGHTS, n),
+        'drop_location': _choice(rng, LOCATIONS, LOCATION_WEIGHTS, n),
+        'avg_vtat': rng.uniform(2, 20, n).round(1),
+        'avg_ctat': rng.uniform(10, 45, n).round(1),
+        # valor de reserva sesgado a la derecha: mediana ~250, p95 ~1000
+        'booking_value': np.clip(rng.lognormal(5.4, 0.9, n), 1, 4300).round(2),
+        'ride_distance': rng.uniform(1, 50, n).round(2),
+        'driver_ratings': np.clip(rng.normal(4.25, 0.45, n), 3, 5).round(1),
+        'customer_rating': np.clip(rng.normal(4.4, 0.45, n), 3, 5).round(1),
+        'payment_method': _choice(rng, PAYMENT_METHODS, PAYMENT_WEIGHTS, n),
+        'day': calendar.day_name().to_numpy(dtype=object)[day_idx],
+        'month': calendar.month_name().to_numpy(dtype=object)[day_idx],
+    })
+
+
+def make_predictions(n, seed=0):
+    """Etiquetas y matriz de probabilidades aleatorias (filas normalizadas, clases con la frecuencia real)."""
+    rng = np.random.default_rng(seed)
+    labels = rng.choice(len(CLASSES), n, p=np.asarray(CLASS_WEIGHTS) / sum(CLASS_WEIGHTS))
+    probs = rng.random((n, len(CLASSES)))
+    # la clase elegida queda siempre como la más probable
+    probs[np.arange(n), labels] += len(CLASSES)
+    probs /= probs.sum(axis=1, keepdims=True)
+    return np.asarray(CLASSES)[labels], probs, list(CLASSES)
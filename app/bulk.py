@@ -0,0 +1,97 @@
+"""Entrada y salida de ``/predict_bulk``: muchos viajes por petición sin dicts por fila.
+
+La entrada es JSON columnar (``{"campo": [valores...]}``, un array por
+columna) o NDJSON (un viaje por línea), opcionalmente comprimida con gzip
+(``Content-Encoding: gzip``). El JSON columnar se convierte a DataFrame
+columna a columna; el NDJSON lo lee ``pyarrow.json`` directamente a columnas.
+La salida lleva las clases una vez y las probabilidades como matriz: arrays
+JSON (opcionalmente redondeados) o un buffer base64 de float32/float64.
+"""
+import base64
+import gzip
+import io
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/x-jsonlines')
+# columnas que se leen siempre como texto (pyarrow las inferiría como timestamp)
+TEXT_COLUMNS = ('date', 'time')
+ENCODINGS = ('json', 'base64')
+DTYPES = ('float32', 'float64')
+# las respuestas son sobre todo números: el nivel 1 comprime casi igual y es varias veces más rápido
+GZIP_LEVEL = 1
+
+
+class PayloadTooLarge(ValueError):
+    """El cuerpo (descomprimido) supera el máximo configurado."""
+
+
+def read_body(raw, content_encoding, max_bytes):
+    """Cuerpo de la petición descomprimido, sin pasar de ``max_bytes``."""
+    content_encoding = (content_encoding or 'identity').strip().lower()
+    if content_encoding == 'identity':
+        if len(raw) > max_bytes:
+            raise PayloadTooLarge(f"El cuerpo supera {max_bytes} bytes")
+        return raw
+    if content_encoding not in ('gzip', 'x-gzip'):
+        raise ValueError(f"Content-Encoding no soportado: {content_encoding!r} (usa gzip)")
+    # descompresión acotada: un gzip pequeño no puede expandirse sin límite
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    body = decoder.decompress(raw, max_bytes + 1)
+    if len(body) > max_bytes or decoder.unconsumed_tail:
+        raise PayloadTooLarge(f"El cuerpo descomprimido supera {max_bytes} bytes")
+    return body
+
+
+def frame_from_columns(body):
+    """DataFrame desde ``{"campo": [valores...]}``; todas las listas deben medir lo mismo."""
+    data = json.loads(body)
+    if not isinstance(data, dict) or not data:
+        raise ValueError('Se espera un objeto JSON {"campo": [valores...]}')
+    lengths = {len(v) if isinstance(v, list) else None for v in data.values()}
+    if None in lengths:
+        raise ValueError("Cada campo debe ser una lista de valores")
+    if len(lengths) > 1:
+        raise ValueError("Todas las listas deben tener la misma longitud")
+    return pd.DataFrame(data)
+
+
+def frame_from_ndjson(body):
+    """DataFrame desde NDJSON (un objeto por línea) con el lector columnar de pyarrow."""
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+    if not body.strip():
+        return pd.DataFrame()
+    options = pa_json.ParseOptions(explicit_schema=pa.schema([(c, pa.string()) for c in TEXT_COLUMNS]),
+                                   unexpected_field_behavior='infer')
+    try:
+        table = pa_json.read_json(io.BytesIO(body), parse_options=options)
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"NDJSON inválido: {e}") from None
+    return table.to_pandas()
+
+
+def encode_probabilities(probs, encoding='json', decimals=None, dtype='float32', missing=None):
+    """Matriz de probabilidades para la respuesta.
+
+    ``json``: lista de filas (redondeadas a ``decimals`` si se pide); las filas
+    de ``missing`` (índices rechazados) van como null. ``base64``: buffer
+    little-endian de ``dtype`` con forma ``[filas, clases]``; las rechazadas son NaN.
+    """
+    if encoding == 'base64':
+        data = np.ascontiguousarray(probs, dtype=np.dtype(dtype).newbyteorder('<'))
+        return {'dtype': dtype, 'shape': list(data.shape), 'data': base64.b64encode(data.tobytes()).decode()}
+    if decimals is not None:
+        probs = probs.round(decimals)
+    rows = probs.tolist()
+    if missing is not None:
+        for i in missing:
+            rows[i] = None
+    return rows
+
+
+def gzip_body(body):
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
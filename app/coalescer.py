@@ -0,0 +1,163 @@
+"""Micro-batching de peticiones /predict.
+
+Con carga concurrente cada petición de una fila paga el coste fijo de
+sklearn (DataFrame, prepare_features, ColumnTransformer, despacho de los
+árboles). ``RequestCoalescer`` junta en un hilo de fondo las peticiones que
+llegan durante ``max_wait_ms`` (o hasta ``max_batch_size`` filas), las puntúa
+como un solo DataFrame y devuelve a cada petición su parte del resultado.
+Cada petición puede indicar su propio motor (p.ej. el del ``ModelHandle`` que
+tomó del registro); solo se agrupan peticiones del mismo motor.
+
+Ninguna petición espera sin límite: si su resultado no llega en
+``timeout_ms`` se cancela y ``predict_with_proba`` lanza ``CoalescerTimeout``.
+Un error inesperado en el hilo de fondo se entrega a las peticiones del lote
+en curso y, si el hilo muere, la siguiente petición lo vuelve a arrancar.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+
+import pandas as pd
+
+from inference import InferenceResult
+
+
+class CoalescerTimeout(RuntimeError):
+    """La petición no se puntuó dentro del plazo (``timeout_ms``) del coalescer."""
+
+
+def _fail(batch, exc):
+    for _, future, _ in batch:
+        if not future.done():
+            try:
+                future.set_exception(exc)
+            except InvalidStateError:
+                # la petición se canceló (plazo vencido) mientras tanto
+                pass
+
+
+class RequestCoalescer:
+    def __init__(self, engine, max_wait_ms=5.0, max_batch_size=64, timeout_ms=5000.0):
+        self.engine = engine
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._batches = 0
+        self._rows = 0
+        self._timeouts = 0
+        self._restarts = 0
+
+    def _ensure_started(self):
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # arranque perezoso: tras un fork (gunicorn --preload, pools) el hilo
+                # del proceso padre no existe en el hijo y hay que crearlo de nuevo
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = None
+            if self._thread is not None and not self._thread.is_alive():
+                # el hilo murió: uno nuevo atiende la misma cola (nada se pierde)
+                self._restarts += 1
+                self._thread = None
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, args=(self._queue,), name='predict-coalescer',
+                                                daemon=True)
+                self._thread.start()
+
+    def predict_with_proba(self, df, timeout=None, engine=None):
+        """Encola ``df`` y espera su resultado (mismo formato que ``InferenceEngine``).
+
+        Espera como mucho ``timeout`` segundos (por defecto ``timeout_ms``) y
+        lanza ``CoalescerTimeout`` si el resultado no llega.
+        """
+        self._ensure_started()
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        self._queue.put((df, future, engine or self.engine))
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # si el lote aún no la tomó, el hilo la descarta al sacarla de la cola
+            future.cancel()
+            with self._lock:
+                self._timeouts += 1
+            raise CoalescerTimeout(f"Predicción no completada en {timeout * 1000:.0f} ms") from None
+
+    def _run(self, q):
+        while True:
+            batch = [q.get()]
+            try:
+                rows = len(batch[0][0])
+                deadline = time.monotonic() + self.max_wait
+                while rows < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = q.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    batch.append(item)
+                    rows += len(item[0])
+                # las peticiones canceladas por plazo vencido no se puntúan
+                batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+                # durante un cambio de modelo pueden convivir peticiones de dos motores
+                groups = {}
+                for item in batch:
+                    groups.setdefault(id(item[2]), []).append(item)
+                for group in groups.values():
+                    self._score(group)
+            except Exception as e:
+                # un fallo fuera de la predicción no debe dejar peticiones esperando
+                _fail(batch, e)
+
+    def _score(self, batch):
+        engine = batch[0][2]
+        try:
+            if len(batch) == 1:
+                df = batch[0][0]
+            else:
+                df = pd.concat([df for df, _, _ in batch], ignore_index=True)
+            result = engine.predict_with_proba(df)
+        except Exception:
+            # una petición inválida no debe hacer fallar al resto del lote
+            for df, future, _ in batch:
+                try:
+                    future.set_result(engine.predict_with_proba(df))
+                except Exception as e:
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for df, future, _ in batch:
+            stop = offset + len(df)
+            future.set_result(InferenceResult(
+                result.labels[offset:stop], result.probabilities[offset:stop],
+                dict(result.timings, batch_rows=len(result.labels)),
+            ))
+            offset = stop
+        with self._lock:
+            self._batches += 1
+            self._rows += len(result.labels)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_rows': self._rows / self._batches if self._batches else 0.0,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'max_batch_size': self.max_batch_size,
+                'timeout_ms': self.timeout * 1000.0,
+                'timeouts': self._timeouts,
+                'thread_restarts': self._restarts,
+            }
@@ -1,56 +1,679 @@
+import argparse
 import sqlite3
 import json
-from datetime import datetime
+import os
+import re
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# PRAGMA user_version: 1 = tabla tipada ride_predictions (migrada desde predictions/detailed_predictions)
+#                      2 = tablas de rollup (prediction_rollups + rollup_state)
+#                      3 = columna model_version en ride_predictions
+SCHEMA_VERSION = 3
+
+PREDICTION_CLASSES = ['Cancelled by Customer', 'Cancelled by Driver', 'Completed',
+                      'Incomplete', 'No Driver Found']
+CATEGORICAL_COLUMNS = ['vehicle_type', 'pickup_location', 'drop_location', 'payment_method']
+NUMERIC_COLUMNS = ['avg_vtat', 'avg_ctat', 'booking_value', 'ride_distance',
+                   'driver_ratings', 'customer_rating']
+BASE_COLUMNS = (['created_at', 'batch_id', 'model_version', 'ride_date', 'ride_time'] + CATEGORICAL_COLUMNS
+                + NUMERIC_COLUMNS + ['prediction'])
+HISTORY_MAX_LIMIT = 1000
+
+# Rollups: buckets UTC por granularidad y expresión SQL de cada dimensión ('all' = sin desglose)
+ROLLUP_GRANULARITIES = {'hour': 3600, 'day': 86400}
+ROLLUP_DIMENSIONS = {
+    'all': "''",
+    'vehicle_type': "COALESCE(vehicle_type, '')",
+    'pickup_location': "COALESCE(pickup_location, '')",
+    'payment_method': "COALESCE(payment_method, '')",
+    'ride_hour': "COALESCE(substr(ride_time, 1, 2), '')",
+}
+CANCELLED_CLASSES = ('Cancelled by Customer', 'Cancelled by Driver')
+ROLLUP_BACKFILL_CHUNK = 50_000
+
+
+def prob_column(cls):
+    """Nombre de la columna REAL con la probabilidad de ``cls`` (p.ej. prob_cancelled_by_driver)."""
+    return 'prob_' + re.sub(r'\W+', '_', str(cls).strip().lower()).strip('_')
+
+
+def encode_cursor(created_at, row_id):
+    return f"{created_at}:{row_id}"
+
+
+def decode_cursor(cursor):
+    """``'created_at:id'`` -> (created_at, id); ValueError si el formato no es válido."""
+    try:
+        created_at, row_id = str(cursor).split(':')
+        return int(created_at), int(row_id)
+    except ValueError:
+        raise ValueError(f"cursor inválido: {cursor!r}") from None
+
+
+def _sql_literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _text_or_none(value):
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _real_or_none(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if np.isnan(value) else value
+
 
 class Database:
-    def __init__(self, db_name='predictions.db'):
+    def __init__(self, db_name='predictions.db', journal_mode='WAL', synchronous='NORMAL',
+                 bulk_chunk_size=5000, rollups=True):
+        synchronous = str(synchronous).upper()
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous debe ser uno de {SYNCHRONOUS_MODES}, recibido: {synchronous}")
         self.db_name = db_name
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.bulk_chunk_size = bulk_chunk_size
+        # mantener prediction_rollups al escribir (en la misma transacción que las filas)
+        self.rollups = rollups
+        # una conexión reutilizada por hilo (sqlite3 no permite compartirlas entre hilos)
+        self._local = threading.local()
+        self._class_columns = {}
+        if hasattr(os, 'register_at_fork'):
+            # un proceso hijo (workers de gunicorn, pools con fork) abre sus propias conexiones
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() is not None and ref()._after_fork())
         self.init_db()
-    
+
+    def _get_connection(self):
+        """Devuelve la conexión del hilo actual, creándola con los PRAGMA configurados."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_name)
+            if self.journal_mode:
+                conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _after_fork(self):
+        # la conexión heredada comparte descriptor y estado con el padre: no se usa
+        # ni se cierra en el hijo (cerrarla podría soltar locks del padre)
+        self._inherited = self._local
+        self._local = threading.local()
+
     def init_db(self):
-        conn = sqlite3.connect(self.db_name)
+        conn = self._get_connection()
+        self._migrate(conn)
         cursor = conn.cursor()
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS predictions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                input_data TEXT,
-                prediction TEXT,
-                probabilities TEXT
+            CREATE TABLE IF NOT EXISTS batch_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                input_path TEXT,
+                output_file TEXT,
+                total_rows INTEGER,
+                rows_processed INTEGER DEFAULT 0,
+                created_at REAL,
+                started_at REAL,
+                updated_at REAL,
+                finished_at REAL,
+                report TEXT,
+                error TEXT
             )
         ''')
         conn.commit()
-        conn.close()
-    
-    def save_prediction(self, input_data, prediction, probabilities):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO predictions (input_data, prediction, probabilities)
-            VALUES (?, ?, ?)
-        ''', (json.dumps(input_data), prediction, json.dumps(probabilities)))
-        conn.commit()
-        conn.close()
-    
+        self._load_class_columns(conn)
+
+    # --- esquema tipado y migración ---
+    def _create_schema(self, conn):
+        prob_cols = ",\n".join(f"                {prob_column(c)} REAL" for c in PREDICTION_CLASSES)
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS ride_predictions (
+                id INTEGER PRIMARY KEY,
+                created_at INTEGER NOT NULL,
+                batch_id TEXT,
+                ride_date TEXT,
+                ride_time TEXT,
+                vehicle_type TEXT,
+                pickup_location TEXT,
+                drop_location TEXT,
+                payment_method TEXT,
+                avg_vtat REAL,
+                avg_ctat REAL,
+                booking_value REAL,
+                ride_distance REAL,
+                driver_ratings REAL,
+                customer_rating REAL,
+                prediction TEXT NOT NULL,
+{prob_cols}
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_classes (
+                class TEXT PRIMARY KEY,
+                column_name TEXT NOT NULL
+            )
+        ''')
+        conn.executemany('INSERT OR IGNORE INTO prediction_classes (class, column_name) VALUES (?, ?)',
+                         [(c, prob_column(c)) for c in PREDICTION_CLASSES])
+
+    def _create_indexes(self, conn):
+        # created_at + rowid implícito: orden (created_at DESC, id DESC) y paginación por keyset
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_ride_predictions_created ON ride_predictions (created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_ride_predictions_prediction ON ride_predictions (prediction, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_ride_predictions_vehicle ON ride_predictions (vehicle_type, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_ride_predictions_batch ON ride_predictions (batch_id, created_at)')
+
+    def _migrate(self, conn):
+        """Lleva el esquema hasta ``SCHEMA_VERSION`` (cada paso se aplica una sola vez).
+
+        ``BEGIN IMMEDIATE`` serializa la migración entre procesos que arrancan a
+        la vez; el segundo ve ``user_version`` ya actualizado y no hace nada.
+        Las tablas antiguas se conservan intactas.
+        """
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                return
+            if version < 1:
+                self._migrate_v1(conn)
+            if version < 2:
+                self._migrate_v2(conn)
+            if version < 3:
+                conn.execute('ALTER TABLE ride_predictions ADD COLUMN model_version TEXT')
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _migrate_v1(self, conn):
+        """Crea ``ride_predictions`` y copia las filas de las tablas antiguas."""
+        self._create_schema(conn)
+        self._load_class_columns(conn)
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        migrated = 0
+        if 'predictions' in tables:
+            migrated += self._migrate_json_predictions(conn)
+        if 'detailed_predictions' in tables:
+            migrated += self._migrate_detailed_predictions(conn)
+        self._create_indexes(conn)
+        if migrated:
+            print(f"Migrated {migrated} legacy predictions into ride_predictions")
+
+    def _migrate_v2(self, conn):
+        """Crea las tablas de rollup; las filas existentes quedan para ``backfill_rollups``.
+
+        Las filas con ``id >= live_from_id`` se agregan al escribirse; las
+        anteriores las agrega el backfill por bloques (reanudable).
+        """
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS prediction_rollups (
+                granularity TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                dimension TEXT NOT NULL,
+                value TEXT NOT NULL,
+                class TEXT NOT NULL,
+                predicted INTEGER NOT NULL,
+                prob_sum REAL NOT NULL,
+                PRIMARY KEY (granularity, dimension, bucket, value, class)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM ride_predictions').fetchone()[0]
+        self._set_rollup_state(conn, 'live_from_id', last_id + 1)
+        self._set_rollup_state(conn, 'backfilled_to_id', 0)
+        if last_id:
+            print(f"{last_id} existing predictions are not in the rollups yet: "
+                  f"run `python database.py --backfill-rollups`")
+
+    def _migrate_json_predictions(self, conn):
+        classes = [r[0] for r in conn.execute('SELECT DISTINCT prediction FROM predictions') if r[0]]
+        self._ensure_class_columns(conn, classes)
+        targets, exprs = [], []
+        targets.append('created_at')
+        exprs.append("CAST(strftime('%s', timestamp) AS INTEGER)")
+        targets.append('ride_date')
+        exprs.append("substr(json_extract(input_data, '$.date'), 1, 10)")
+        targets.append('ride_time')
+        exprs.append("json_extract(input_data, '$.time')")
+        for c in CATEGORICAL_COLUMNS:
+            targets.append(c)
+            exprs.append(f"json_extract(input_data, '$.{c}')")
+        for c in NUMERIC_COLUMNS:
+            targets.append(c)
+            exprs.append(f"CAST(NULLIF(json_extract(input_data, '$.{c}'), '') AS REAL)")
+        targets.append('prediction')
+        exprs.append('prediction')
+        for cls, col in self._class_columns.items():
+            key = cls.replace('"', '\\"')
+            targets.append(col)
+            exprs.append(f"CAST(json_extract(probabilities, '$.\"{key}\"') AS REAL)")
+        cur = conn.execute(f'''
+            INSERT INTO ride_predictions ({", ".join(targets)})
+            SELECT {", ".join(exprs)} FROM predictions
+            WHERE json_valid(input_data) AND json_valid(probabilities) AND prediction IS NOT NULL
+            ORDER BY id
+        ''')
+        return cur.rowcount
+
+    def _migrate_detailed_predictions(self, conn):
+        existing = {r[1] for r in conn.execute('PRAGMA table_info(detailed_predictions)')}
+
+        def text(col):
+            return f'NULLIF("{col}", \'\')' if col in existing else 'NULL'
+
+        def real(col):
+            if col not in existing:
+                return 'NULL'
+            return f'''CASE WHEN "{col}" IN ('', 'nan', 'None') THEN NULL ELSE CAST("{col}" AS REAL) END'''
+
+        legacy_prob_cols = [c for c in existing if c.startswith('prob_')]
+        self._ensure_class_columns(conn, [c[len('prob_'):].replace('_', ' ') for c in legacy_prob_cols])
+        targets = ['created_at', 'batch_id', 'ride_date', 'ride_time']
+        exprs = ["CAST(strftime('%s', created_at) AS INTEGER)", text('filename'),
+                 f"substr({text('date')}, 1, 10)", text('time')]
+        for c in CATEGORICAL_COLUMNS:
+            targets.append(c)
+            exprs.append(text(c))
+        for c in NUMERIC_COLUMNS:
+            targets.append(c)
+            exprs.append(real(c))
+        targets.append('prediction')
+        exprs.append('prediction')
+        for legacy in legacy_prob_cols:
+            targets.append(prob_column(legacy[len('prob_'):]))
+            exprs.append(real(legacy))
+        cur = conn.execute(f'''
+            INSERT INTO ride_predictions ({", ".join(targets)})
+            SELECT {", ".join(exprs)} FROM detailed_predictions
+            WHERE prediction IS NOT NULL AND prediction != '' AND created_at IS NOT NULL
+            ORDER BY id
+        ''')
+        return cur.rowcount
+
+    def _load_class_columns(self, conn):
+        rows = conn.execute('SELECT class, column_name FROM prediction_classes').fetchall()
+        self._class_columns = dict(rows)
+
+    def _ensure_class_columns(self, conn, classes):
+        """Añade columnas ``prob_*`` REAL para clases que el esquema aún no conoce."""
+        for cls in classes:
+            cls = str(cls)
+            if cls in self._class_columns:
+                continue
+            col = prob_column(cls)
+            existing = {r[1] for r in conn.execute('PRAGMA table_info(ride_predictions)')}
+            if col not in existing:
+                conn.execute(f'ALTER TABLE ride_predictions ADD COLUMN {col} REAL')
+            conn.execute('INSERT OR IGNORE INTO prediction_classes (class, column_name) VALUES (?, ?)', (cls, col))
+            self._class_columns[cls] = col
+
+    def _insert_sql(self, classes):
+        cols = BASE_COLUMNS + [self._class_columns[str(c)] for c in classes]
+        return f'INSERT INTO ride_predictions ({", ".join(cols)}) VALUES ({", ".join("?" * len(cols))})'
+
+    # --- escritura ---
+    def save_prediction(self, input_data, prediction, probabilities, batch_id=None, model_version=None):
+        classes = list(probabilities)
+        ride_date = _text_or_none(input_data.get('date'))
+        row = [int(time.time()), batch_id, model_version, ride_date[:10] if ride_date else None,
+               _text_or_none(input_data.get('time'))]
+        row += [_text_or_none(input_data.get(c)) for c in CATEGORICAL_COLUMNS]
+        row += [_real_or_none(input_data.get(c)) for c in NUMERIC_COLUMNS]
+        row.append(str(prediction))
+        row += [float(probabilities[c]) for c in classes]
+
+        conn = self._get_connection()
+        with conn:
+            self._ensure_class_columns(conn, classes)
+            row_id = conn.execute(self._insert_sql(classes), row).lastrowid
+            if self.rollups:
+                self._rollup_range(conn, row_id, row_id)
+
+    def save_predictions_bulk(self, input_df, predictions, probabilities, classes, chunk_size=None,
+                              batch_id=None, model_version=None):
+        """Guarda un lote completo de predicciones con executemany por bloques.
+
+        Cada columna tipada se extrae del DataFrame de una vez (fechas,
+        numéricos con ``pd.to_numeric``, probabilidades desde el array), sin
+        recorrer filas con pandas. Cada bloque de ``chunk_size`` filas se
+        escribe en una sola transacción. Devuelve el número de filas insertadas.
+        """
+        n = len(input_df)
+        if n == 0:
+            return 0
+        if len(predictions) != n or len(probabilities) != n:
+            raise ValueError("input_df, predictions y probabilities deben tener la misma longitud")
+
+        def text_column(col, fmt=None):
+            if col not in input_df:
+                return [None] * n
+            values = input_df[col]
+            if fmt is not None:
+                values = pd.to_datetime(values, errors='coerce').dt.strftime(fmt)
+            return values.astype(object).where(values.notna(), None).tolist()
+
+        def real_column(col):
+            if col not in input_df:
+                return [None] * n
+            return pd.to_numeric(input_df[col], errors='coerce').to_numpy(dtype=float).tolist()
+
+        probabilities = np.asarray(probabilities, dtype=float)
+        columns = [[int(time.time())] * n, [batch_id] * n, [model_version] * n,
+                   text_column('date', '%Y-%m-%d'), text_column('time')]
+        columns += [text_column(c) for c in CATEGORICAL_COLUMNS]
+        columns += [real_column(c) for c in NUMERIC_COLUMNS]
+        columns.append(np.asarray(predictions).astype(str).tolist())
+        columns += [probabilities[:, i].tolist() for i in range(len(classes))]
+
+        chunk_size = chunk_size or self.bulk_chunk_size
+        conn = self._get_connection()
+        with conn:
+            self._ensure_class_columns(conn, classes)
+        insert_sql = self._insert_sql(classes)
+        for start in range(0, n, chunk_size):
+            stop = start + chunk_size
+            rows = zip(*(col[start:stop] for col in columns))
+            with conn:
+                inserted = conn.executemany(insert_sql, rows).rowcount
+                if self.rollups:
+                    # con la escritura bloqueada los ids del bloque son consecutivos
+                    last_id = conn.execute('SELECT MAX(id) FROM ride_predictions').fetchone()[0]
+                    self._rollup_range(conn, last_id - inserted + 1, last_id)
+        return n
+
+    # --- rollups ---
+    def _rollup_state(self, conn, key):
+        row = conn.execute('SELECT value FROM rollup_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_rollup_state(self, conn, key, value):
+        conn.execute('INSERT OR REPLACE INTO rollup_state (key, value) VALUES (?, ?)', (key, value))
+
+    def _rollup_range(self, conn, first_id, last_id):
+        """Suma las filas ``first_id..last_id`` de ride_predictions a ``prediction_rollups``.
+
+        Un GROUP BY por dimensión a nivel de hora sobre el rango de ids
+        (búsqueda por rowid); las granularidades mayores se derivan de esos
+        agregados. Un UPSERT acumula ``predicted`` y ``prob_sum`` por clase.
+        """
+        classes = list(self._class_columns.items())
+        sums = ", ".join(f"SUM(prediction = {_sql_literal(cls)}), TOTAL({col})" for cls, col in classes)
+        base = min(ROLLUP_GRANULARITIES.values())
+        acc = {}
+        for dimension, expr in ROLLUP_DIMENSIONS.items():
+            cursor = conn.execute(
+                f'SELECT (created_at / {base}) * {base}, {expr}, {sums} FROM ride_predictions '
+                f'WHERE id BETWEEN ? AND ? GROUP BY 1, 2', (first_id, last_id))
+            for bucket, value, *agg in cursor:
+                for granularity, size in ROLLUP_GRANULARITIES.items():
+                    key = (granularity, bucket // size * size, dimension, value)
+                    if key in acc:
+                        acc[key] = [x + y for x, y in zip(acc[key], agg)]
+                    else:
+                        acc[key] = agg
+        rows = []
+        for (granularity, bucket, dimension, value), agg in acc.items():
+            for i, (cls, _) in enumerate(classes):
+                predicted, prob_sum = agg[2 * i], agg[2 * i + 1]
+                if predicted or prob_sum:
+                    rows.append((granularity, bucket, dimension, value, cls, predicted, prob_sum))
+        conn.executemany('''
+            INSERT INTO prediction_rollups (granularity, bucket, dimension, value, class, predicted, prob_sum)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (granularity, dimension, bucket, value, class) DO UPDATE SET
+                predicted = predicted + excluded.predicted,
+                prob_sum = prob_sum + excluded.prob_sum
+        ''', rows)
+
+    def backfill_rollups(self, chunk_size=ROLLUP_BACKFILL_CHUNK, rebuild=False):
+        """Agrega a los rollups las filas anteriores a ``live_from_id``.
+
+        Cada bloque se confirma junto con ``backfilled_to_id``, así que el
+        proceso se puede interrumpir y relanzar. ``rebuild=True`` borra los
+        rollups y los recalcula desde cero. Devuelve las filas agregadas.
+        """
+        conn = self._get_connection()
+        if rebuild:
+            conn.execute('BEGIN IMMEDIATE')
+            with conn:
+                conn.execute('DELETE FROM prediction_rollups')
+                last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM ride_predictions').fetchone()[0]
+                self._set_rollup_state(conn, 'live_from_id', last_id + 1)
+                self._set_rollup_state(conn, 'backfilled_to_id', 0)
+        live_from = self._rollup_state(conn, 'live_from_id')
+        done = self._rollup_state(conn, 'backfilled_to_id')
+        total = 0
+        while done < live_from - 1:
+            last = min(done + chunk_size, live_from - 1)
+            with conn:
+                self._rollup_range(conn, done + 1, last)
+                self._set_rollup_state(conn, 'backfilled_to_id', last)
+            total += last - done
+            done = last
+        return total
+
+    def rollup_stats(self, granularity='day', dimension='all', start=None, end=None, value=None):
+        """Serie por bucket y totales del rango leyendo solo ``prediction_rollups``.
+
+        ``start``/``end`` son epoch en segundos (``end`` exclusivo; el bucket
+        que contiene ``start`` se incluye). Coste proporcional al número de
+        buckets, no de filas.
+        """
+        if granularity not in ROLLUP_GRANULARITIES:
+            raise ValueError(f"granularity debe ser una de {list(ROLLUP_GRANULARITIES)}")
+        if dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"dimension debe ser una de {list(ROLLUP_DIMENSIONS)}")
+        size = ROLLUP_GRANULARITIES[granularity]
+        where, params = ['granularity = ?', 'dimension = ?'], [granularity, dimension]
+        if start is not None:
+            where.append('bucket >= ?')
+            params.append(int(start) // size * size)
+        if end is not None:
+            where.append('bucket < ?')
+            params.append(int(end))
+        if value is not None:
+            where.append('value = ?')
+            params.append(value)
+
+        conn = self._get_connection()
+        series, totals = {}, {}
+        for bucket, val, cls, predicted, prob_sum in conn.execute(
+                f'SELECT bucket, value, class, predicted, prob_sum FROM prediction_rollups '
+                f'WHERE {" AND ".join(where)} ORDER BY bucket, value', params):
+            for acc in (series.setdefault((bucket, val), {}), totals.setdefault(val, {})):
+                counts, sums = acc.setdefault('counts', {}), acc.setdefault('sums', {})
+                counts[cls] = counts.get(cls, 0) + predicted
+                sums[cls] = sums.get(cls, 0.0) + prob_sum
+
+        def summary(acc):
+            total = sum(acc['counts'].values())
+            return {
+                'total': total,
+                'counts': acc['counts'],
+                'mean_probability_by_class': {c: s / total for c, s in acc['sums'].items()} if total else {},
+                'cancellation_rate': (sum(acc['counts'].get(c, 0) for c in CANCELLED_CLASSES) / total
+                                      if total else None),
+            }
+
+        return {
+            'series': [{'bucket': bucket,
+                        'start': datetime.fromtimestamp(bucket, tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                        'value': val, **summary(acc)}
+                       for (bucket, val), acc in series.items()],
+            'totals': [{'value': val, **summary(acc)} for val, acc in sorted(totals.items())],
+            'backfill_pending': self._rollup_state(conn, 'backfilled_to_id')
+                                < self._rollup_state(conn, 'live_from_id') - 1,
+        }
+
+    # --- lectura ---
+    def query_history(self, limit=50, cursor=None, start=None, end=None, prediction=None,
+                      vehicle_type=None, batch_id=None):
+        """Página de historial ordenada por (created_at, id) descendente.
+
+        ``cursor`` es el ``next_cursor`` de la página anterior (paginación por
+        keyset: el coste no depende de la profundidad). ``start``/``end`` son
+        epoch en segundos (``end`` exclusivo). Devuelve ``(items, next_cursor)``.
+        """
+        limit = max(1, min(int(limit), HISTORY_MAX_LIMIT))
+        where, params = [], []
+        if start is not None:
+            where.append('created_at >= ?')
+            params.append(int(start))
+        if end is not None:
+            where.append('created_at < ?')
+            params.append(int(end))
+        if prediction:
+            where.append('prediction = ?')
+            params.append(prediction)
+        if vehicle_type:
+            where.append('vehicle_type = ?')
+            params.append(vehicle_type)
+        if batch_id:
+            where.append('batch_id = ?')
+            params.append(batch_id)
+        if cursor:
+            where.append('(created_at, id) < (?, ?)')
+            params.extend(decode_cursor(cursor))
+        sql = 'SELECT * FROM ride_predictions'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+
+        conn = self._get_connection()
+        cur = conn.execute(sql, params)
+        names = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+
+        column_classes = {col: cls for cls, col in self._class_columns.items()}
+        items = []
+        for row in rows:
+            record = {'probabilities': {}}
+            for name, value in zip(names, row):
+                if name in column_classes:
+                    if value is not None:
+                        record['probabilities'][column_classes[name]] = value
+                else:
+                    record[name] = value
+            record['timestamp'] = datetime.fromtimestamp(record['created_at'], tz=timezone.utc) \
+                .strftime('%Y-%m-%d %H:%M:%S')
+            items.append(record)
+        next_cursor = encode_cursor(rows[-1][names.index('created_at')], rows[-1][0]) if more else None
+        return items, next_cursor
+
     def get_all_predictions(self, limit=100):
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, timestamp, input_data, prediction, probabilities
-            FROM predictions
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (limit,))
-        results = cursor.fetchall()
-        conn.close()
-        
+        """Últimas predicciones con la forma anterior (``input_data`` + ``probabilities``)."""
+        items, _ = self.query_history(limit=limit)
         predictions = []
-        for row in results:
+        for item in items:
+            input_data = {'date': item['ride_date'], 'time': item['ride_time']}
+            input_data.update({c: item[c] for c in CATEGORICAL_COLUMNS + NUMERIC_COLUMNS})
             predictions.append({
-                'id': row[0],
-                'timestamp': row[1],
-                'input_data': json.loads(row[2]),
-                'prediction': row[3],
-                'probabilities': json.loads(row[4])
+                'id': item['id'],
+                'timestamp': item['timestamp'],
+                'input_data': input_data,
+                'prediction': item['prediction'],
+                'probabilities': item['probabilities']
             })
         return predictions
+
+    # --- trabajos de predicción por lotes (ver jobs.py) ---
+    def create_job(self, job_id, input_path, output_file):
+        conn = self._get_connection()
+        with conn:
+            conn.execute('''
+                INSERT INTO batch_jobs (id, status, input_path, output_file, created_at)
+                VALUES (?, 'queued', ?, ?, ?)
+            ''', (job_id, input_path, output_file, time.time()))
+
+    def update_job(self, job_id, **fields):
+        """Actualiza columnas de ``batch_jobs``; ``report`` se guarda como JSON."""
+        if fields.get('report') is not None:
+            fields['report'] = json.dumps(fields['report'])
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        conn = self._get_connection()
+        with conn:
+            conn.execute(f'UPDATE batch_jobs SET {assignments} WHERE id = ?',
+                         (*fields.values(), job_id))
+
+    def get_job(self, job_id):
+        conn = self._get_connection()
+        cursor = conn.execute('SELECT * FROM batch_jobs WHERE id = ?', (job_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        job = dict(zip([d[0] for d in cursor.description], row))
+        job['report'] = json.loads(job['report']) if job['report'] else None
+        return job
+
+    def fail_interrupted_jobs(self, stale_after=600):
+        """Marca como fallidos los trabajos sin actividad en ``stale_after`` segundos.
+
+        Sirve para limpiar trabajos que quedaron a medias tras un reinicio sin
+        tocar los que otro proceso sigue actualizando.
+        """
+        now = time.time()
+        conn = self._get_connection()
+        with conn:
+            cursor = conn.execute('''
+                UPDATE batch_jobs SET status = 'failed', error = 'interrupted (no progress)', finished_at = ?
+                WHERE status IN ('queued', 'running') AND COALESCE(updated_at, created_at) < ?
+            ''', (now, now - stale_after))
+        return cursor.rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra predictions.db al esquema actual y mantiene los rollups")
+    parser.add_argument('path', nargs='?', default='predictions.db')
+    parser.add_argument('--backfill-rollups', action='store_true',
+                        help="agregar a los rollups las filas anteriores a la migración")
+    parser.add_argument('--rebuild-rollups', action='store_true',
+                        help="borrar los rollups y recalcularlos desde ride_predictions")
+    parser.add_argument('--chunk-size', type=int, default=ROLLUP_BACKFILL_CHUNK)
+    args = parser.parse_args()
+
+    db = Database(args.path)
+    total = db._get_connection().execute('SELECT COUNT(*) FROM ride_predictions').fetchone()[0]
+    print(f"{args.path}: schema version {SCHEMA_VERSION}, {total} rows in ride_predictions")
+    if args.backfill_rollups or args.rebuild_rollups:
+        t0 = time.perf_counter()
+        rows = db.backfill_rollups(chunk_size=args.chunk_size, rebuild=args.rebuild_rollups)
+        print(f"Rolled up {rows} rows in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
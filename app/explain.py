@@ -0,0 +1,190 @@
+"""Explicaciones locales: cuánto aporta cada característica a cada predicción.
+
+Método de Saabas (contribuciones por camino): en cada árbol, al bajar de un
+nodo a su hijo la probabilidad de la clase cambia en ``valor(hijo) -
+valor(padre)`` y ese cambio se atribuye a la característica del corte. Para
+cada fila, la suma sobre el camino y la media sobre los árboles da
+
+    predict_proba[clase] = sesgo[clase] + sum(contribuciones[clase])
+
+donde el sesgo es la media de las raíces (la distribución de clases del
+entrenamiento). Es la aproximación por caminos de TreeSHAP: exacta en la
+suma y de coste O(profundidad) por árbol en lugar de O(hojas x profundidad²).
+
+El camino de cada hoja es fijo, así que sus contribuciones se precalculan
+una vez por modelo (matriz dispersa hojas x características por clase).
+Explicar un lote es entonces: ``Tree.apply`` de sklearn (en C) para saber
+en qué hoja cae cada fila en cada árbol, una matriz indicadora filas x hojas
+y un producto disperso por clase. Las probabilidades salen del mismo
+recorrido. Se explica la clase predicha de cada fila y se devuelven sus
+``top_k`` características con mayor contribución en valor absoluto.
+"""
+from typing import NamedTuple
+
+import numpy as np
+from scipy import sparse
+
+from compiled_forest import CompiledForest, compile_forest
+
+DEFAULT_TOP_K = 5
+DEFAULT_BLOCK_ROWS = 8192
+
+
+class Explanation(NamedTuple):
+    # índice en classes_ de la clase explicada (la predicha), por fila
+    target: np.ndarray
+    # probabilidad media de esa clase en las raíces
+    bias: np.ndarray
+    # (filas, k): índices en feature_names, de mayor a menor |contribución|
+    features: np.ndarray
+    # (filas, k): contribución de cada una a la probabilidad de la clase explicada
+    contributions: np.ndarray
+
+
+def concat_explanations(parts):
+    return Explanation(*(np.concatenate([getattr(p, f) for p in parts]) for f in Explanation._fields))
+
+
+def top_contributions(contributions, k):
+    """``(índices, valores)`` de las ``k`` mayores contribuciones en valor absoluto de cada fila."""
+    k = min(k, contributions.shape[1])
+    magnitude = np.abs(contributions)
+    idx = np.argpartition(-magnitude, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(magnitude, idx, axis=1), axis=1, kind='stable')
+    idx = np.take_along_axis(idx, order, axis=1)
+    return idx, np.take_along_axis(contributions, idx, axis=1)
+
+
+class ForestExplainer:
+    """Contribuciones por característica de un RandomForest, ``RollingForest`` o ``CompiledForest``."""
+
+    def __init__(self, forest, feature_names, block_rows=DEFAULT_BLOCK_ROWS):
+        from incremental import iter_trees
+        compiled = forest if isinstance(forest, CompiledForest) else compile_forest(forest)
+        # los árboles de sklearn se recorren en C; un CompiledForest con su propio apply
+        self.trees = None if forest is compiled else [tree for tree, _ in iter_trees(forest)]
+        self.compiled = compiled
+        self.feature_names = list(feature_names)
+        self.classes = np.asarray(compiled.classes)
+        self.block_rows = block_rows
+        self.roots = compiled.roots.astype(np.int64)
+        n_features = len(self.feature_names)
+
+        value = np.asarray(compiled.leaf_proba, dtype=np.float64)
+        inner = np.flatnonzero(~compiled.is_leaf)
+        if inner.size and compiled.feature[inner].max() >= n_features:
+            raise ValueError(f"El bosque usa más características que las {n_features} de feature_names")
+        parent = np.full(len(value), -1, dtype=np.int64)
+        split_feature = np.zeros(len(value), dtype=np.int64)
+        for children in (compiled.left[inner], compiled.right[inner]):
+            parent[children] = inner
+            split_feature[children] = compiled.feature[inner]
+
+        leaves = np.flatnonzero(compiled.is_leaf)
+        # nodo global -> fila de hoja (-1 en nodos internos)
+        self._leaf_row = np.full(len(value), -1, dtype=np.int64)
+        self._leaf_row[leaves] = np.arange(len(leaves))
+        self.leaf_proba = value[leaves]
+        self.bias = value[self.roots].mean(axis=0)
+
+        # se sube de cada hoja a la raíz anotando (hoja, característica del corte, cambio de valor)
+        rows, features, deltas = [], [], []
+        node, row = leaves, np.arange(len(leaves))
+        while True:
+            up = parent[node] >= 0
+            node, row = node[up], row[up]
+            if not node.size:
+                break
+            rows.append(row)
+            features.append(split_feature[node])
+            deltas.append(value[node] - value[parent[node]])
+            node = parent[node]
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        features = np.concatenate(features) if features else np.zeros(0, dtype=np.int64)
+        deltas = np.concatenate(deltas) if deltas else np.zeros((0, len(self.classes)))
+        # una matriz hojas x características por clase; los cortes repetidos se suman
+        self._leaf_contributions = [
+            sparse.csr_matrix((deltas[:, k], (rows, features)), shape=(len(leaves), n_features))
+            for k in range(len(self.classes))
+        ]
+
+    @classmethod
+    def from_pipeline(cls, pipeline, **kwargs):
+        return cls(pipeline[-1], pipeline.named_steps['prep'].get_feature_names(), **kwargs)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Fila de hoja (en ``leaf_proba``) alcanzada por cada fila en cada árbol: (n_filas, n_árboles)."""
+        if self.trees is None:
+            if sparse.issparse(X):
+                X = X.toarray()
+            return self._leaf_row[self.compiled.apply(np.asarray(X, dtype=np.float32))]
+        # Tree.apply exige float32 (CSR si es disperso), igual que predict_proba
+        X = sparse.csr_matrix(X, dtype=np.float32) if sparse.issparse(X) else np.asarray(X, dtype=np.float32)
+        nodes = np.empty((X.shape[0], self.n_trees), dtype=np.int64)
+        for t, tree in enumerate(self.trees):
+            nodes[:, t] = tree.apply(X)
+        return self._leaf_row[nodes + self.roots]
+
+    def _contributions(self, leaves, target):
+        n, n_trees = leaves.shape
+        indicator = sparse.csr_matrix(
+            (np.ones(leaves.size), leaves.ravel(), np.arange(0, leaves.size + 1, n_trees)),
+            shape=(n, len(self.leaf_proba)))
+        out = np.zeros((n, len(self.feature_names)))
+        for k in np.unique(target):
+            rows = np.flatnonzero(target == k)
+            out[rows] = (indicator[rows] @ self._leaf_contributions[k]).toarray()
+        return out / n_trees
+
+    def contributions(self, X, target=None):
+        """Matriz completa (filas, características) de contribuciones a la clase ``target``.
+
+        ``target`` es un índice de clase por fila (o uno solo para todas); por
+        defecto la clase predicha. Devuelve ``(probabilidades, target, contribuciones)``.
+        """
+        leaves = self.apply(X)
+        probs = self.leaf_proba[leaves].sum(axis=1) / self.n_trees
+        if target is None:
+            target = probs.argmax(axis=1)
+        target = np.broadcast_to(np.asarray(target, dtype=np.int64), (len(probs),))
+        return probs, target, self._contributions(leaves, target)
+
+    def explain(self, X, top_k=DEFAULT_TOP_K):
+        """Probabilidades y ``Explanation`` de la clase predicha, por bloques de ``block_rows`` filas."""
+        n = X.shape[0]
+        k = min(top_k, len(self.feature_names))
+        probs = np.empty((n, len(self.classes)))
+        target = np.empty(n, dtype=np.int64)
+        features = np.empty((n, k), dtype=np.int32)
+        values = np.empty((n, k))
+        for start in range(0, n, self.block_rows):
+            stop = min(start + self.block_rows, n)
+            probs[start:stop], target[start:stop], block = self.contributions(X[start:stop])
+            features[start:stop], values[start:stop] = top_contributions(block, k)
+        return probs, Explanation(target, self.bias[target], features, values)
+
+    def columns(self, explanation):
+        """Columnas para la salida de lotes: ``reason_i`` (característica) y ``reason_i_contribution``."""
+        names = np.asarray(self.feature_names, dtype=object)[explanation.features]
+        columns = {'explain_bias': explanation.bias}
+        for i in range(names.shape[1]):
+            columns[f'reason_{i + 1}'] = names[:, i]
+            columns[f'reason_{i + 1}_contribution'] = explanation.contributions[:, i]
+        return columns
+
+    def describe(self, explanation, decimals=None):
+        """Lista JSON-serializable (una entrada por fila) de una ``Explanation``."""
+        values = explanation.contributions
+        bias = explanation.bias
+        if decimals is not None:
+            values, bias = values.round(decimals), bias.round(decimals)
+        names = np.asarray(self.feature_names, dtype=object)[explanation.features].tolist()
+        classes = [str(c) for c in self.classes[explanation.target]]
+        return [
+            {'class': c, 'bias': b, 'contributions': [{'feature': f, 'contribution': v} for f, v in zip(fs, vs)]}
+            for c, b, fs, vs in zip(classes, bias.tolist(), names, values.tolist())
+        ]
@@ -0,0 +1,228 @@
+"""Formatos de entrada/salida del scoring por lotes: CSV, Parquet y Arrow IPC (Feather v2).
+
+Los formatos columnares se leen por bloques (row groups / record batches)
+sin pasar por el parser de texto y se escriben comprimidos, con las columnas
+de texto codificadas como diccionario y las probabilidades en float32.
+pyarrow solo se importa al usar Parquet/Feather; el camino CSV no lo necesita.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# nombre -> (extensión, mimetype de la respuesta)
+FORMATS = {
+    'csv': ('.csv', 'text/csv'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+    'feather': ('.arrow', 'application/vnd.apache.arrow.file'),
+}
+# mimetypes y extensiones aceptados para cada formato
+_MIMETYPES = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/vnd.apache.parquet': 'parquet',
+    'application/x-parquet': 'parquet',
+    'application/parquet': 'parquet',
+    'application/vnd.apache.arrow.file': 'feather',
+    'application/x-feather': 'feather',
+    'application/feather': 'feather',
+}
+_EXTENSIONS = {'.csv': 'csv', '.parquet': 'parquet', '.pq': 'parquet',
+               '.arrow': 'feather', '.feather': 'feather', '.ipc': 'feather'}
+# firmas al inicio del archivo
+_MAGIC = ((b'PAR1', 'parquet'), (b'ARROW1', 'feather'))
+
+DEFAULT_COMPRESSION = 'zstd'
+
+
+def normalize_format(name):
+    """Acepta nombre, extensión o mimetype; ValueError si no es un formato conocido."""
+    key = str(name).strip().lower()
+    fmt = key if key in FORMATS else _MIMETYPES.get(key) or _EXTENSIONS.get(key) or _EXTENSIONS.get('.' + key)
+    if fmt is None:
+        raise ValueError(f"Formato no soportado: {name!r} (usa uno de {list(FORMATS)})")
+    return fmt
+
+
+def detect_format(filename=None, mimetype=None, stream=None):
+    """Formato de un archivo subido: mimetype, luego extensión, luego firma; CSV por defecto."""
+    if mimetype and mimetype.lower() in _MIMETYPES:
+        return _MIMETYPES[mimetype.lower()]
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext in _EXTENSIONS:
+        return _EXTENSIONS[ext]
+    if stream is not None and hasattr(stream, 'seek'):
+        head = stream.read(8)
+        stream.seek(0)
+        for magic, fmt in _MAGIC:
+            if head.startswith(magic):
+                return fmt
+    return 'csv'
+
+
+def extension(fmt):
+    return FORMATS[fmt][0]
+
+
+def mimetype_for(filename):
+    fmt = _EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+    return FORMATS[fmt][1] if fmt else None
+
+
+def _open_arrow(source):
+    import pyarrow as pa
+    # las rutas se mapean en memoria: los record batches no se copian al leerlos
+    return pa.memory_map(source) if isinstance(source, (str, os.PathLike)) else source
+
+
+def _to_frame(batch):
+    """DataFrame de un record batch con las columnas diccionario como texto (object).
+
+    ``to_pandas`` devuelve las columnas diccionario (las que escribe
+    ``ArrowResultWriter``) como ``category``; el resto del pipeline espera
+    texto, como al leer CSV.
+    """
+    df = batch.to_pandas()
+    for name in df.columns:
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].astype(object)
+    return df
+
+
+def iter_chunks(source, fmt, chunksize):
+    """DataFrames de como máximo ``chunksize`` filas leídos de ``source`` (ruta o archivo)."""
+    if fmt == 'csv':
+        with pd.read_csv(source, chunksize=chunksize) as reader:
+            yield from reader
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield _to_frame(batch)
+    elif fmt == 'feather':
+        import pyarrow.ipc as ipc
+        reader = ipc.open_file(_open_arrow(source))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunksize):
+                yield _to_frame(batch.slice(start, chunksize))
+    else:
+        raise ValueError(f"Formato no soportado: {fmt!r}")
+
+
+def count_rows(path, fmt='csv'):
+    """Número de filas de datos; en Parquet/Feather se lee de los metadatos."""
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(path).metadata.num_rows
+    if fmt == 'feather':
+        import pyarrow.ipc as ipc
+        reader = ipc.open_file(_open_arrow(path))
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    # CSV: líneas sin la cabecera, leyendo en bloques de 1 MB
+    lines = 0
+    last = b''
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(1 << 20), b''):
+            lines += buf.count(b'\n')
+            last = buf
+    if last and not last.endswith(b'\n'):
+        lines += 1
+    return max(lines - 1, 0)
+
+
+class CsvResultWriter:
+    def __init__(self, out_path):
+        self.out_path = out_path
+        self._first = True
+
+    def write(self, chunk, prob_columns):
+        chunk.to_csv(self.out_path, mode='w' if self._first else 'a', header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        pass
+
+
+class ArrowResultWriter:
+    """Escribe bloques a Parquet o Arrow IPC con un esquema fijo.
+
+    Las columnas de texto se codifican contra un diccionario que solo crece
+    (las categorías nuevas se añaden al final), así que cada bloque reutiliza
+    los códigos anteriores y en IPC se emiten deltas de diccionario. Los
+    numéricos pasan a float64 para que el esquema no dependa de si un bloque
+    trae NaN, y las probabilidades se guardan en float32.
+    """
+
+    def __init__(self, out_path, fmt, compression=DEFAULT_COMPRESSION):
+        self.out_path = out_path
+        self.fmt = fmt
+        self.compression = compression
+        self._dictionaries = {}
+        self._schema = None
+        self._writer = None
+
+    def _dictionary_array(self, name, values):
+        import pyarrow as pa
+        values = values.where(values.notna(), None).astype(object)
+        index = self._dictionaries.get(name, pd.Index([], dtype=object))
+        uniques = pd.unique(values[values.notna()].astype(str))
+        new = uniques[index.get_indexer(uniques) < 0]
+        if len(new):
+            index = self._dictionaries[name] = index.append(pd.Index(new, dtype=object))
+        codes = index.get_indexer(values.where(values.isna(), values.astype(str)))
+        return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32(), mask=codes < 0),
+                                              pa.array(index.to_numpy(), type=pa.string()))
+
+    def _to_batch(self, chunk, prob_columns):
+        import pyarrow as pa
+        arrays, names = [], []
+        for name in chunk.columns:
+            col = chunk[name]
+            if name in prob_columns:
+                arr = pa.array(col.to_numpy(dtype=np.float32))
+            elif col.dtype == object or isinstance(col.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(col.dtype):
+                arr = self._dictionary_array(name, col)
+            elif pd.api.types.is_bool_dtype(col.dtype) or pd.api.types.is_datetime64_any_dtype(col.dtype):
+                arr = pa.array(col)
+            elif pd.api.types.is_numeric_dtype(col.dtype):
+                arr = pa.array(col.to_numpy(dtype=np.float64, na_value=np.nan), from_pandas=True)
+            else:
+                arr = pa.array(col.astype(str))
+            arrays.append(arr)
+            names.append(str(name))
+        batch = pa.RecordBatch.from_arrays(arrays, names=names)
+        if self._schema is not None and batch.schema != self._schema:
+            batch = pa.Table.from_batches([batch]).cast(self._schema).to_batches()[0]
+        return batch
+
+    def _open(self, schema):
+        import pyarrow.parquet as pq
+        import pyarrow.ipc as ipc
+        self._schema = schema
+        if self.fmt == 'parquet':
+            self._writer = pq.ParquetWriter(self.out_path, schema, compression=self.compression,
+                                            use_dictionary=True)
+        else:
+            options = ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+            self._writer = ipc.new_file(self.out_path, schema, options=options)
+
+    def write(self, chunk, prob_columns):
+        batch = self._to_batch(chunk, set(prob_columns))
+        if self._writer is None:
+            self._open(batch.schema)
+        if self.fmt == 'parquet':
+            import pyarrow as pa
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def result_writer(out_path, fmt, compression=DEFAULT_COMPRESSION):
+    if fmt == 'csv':
+        return CsvResultWriter(out_path)
+    return ArrowResultWriter(out_path, fmt, compression=compression)
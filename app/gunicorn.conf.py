@@ -0,0 +1,50 @@
+"""Configuración de gunicorn para producción: ``gunicorn -c gunicorn.conf.py app:app``.
+
+Con ``preload_app`` el proceso maestro importa ``app.py`` y carga el modelo
+(``MODEL_LOAD=preload``) antes de hacer fork de los workers: los arrays del
+bosque quedan en páginas compartidas copy-on-write en lugar de una copia por
+worker. ``gc.freeze()`` mueve esos objetos a una generación permanente para
+que el recolector de cada worker no los recorra ni escriba en sus cabeceras
+(lo que copiaría las páginas). Cada worker abre su propia conexión SQLite
+(``Database`` descarta en el hijo las heredadas) y arranca su hilo de
+recarga en caliente en la primera petición.
+
+Variables: ``WEB_WORKERS`` (procesos, por defecto uno por CPU),
+``WEB_THREADS`` (hilos por worker), ``WEB_TIMEOUT``, ``WEB_PRELOAD`` (1 | 0),
+``WEB_GC_FREEZE`` (1 | 0), ``WEB_MAX_REQUESTS`` (0 = sin reciclado), ``PORT``.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1))
+# gthread: hilos dentro de cada worker para las peticiones que esperan E/S (SQLite, subidas)
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+# /batch_predict?sync=1 puntúa el archivo dentro de la petición
+timeout = int(os.environ.get('WEB_TIMEOUT', 300))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+GC_FREEZE = os.environ.get('WEB_GC_FREEZE', '1') == '1'
+accesslog = '-'
+errorlog = '-'
+
+if preload_app:
+    # el maestro carga el modelo de forma síncrona y sin hilos antes del fork
+    os.environ.setdefault('MODEL_LOAD', 'preload')
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    import app
+    # el maestro no atiende peticiones: su conexión no debe heredarse abierta
+    app.db.close()
+    if GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+    server.log.info("Model %s preloaded in master (%d objects frozen)",
+                    app.registry.version, gc.get_freeze_count())
@@ -0,0 +1,164 @@
+"""Actualización incremental del modelo con viajes recién etiquetados.
+
+En lugar de reentrenar los 400 árboles sobre todo el historial, cada
+actualización entrena un bosque pequeño solo con los datos nuevos y lo añade
+a un ``RollingForest``: un conjunto de bosques por periodo cuyo
+``predict_proba`` es la media por árbol de todos ellos (lo mismo que un único
+bosque con todos esos árboles). Los miembros más antiguos que ``max_age_days``
+o que sobran de ``max_members`` se descartan.
+
+No se usa ``warm_start`` de sklearn porque un lote nuevo sin alguna clase
+reinicia ``classes_`` del bosque, y porque los árboles nuevos deben poder usar
+las categorías que aparecen después del entrenamiento. Aquí cada miembro
+guarda sus clases (se alinean por nombre) y su número de columnas:
+``RidePreprocessor.extend`` añade las categorías nuevas como columnas al final
+de la matriz, así que los miembros antiguos leen solo su prefijo y lo ven
+igual que cuando se entrenaron.
+"""
+import time
+from typing import NamedTuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import RandomForestClassifier
+
+DEFAULT_TREES = 50
+DEFAULT_MAX_MEMBERS = 12
+# parámetros del bosque base que heredan los bosques nuevos
+INHERITED_PARAMS = ('criterion', 'max_depth', 'min_samples_split', 'min_samples_leaf', 'max_features',
+                    'class_weight', 'bootstrap')
+
+
+class Member(NamedTuple):
+    estimator: RandomForestClassifier
+    trained_at: float
+    rows: int
+    n_features: int
+
+
+class RollingForest(BaseEstimator, ClassifierMixin):
+    """Conjunto de ``RandomForestClassifier`` por periodo con clases y columnas alineadas (solo inferencia)."""
+
+    def __init__(self, members=None):
+        self.members = members
+
+    @property
+    def classes_(self):
+        return np.unique(np.concatenate([m.estimator.classes_ for m in self.members]))
+
+    @property
+    def n_estimators(self):
+        return sum(m.estimator.n_estimators for m in self.members)
+
+    @property
+    def n_features_in_(self):
+        return max(m.n_features for m in self.members)
+
+    @property
+    def n_jobs(self):
+        return self.members[-1].estimator.n_jobs
+
+    @n_jobs.setter
+    def n_jobs(self, value):
+        for m in self.members:
+            m.estimator.n_jobs = value
+
+    def class_indices(self, member):
+        """Columna de ``classes_`` de cada clase de ``member``."""
+        return np.searchsorted(self.classes_, member.estimator.classes_)
+
+    def fit(self, X, y=None):
+        raise TypeError("RollingForest se amplía con incremental.update_pipeline")
+
+    def predict_proba(self, X):
+        classes = self.classes_
+        out = np.zeros((X.shape[0], len(classes)))
+        for m in self.members:
+            Xm = X[:, :m.n_features] if X.shape[1] > m.n_features else X
+            # media por árbol: cada miembro pesa tanto como árboles tiene
+            out[:, self.class_indices(m)] += m.estimator.predict_proba(Xm) * m.estimator.n_estimators
+        return out / self.n_estimators
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+    @property
+    def feature_importances_(self):
+        total = np.zeros(self.n_features_in_)
+        for m in self.members:
+            total[:m.n_features] += m.estimator.feature_importances_ * m.estimator.n_estimators
+        return total / self.n_estimators
+
+
+def _as_rolling(model, trained_at):
+    if isinstance(model, RollingForest):
+        return model
+    if not isinstance(model, RandomForestClassifier):
+        raise TypeError(f"La actualización incremental necesita un RandomForestClassifier, no {type(model).__name__}")
+    return RollingForest([Member(model, trained_at, None, model.n_features_in_)])
+
+
+def evict(members, now, max_members=DEFAULT_MAX_MEMBERS, max_age_days=None):
+    """Quita los miembros más antiguos que ``max_age_days`` y los que exceden ``max_members``; el último siempre queda."""
+    kept = list(members)
+    if max_age_days is not None:
+        cutoff = now - max_age_days * 86400
+        kept = [m for m in kept[:-1] if m.trained_at >= cutoff] + kept[-1:]
+    if max_members and len(kept) > max_members:
+        kept = kept[-max_members:]
+    return kept
+
+
+def update_pipeline(pipeline, X_new, y_new, n_estimators=DEFAULT_TREES, max_members=DEFAULT_MAX_MEMBERS,
+                    max_age_days=None, base_trained_at=None, random_state=None, n_jobs=-1, now=None):
+    """Añade al ``pipeline`` un bosque entrenado solo con ``X_new``/``y_new``. Modifica el pipeline y lo devuelve.
+
+    El coste es el de transformar y entrenar sobre las filas nuevas: el
+    historial no se vuelve a leer. Devuelve ``(pipeline, info)``.
+    """
+    now = time.time() if now is None else now
+    prep, model = pipeline[:-1], pipeline.steps[-1][1]
+    rolling = _as_rolling(model, base_trained_at if base_trained_at is not None else now)
+    base = rolling.members[-1].estimator
+
+    t0 = time.perf_counter()
+    added = pipeline.named_steps['prep'].extend(X_new)
+    X = prep.transform(X_new)
+    t1 = time.perf_counter()
+    params = {k: v for k, v in base.get_params().items() if k in INHERITED_PARAMS}
+    seed = random_state if random_state is not None else int(now) % (2 ** 31)
+    forest = RandomForestClassifier(n_estimators=n_estimators, random_state=seed, n_jobs=n_jobs, **params)
+    forest.fit(X, np.asarray(y_new))
+    forest.n_jobs = base.n_jobs
+    t2 = time.perf_counter()
+
+    before = len(rolling.members) + 1
+    rolling.members = evict(rolling.members + [Member(forest, now, len(X_new), X.shape[1])],
+                            now, max_members=max_members, max_age_days=max_age_days)
+    pipeline.steps[-1] = (pipeline.steps[-1][0], rolling)
+    info = {
+        'rows': len(X_new),
+        'trees_added': n_estimators,
+        'added_categories': added,
+        'n_features': X.shape[1],
+        'members': len(rolling.members),
+        'evicted': before - len(rolling.members),
+        'total_trees': rolling.n_estimators,
+        'classes': rolling.classes_.tolist(),
+        'timings_seconds': {'transform': t1 - t0, 'fit': t2 - t1},
+    }
+    return pipeline, info
+
+
+def iter_trees(forest):
+    """``(árbol sklearn, columnas de classes_ de sus hojas)`` de un RandomForest o un RollingForest."""
+    if isinstance(forest, RollingForest):
+        for m in forest.members:
+            columns = forest.class_indices(m)
+            for est in m.estimator.estimators_:
+                yield est.tree_, columns
+    else:
+        columns = np.arange(len(forest.classes_))
+        for est in forest.estimators_:
+            yield est.tree_, columns
+
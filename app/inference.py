@@ -0,0 +1,98 @@
+"""Fachada de inferencia sobre el pipeline entrenado.
+
+``Pipeline.predict`` y ``Pipeline.predict_proba`` ejecutan cada uno el
+``RidePreprocessor.transform`` completo y recorren todos los árboles. Aquí se
+transforma una sola vez, se obtienen las probabilidades una sola vez y la
+etiqueta se deriva con argmax sobre ``classes_`` (lo mismo que hace
+``RandomForestClassifier.predict`` internamente).
+
+Con ``explain=k`` las probabilidades y las ``k`` características que más
+aportan a la clase predicha salen del mismo recorrido de los árboles
+(``explain.ForestExplainer``, construido la primera vez que se pide).
+"""
+import threading
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from preprocessing import prepare_features
+
+STAGES = ('prepare', 'transform', 'predict', 'explain')
+
+
+class InferenceResult(NamedTuple):
+    labels: np.ndarray
+    probabilities: np.ndarray
+    timings: dict
+    # explain.Explanation si se pidió ``explain``
+    explanation: Optional[tuple] = None
+
+
+class InferenceEngine:
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+        self.transformer = pipeline[:-1]
+        self.estimator = pipeline[-1]
+        self.classes = np.asarray(self.estimator.classes_)
+        self._lock = threading.Lock()
+        self._totals = {stage: 0.0 for stage in STAGES}
+        self._calls = 0
+        self._rows = 0
+        self._explainer = None
+
+    @property
+    def explainer(self):
+        if self._explainer is None:
+            from explain import ForestExplainer
+            with self._lock:
+                if self._explainer is None:
+                    self._explainer = ForestExplainer.from_pipeline(self.pipeline)
+        return self._explainer
+
+    def predict_with_proba(self, df, prepared=False, explain=0):
+        """Etiquetas y probabilidades de ``df`` en una sola pasada por el pipeline.
+
+        Si ``prepared`` es False se aplica antes ``prepare_features``. Con
+        ``explain=k`` el resultado incluye la ``Explanation`` de las ``k``
+        características principales; ese recorrido cuenta como etapa ``explain``.
+        """
+        timings = {}
+        t0 = time.perf_counter()
+        if not prepared:
+            df = prepare_features(df)
+        t1 = time.perf_counter()
+        X = self.transformer.transform(df)
+        t2 = time.perf_counter()
+        explanation = None
+        if explain:
+            probs, explanation = self.explainer.explain(X, explain)
+        else:
+            probs = self.estimator.predict_proba(X)
+        t3 = time.perf_counter()
+        labels = self.classes[probs.argmax(axis=1)]
+
+        timings['prepare'] = t1 - t0
+        timings['transform'] = t2 - t1
+        timings['predict'] = 0.0 if explain else t3 - t2
+        if explain:
+            timings['explain'] = t3 - t2
+        timings['total'] = t3 - t0
+        self._record(timings, len(probs))
+        return InferenceResult(labels, probs, timings, explanation)
+
+    def _record(self, timings, rows):
+        with self._lock:
+            for stage in STAGES:
+                self._totals[stage] += timings.get(stage, 0.0)
+            self._calls += 1
+            self._rows += rows
+
+    def stats(self):
+        """Tiempos acumulados (segundos) por etapa desde que se creó el motor."""
+        with self._lock:
+            return {
+                'calls': self._calls,
+                'rows': self._rows,
+                'seconds': dict(self._totals),
+            }
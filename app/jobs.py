@@ -0,0 +1,194 @@
+"""Cola local de trabajos de predicción por lotes.
+
+``/batch_predict`` guarda el archivo subido y encola un trabajo; un
+``ProcessPoolExecutor`` lo procesa con ``score_stream`` fuera del hilo
+HTTP. El estado y el progreso viven en la tabla ``batch_jobs`` de la misma
+base SQLite, así que cualquier worker de Flask puede consultarlos sin broker
+externo.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+import joblib
+
+from batch import score_stream, DEFAULT_CHUNKSIZE
+from database import Database
+from formats import count_rows
+from metrics import StageTimer, ROWS_REJECTED, STAGE_SECONDS, record_batch, record_stages
+from inference import InferenceEngine
+from sharded import ShardedScorer, mp_context
+
+# Estado por proceso worker. Con fork el motor del proceso padre se hereda
+# (páginas compartidas copy-on-write); con forkserver/spawn se carga en _init_worker.
+_engine = None
+_db = None
+_model_version = None
+_validator = None
+
+
+def _init_worker(model_path, db_name, scoring_workers, model_version, validator=None):
+    global _engine, _db, _model_version, _validator
+    _model_version = model_version
+    _validator = validator
+    if _engine is None:
+        _engine = InferenceEngine(joblib.load(model_path, mmap_mode='r'))
+    if scoring_workers > 1:
+        # cada trabajo reparte sus bloques entre scoring_workers procesos. Un worker
+        # recién creado solo tiene el hilo principal (app.py no arranca nada al
+        # reimportarse como __mp_main__) y sus fragmentos heredan el modelo con
+        # fork; si ya hubiera otros hilos, fork no es seguro y se usa mp_context()
+        if threading.active_count() == 1 and 'fork' in multiprocessing.get_all_start_methods():
+            start_method = 'fork'
+        else:
+            start_method = None
+        _engine = ShardedScorer(model_path, scoring_workers, engine=_engine, start_method=start_method)
+        # el pool anidado se cierra al salir el worker: sus procesos no son
+        # daemon y, sin esto, el worker los esperaría para siempre al terminar.
+        # Prioridad por encima de la de las colas del pool (10), que deben seguir
+        # abiertas para enviar a cada proceso su señal de fin
+        Finalize(_engine, _engine.shutdown, exitpriority=100)
+    _db = Database(db_name)
+
+
+def run_job(job_id, input_path, out_path, chunksize, input_format='csv', output_format=None, rejects_path=None,
+            explain=0):
+    """Ejecuta un trabajo en el proceso worker y registra progreso en ``batch_jobs``.
+
+    Las filas que no pasan la validación van a ``rejects_path`` (si hay alguna).
+    ``explain=k`` añade a la salida las ``k`` características principales de cada predicción.
+
+    Devuelve ``(filas, segundos, etapas, rechazadas)`` para que el proceso web registre
+    las métricas del trabajo, o None si falló.
+    """
+    started = time.perf_counter()
+    timer = StageTimer()
+    _db.update_job(job_id, status='running', started_at=time.time(),
+                   total_rows=count_rows(input_path, input_format))
+    # se escribe a un temporal y se renombra al final: /download_predictions
+    # nunca sirve un archivo a medias
+    part_path = out_path + '.part'
+    try:
+        report = score_stream(
+            input_path, part_path, _engine, db=_db, chunksize=chunksize, batch_id=job_id,
+            on_chunk=lambda r: _db.update_job(job_id, rows_processed=r.processed),
+            input_format=input_format, output_format=output_format, model_version=_model_version,
+            timer=timer, validator=_validator, rejects_path=rejects_path, explain=explain,
+        )
+        os.replace(part_path, out_path)
+        summary = dict(report.to_dict(), model_version=_model_version)
+        if report.rejected and rejects_path:
+            summary['rejects_file'] = os.path.basename(rejects_path)
+        _db.update_job(job_id, status='done', rows_processed=report.processed,
+                       finished_at=time.time(), report=summary)
+        return report.total, time.perf_counter() - started, timer.stages, report.rejected
+    except Exception as e:
+        _db.update_job(job_id, status='failed', error=str(e), finished_at=time.time())
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        return None
+    finally:
+        if os.path.exists(input_path):
+            os.remove(input_path)
+
+
+def _record_job_metrics(future):
+    # se ejecuta en el proceso web: los workers no exponen métricas propias
+    if future.cancelled() or future.exception() is not None or future.result() is None:
+        return
+    rows, seconds, stages, rejected = future.result()
+    record_stages('batch_job', stages)
+    record_batch('batch_job', rows, seconds)
+    if rejected:
+        ROWS_REJECTED.inc(rejected, endpoint='batch_job')
+    STAGE_SECONDS.observe(seconds, endpoint='batch_job', stage='total')
+
+
+class JobManager:
+    def __init__(self, db, model_path=None, max_workers=2, engine=None, scoring_workers=1, model_version=None,
+                 validator=None, start_method=None):
+        self.db = db
+        self.model_path = model_path
+        self.max_workers = max_workers
+        self.scoring_workers = scoring_workers
+        self.engine = engine
+        self.model_version = model_version
+        self.validator = validator
+        # None: forkserver donde existe (ver sharded.mp_context)
+        self.start_method = start_method
+        self._executor = None
+        self._lock = threading.Lock()
+        interrupted = db.fail_interrupted_jobs()
+        if interrupted:
+            print(f"Marked {interrupted} interrupted batch jobs as failed")
+
+    def set_model(self, model_path, engine, model_version, validator=None):
+        """Usa otro modelo para los trabajos nuevos; los que ya corren terminan con el anterior."""
+        with self._lock:
+            old, self._executor = self._executor, None
+            self.model_path, self.engine, self.model_version = model_path, engine, model_version
+            self.validator = validator
+        if old is not None:
+            old.shutdown(wait=False)
+
+    def _get_executor(self):
+        global _engine
+        if self._executor is None:
+            ctx = mp_context(self.start_method)
+            if ctx.get_start_method() == 'fork':
+                # los workers heredan el modelo ya cargado en este proceso
+                _engine = self.engine
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self.model_path, self.db.db_name, self.scoring_workers, self.model_version,
+                          self.validator),
+            )
+        return self._executor
+
+    def submit(self, job_id, input_path, out_path, chunksize=DEFAULT_CHUNKSIZE, input_format='csv',
+               output_format=None, rejects_path=None, explain=0):
+        self.db.create_job(job_id, input_path, os.path.basename(out_path))
+        with self._lock:
+            executor = self._get_executor()
+        future = executor.submit(run_job, job_id, input_path, out_path, chunksize,
+                                 input_format, output_format, rejects_path, explain)
+        future.add_done_callback(_record_job_metrics)
+        return job_id
+
+    def status(self, job_id):
+        """Estado del trabajo con throughput (filas/s) y ETA estimada en segundos."""
+        job = self.db.get_job(job_id)
+        if job is None:
+            return None
+        throughput = eta = None
+        if job['started_at']:
+            end = job['finished_at'] or time.time()
+            elapsed = max(end - job['started_at'], 1e-9)
+            throughput = job['rows_processed'] / elapsed
+            if job['status'] == 'running' and throughput > 0 and job['total_rows']:
+                eta = max(job['total_rows'] - job['rows_processed'], 0) / throughput
+        status = {
+            'job_id': job['id'],
+            'status': job['status'],
+            'rows_processed': job['rows_processed'],
+            'total_rows': job['total_rows'],
+            'throughput_rows_per_sec': throughput,
+            'eta_seconds': eta,
+            'error': job['error'],
+            'report': job['report'],
+        }
+        if job['status'] == 'done':
+            status['download_url'] = f"/download_predictions/{job['output_file']}"
+            rejects_file = (job['report'] or {}).get('rejects_file')
+            if rejects_file:
+                status['rejects_url'] = f"/download_predictions/{rejects_file}"
+        return status
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
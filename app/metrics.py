@@ -0,0 +1,211 @@
+"""Métricas en proceso con exposición en formato de texto de Prometheus.
+
+Contadores, gauges e histogramas sin dependencias externas: cada ``observe``
+es una búsqueda binaria en los límites del histograma y unas sumas bajo un
+lock, así que se puede dejar activo en producción. ``StageTimer`` acumula el
+tiempo por etapa de una petición (parse, prepare, transform, predict,
+db_write, output_write); al terminar, la petición vuelca sus etapas en el
+histograma ``ride_stage_seconds``.
+
+Con varios workers (gunicorn) cada proceso expone sus propias series; el
+scraper las distingue por instancia.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# segundos: de 100 µs a 1 min
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# filas por lote
+SIZE_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}, recibió {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = list(self._series.items())
+        for key, value in sorted(series):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # conteos por bucket (no acumulados) + suma + número de observaciones
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, key, value):
+        counts, total, n = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {n}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """``fn()`` se llama en cada ``render`` para actualizar gauges derivados (caché, modelo...)."""
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception:
+                pass
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Segundos acumulados por etapa dentro de una petición o un trabajo."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def time(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - t0)
+
+    def add_inference(self, timings):
+        """Vuelca las etapas de un ``InferenceResult.timings``."""
+        for stage in ('prepare', 'transform', 'predict', 'explain'):
+            if stage in timings:
+                self.add(stage, timings[stage])
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = MetricsRegistry()
+REQUESTS = registry.counter('ride_requests_total', "Peticiones HTTP atendidas", ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = registry.histogram('ride_request_seconds', "Latencia de las peticiones HTTP", ('endpoint',))
+IN_FLIGHT = registry.gauge('ride_requests_in_flight', "Peticiones en curso", ('endpoint',))
+STAGE_SECONDS = registry.histogram('ride_stage_seconds', "Tiempo por etapa y petición/trabajo",
+                                   ('endpoint', 'stage'))
+BATCH_ROWS = registry.histogram('ride_batch_rows', "Filas por petición o trabajo", ('endpoint',),
+                                buckets=SIZE_BUCKETS)
+ROWS_SCORED = registry.counter('ride_rows_scored_total', "Filas puntuadas (rate() = filas/s)", ('endpoint',))
+ROWS_REJECTED = registry.counter('ride_rows_rejected_total', "Filas rechazadas por la validación", ('endpoint',))
+ROWS_PER_SECOND = registry.gauge('ride_last_batch_rows_per_second', "Throughput del último lote", ('endpoint',))
+
+
+def record_stages(endpoint, stages):
+    for stage, seconds in stages.items():
+        STAGE_SECONDS.observe(seconds, endpoint=endpoint, stage=stage)
+
+
+def record_batch(endpoint, rows, seconds):
+    BATCH_ROWS.observe(rows, endpoint=endpoint)
+    ROWS_SCORED.inc(rows, endpoint=endpoint)
+    if seconds > 0:
+        ROWS_PER_SECOND.set(rows / seconds, endpoint=endpoint)
@@ -0,0 +1,254 @@
+"""Registro del modelo servido: carga diferida o en segundo plano, warmup y recarga en caliente.
+
+Los artefactos viven en ``models/`` como ``<base>.joblib`` (sin versión) o
+``<base>-<versión>.joblib`` (``.compiled.joblib`` con ``MODEL_FORMAT=compiled``);
+se sirve la versión más alta (orden natural: ``v10`` > ``v9``). Cada carga
+produce un ``ModelHandle`` inmutable: las peticiones toman el handle una vez
+con ``get()`` y lo usan hasta terminar, así que cambiar de versión es asignar
+un atributo y ninguna petición en curso se queda sin modelo.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+import traceback
+from typing import NamedTuple, Optional
+
+import joblib
+import pandas as pd
+
+from compiled_forest import load_compiled
+from inference import InferenceEngine
+
+LOAD_MODES = ('background', 'lazy', 'eager', 'preload')
+
+
+class ModelNotReady(RuntimeError):
+    """No hay modelo cargado (todavía cargando o la carga falló)."""
+
+
+class ModelHandle(NamedTuple):
+    version: str
+    path: str
+    pipeline: object
+    engine: InferenceEngine
+    loaded_at: float
+    load_seconds: float
+    warmup_seconds: Optional[float]
+    signature: tuple
+
+
+def _natural_key(version):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+
+def _signature(path):
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+class ModelRegistry:
+    def __init__(self, models_dir='models', base_name='booking_status_rf_model', model_format='joblib',
+                 warmup_path='example_batch.csv', poll_interval=5.0, min_age_seconds=2.0,
+                 started_at=None):
+        self.models_dir = models_dir
+        self.base_name = base_name
+        self.model_format = model_format
+        self.suffix = '.compiled.joblib' if model_format == 'compiled' else '.joblib'
+        self.warmup_path = warmup_path
+        # 0 desactiva la vigilancia de models/
+        self.poll_interval = poll_interval
+        # ignora archivos recién modificados (copias a medias)
+        self.min_age_seconds = min_age_seconds
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.startup_to_ready = None
+        self.swaps = 0
+        self.last_error = None
+        self._current = None
+        self._failed_signature = None
+        self._listeners = []
+        self._ready = threading.Event()
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        # modo preload: el hilo de vigilancia se arranca en el primer get() de cada worker
+        self._watch_deferred = False
+
+    # --- descubrimiento de artefactos ---
+    def artifacts(self):
+        """Lista de ``(versión, ruta)`` ordenada de menor a mayor versión."""
+        try:
+            names = os.listdir(self.models_dir)
+        except OSError:
+            return []
+        found = []
+        for name in names:
+            if not (name.startswith(self.base_name) and name.endswith(self.suffix)):
+                continue
+            if self.suffix == '.joblib' and name.endswith('.compiled.joblib'):
+                continue
+            middle = name[len(self.base_name):-len(self.suffix)]
+            if middle and not middle.startswith('-'):
+                continue
+            found.append((middle[1:] or None, os.path.join(self.models_dir, name)))
+        # las versiones explícitas tienen prioridad sobre el artefacto sin versión
+        return sorted(found, key=lambda item: (item[0] is not None, _natural_key(item[0] or '')))
+
+    def _latest(self):
+        candidates = self.artifacts()
+        if not candidates:
+            raise FileNotFoundError(f"No hay artefactos {self.base_name}*{self.suffix} en {self.models_dir}")
+        version, path = candidates[-1]
+        signature = _signature(path)
+        if version is None:
+            # sin versión en el nombre: identificador estable a partir de mtime + tamaño
+            version = 'unversioned-' + hashlib.blake2b(repr(signature[1:]).encode(), digest_size=4).hexdigest()
+        return version, path, signature
+
+    # --- carga ---
+    def _load(self, version, path, signature):
+        t0 = time.perf_counter()
+        pipeline = load_compiled(path) if self.model_format == 'compiled' else joblib.load(path)
+        engine = InferenceEngine(pipeline)
+        load_seconds = time.perf_counter() - t0
+        warmup_seconds = None
+        if self.warmup_path and os.path.exists(self.warmup_path):
+            t0 = time.perf_counter()
+            engine.predict_with_proba(pd.read_csv(self.warmup_path))
+            warmup_seconds = time.perf_counter() - t0
+        return ModelHandle(version, path, pipeline, engine, time.time(), load_seconds, warmup_seconds, signature)
+
+    def _activate(self, handle):
+        previous, self._current = self._current, handle
+        if previous is not None:
+            self.swaps += 1
+        for listener in self._listeners:
+            try:
+                listener(previous, handle)
+            except Exception:
+                traceback.print_exc()
+        if not self._ready.is_set():
+            self.startup_to_ready = time.perf_counter() - self.started_at
+            self._ready.set()
+            print(f"Model {handle.version} ready in {self.startup_to_ready:.2f}s "
+                  f"(load {handle.load_seconds:.2f}s, warmup {handle.warmup_seconds or 0:.2f}s)")
+        else:
+            print(f"Swapped model {previous.version} -> {handle.version}")
+
+    def refresh(self):
+        """Carga la versión más reciente si difiere de la servida. Devuelve True si cambió."""
+        with self._load_lock:
+            try:
+                version, path, signature = self._latest()
+            except FileNotFoundError as e:
+                self.last_error = str(e)
+                return False
+            current = self._current
+            if current is not None and current.signature == signature:
+                return False
+            if signature == self._failed_signature:
+                return False
+            if current is not None and time.time() - signature[1] / 1e9 < self.min_age_seconds:
+                return False
+            try:
+                handle = self._load(version, path, signature)
+            except Exception as e:
+                # se sigue sirviendo la versión anterior; no se reintenta hasta que el archivo cambie
+                self._failed_signature = signature
+                self.last_error = f"{os.path.basename(path)}: {e}"
+                print(f"Failed to load model {path}: {e}")
+                return False
+            self.last_error = None
+            self._activate(handle)
+            return True
+
+    def add_listener(self, fn):
+        """``fn(anterior, nuevo)`` se llama tras cada activación (anterior es None la primera vez)."""
+        self._listeners.append(fn)
+
+    # --- ciclo de vida ---
+    def start(self, mode='background'):
+        """``preload`` carga en el proceso actual sin arrancar hilos: pensado para el
+        maestro de gunicorn con ``preload_app``, que después hace fork de los workers."""
+        if mode not in LOAD_MODES:
+            raise ValueError(f"mode debe ser uno de {LOAD_MODES}, recibido: {mode}")
+        if mode in ('eager', 'preload'):
+            self.refresh()
+        if mode == 'preload':
+            self._watch_deferred = self.poll_interval > 0 or self._current is None
+        elif mode != 'lazy':
+            self._ensure_started()
+        return self
+
+    def _ensure_started(self):
+        # tras un fork (gunicorn --preload) el hilo del padre no existe en el hijo
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                if self._pid is not None:
+                    # el lock pudo quedar tomado por el hilo del padre en el momento del fork
+                    self._load_lock = threading.Lock()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='model-registry', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        if self._current is None:
+            self.refresh()
+        while self.poll_interval > 0:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+            except Exception:
+                traceback.print_exc()
+
+    def get(self, timeout=None):
+        """Handle del modelo actual; espera hasta ``timeout`` s si aún se está cargando."""
+        if self._thread is not None or self._watch_deferred:
+            self._ensure_started()
+        handle = self._current
+        if handle is not None:
+            return handle
+        if self._thread is None:
+            # modo lazy: la primera petición carga el modelo en su propio hilo
+            self.refresh()
+            if self.poll_interval > 0:
+                self._ensure_started()
+        elif self.last_error is None and not self._ready.wait(timeout):
+            raise ModelNotReady("El modelo se está cargando")
+        if self._current is None:
+            raise ModelNotReady(self.last_error or "El modelo no está disponible")
+        return self._current
+
+    @property
+    def version(self):
+        handle = self._current
+        return handle.version if handle is not None else None
+
+    @property
+    def ready(self):
+        return self._current is not None
+
+    def stats(self):
+        handle = self._current
+        info = {
+            'ready': handle is not None,
+            'status': 'ready' if handle is not None else ('failed' if self.last_error else 'loading'),
+            'format': self.model_format,
+            'startup_to_ready_seconds': self.startup_to_ready,
+            'swaps': self.swaps,
+            'last_error': self.last_error,
+            'available_versions': [v or 'unversioned' for v, _ in self.artifacts()],
+        }
+        if handle is not None:
+            info.update({
+                'version': handle.version,
+                'path': handle.path,
+                'loaded_at': handle.loaded_at,
+                'load_seconds': handle.load_seconds,
+                'warmup_seconds': handle.warmup_seconds,
+            })
+        return info
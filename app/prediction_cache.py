@@ -0,0 +1,123 @@
+"""Caché LRU/TTL de predicciones individuales.
+
+La clave es un hash canónico de los campos con los que ``/predict`` construye
+su DataFrame. ``time`` se reduce a la hora (el pipeline solo usa ``hour``) y
+los campos numéricos se pueden redondear a ``round_digits`` decimales para
+agrupar peticiones casi idénticas. La caché está acotada por número de
+entradas y por bytes, y se vacía sola cuando cambia la versión del modelo
+(por defecto: mtime + tamaño del archivo en ``MODEL_PATH``).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+CATEGORICAL_FIELDS = ('vehicle_type', 'pickup_location', 'drop_location', 'payment_method', 'day', 'month')
+NUMERIC_FIELDS = ('avg_vtat', 'avg_ctat', 'booking_value', 'ride_distance', 'driver_ratings', 'customer_rating')
+
+
+def file_version(path):
+    """Versión de un archivo como (mtime_ns, tamaño); None si no existe."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class PredictionCache:
+    def __init__(self, max_entries=10_000, max_bytes=16 * 1024 * 1024, ttl_seconds=300.0,
+                 round_digits=None, model_path=None, version_fn=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.round_digits = round_digits
+        if version_fn is None and model_path is not None:
+            version_fn = lambda: file_version(model_path)  # noqa: E731
+        self.version_fn = version_fn
+        self._version = version_fn() if version_fn else None
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def make_key(self, data):
+        """Hash canónico de un payload de /predict (lanza KeyError/ValueError como /predict)."""
+        numerics = []
+        for f in NUMERIC_FIELDS:
+            v = float(data[f])
+            if self.round_digits is not None:
+                v = round(v, self.round_digits)
+            numerics.append(v)
+        # mismo formato que exige /predict; se valida aquí para que un acierto
+        # de caché no acepte una hora que el pipeline rechazaría
+        hour = datetime.strptime(str(data['time']).strip(), '%H:%M').hour
+        canonical = [str(data['date']).strip(), hour]
+        canonical += [None if data.get(f) is None else str(data.get(f)).strip() for f in CATEGORICAL_FIELDS]
+        canonical += numerics
+        payload = json.dumps(canonical, separators=(',', ':'))
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self._version:
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+            self._counters['invalidations'] += 1
+
+    def get(self, key):
+        with self._lock:
+            self._check_version()
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def put(self, key, value):
+        size = len(key) + len(json.dumps(value))
+        with self._lock:
+            self._check_version()
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'hit_rate': self._counters['hits'] / lookups if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'round_digits': self.round_digits,
+            }
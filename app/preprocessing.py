@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
@@ -7,6 +8,10 @@ from sklearn.impute import SimpleImputer
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 from sklearn.compose import make_column_selector as selector
 
+HOUR_BIN_LABELS = ["late_night", "morning_rush", "daytime", "evening", "night"]
+# Tabla de 24 entradas equivalente a pd.cut(hour, bins=[-1,5,9,16,20,24], labels=HOUR_BIN_LABELS)
+HOUR_BIN_CODES = np.array([0] * 6 + [1] * 4 + [2] * 7 + [3] * 4 + [4] * 3, dtype=np.int8)
+
 # 1️⃣ Clase TimeFeatures
 class TimeFeatures(BaseEstimator, TransformerMixin):
     """Agrega variables temporales derivadas de date y time."""
@@ -17,29 +22,51 @@ class TimeFeatures(BaseEstimator, TransformerMixin):
         self._added = []
 
     def fit(self, X, y=None):
+        self._added = []
+        if self.date_col in X:
+            self._added += ["year","month","day_of_week","is_weekend"]
+        if self.time_col in X:
+            self._added += ["hour","hour_bin"]
         return self
 
     def transform(self, X):
-        X = X.copy()
+        return self._transform(X.copy())
+
+    def _transform(self, X, hour_bin=True):
+        """Igual que ``transform`` pero modifica ``X`` (ya copiado por el llamador).
+
+        Solo añade, reemplaza o elimina columnas; nunca escribe en los arrays
+        existentes, así que una copia superficial del llamador es suficiente.
+        """
         # date features
         if self.date_col in X:
-            X["year"] = X[self.date_col].dt.year
-            X["month"] = X[self.date_col].dt.month
-            X["day_of_week"] = X[self.date_col].dt.dayofweek  # 0=Mon
-            X["is_weekend"] = X["day_of_week"].isin([5,6]).astype(int)
-            self._added += ["year","month","day_of_week","is_weekend"]
+            dates = X[self.date_col].dt
+            X["year"] = dates.year
+            X["month"] = dates.month
+            X["day_of_week"] = dates.dayofweek  # 0=Mon
+            X["is_weekend"] = (X["day_of_week"] >= 5).astype(int)
         # time features
         if self.time_col in X:
             X["hour"] = X[self.time_col].dt.hour
-            bins = [-1,5,9,16,20,24]
-            labels = ["late_night","morning_rush","daytime","evening","night"]
-            X["hour_bin"] = pd.cut(X["hour"], bins=bins, labels=labels)
-            self._added += ["hour","hour_bin"]
+            if hour_bin:
+                X["hour_bin"] = hour_bins(X["hour"])
 
         if self.drop_original:
-            X = X.drop(columns=[c for c in [self.date_col, self.time_col] if c in X], errors="ignore")
+            for c in (self.date_col, self.time_col):
+                if c in X:
+                    del X[c]
         return X
 
+
+def hour_bins(hour):
+    """Categorical ordenado de franjas horarias a partir de la tabla HOUR_BIN_CODES."""
+    values = hour.to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(values)
+    codes = np.full(len(values), -1, dtype=np.int8)
+    codes[valid] = HOUR_BIN_CODES[values[valid].astype(int)]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=HOUR_BIN_LABELS, ordered=True),
+                     index=hour.index)
+
 # 2️⃣ Clase RareCategoryGrouper
 class RareCategoryGrouper(BaseEstimator, TransformerMixin):
     """Agrupa categorías raras como 'Other' en columnas categóricas."""
@@ -57,14 +84,55 @@ class RareCategoryGrouper(BaseEstimator, TransformerMixin):
             vc = X[c].value_counts(normalize=True, dropna=False)
             keep = set(vc[vc >= self.min_freq].index)
             self.keep_maps_[c] = keep
+        self._keep_index = self._build_keep_index()
         return self
 
+    def extend(self, X):
+        """Añade a ``keep_maps_`` las categorías que en ``X`` superan ``min_freq``.
+
+        Solo crece: nada sale del vocabulario. Las altas quedan en
+        ``added_categories_`` en orden de llegada; devuelve las de esta llamada.
+        """
+        added = getattr(self, "added_categories_", {})
+        new = {}
+        for c in self.columns:
+            if c not in X:
+                continue
+            vc = X[c].value_counts(normalize=True)
+            fresh = [v for v in vc[vc >= self.min_freq].index if v not in self.keep_maps_[c]]
+            if fresh:
+                self.keep_maps_[c] = set(self.keep_maps_[c]) | set(fresh)
+                added[c] = list(added.get(c, [])) + fresh
+                new[c] = fresh
+        self.added_categories_ = added
+        self._keep_index = self._build_keep_index()
+        return new
+
+    def _build_keep_index(self):
+        return {c: pd.Index(list(keep), dtype=object) for c, keep in self.keep_maps_.items()}
+
     def transform(self, X):
-        X = X.copy()
+        return self._transform(X.copy())
+
+    def _transform(self, X):
+        """Igual que ``transform`` pero reemplaza las columnas de ``X`` (ya copiado)."""
+        # los modelos guardados antes de esta tabla la construyen en el primer uso
+        keep_index = getattr(self, "_keep_index", None)
+        if keep_index is None:
+            keep_index = self._keep_index = self._build_keep_index()
         for c in self.columns:
             if c in X:
-                keep = self.keep_maps_[c]
-                X[c] = X[c].where(X[c].isin(keep), other=self.other_label)
+                col = X[c]
+                if isinstance(col.dtype, pd.CategoricalDtype):
+                    # un Categorical no admite "Other" si no está entre sus categorías
+                    col = col.astype(object)
+                if col.dtype != object:
+                    X[c] = col.where(col.isin(self.keep_maps_[c]), other=self.other_label)
+                    continue
+                values = col.to_numpy()
+                known = keep_index[c].get_indexer(values) >= 0
+                if not known.all():
+                    X[c] = np.where(known, values, self.other_label)
         return X
 
 class RidePreprocessor(BaseEstimator, TransformerMixin):
@@ -114,17 +182,85 @@ class RidePreprocessor(BaseEstimator, TransformerMixin):
         return self
 
     def transform(self, X):
-        X = X.copy()
-        X = self.time_features.transform(X)
-        X = self.rare.transform(X)
+        # Copia superficial: TimeFeatures y RareCategoryGrouper solo añaden o
+        # reemplazan columnas, así que no hace falta duplicar los datos de X.
+        X = X.copy(deep=False)
+        used = set(self.num_features_) | set(self.cat_features_)
+        X = self.time_features._transform(X, hour_bin="hour_bin" in used)
+        X = self.rare._transform(X)
 
         # IMPORTANT: do not remove low-variance columns at transform time.
         # ColumnTransformer was fitted with a fixed set of columns in `fit`.
         # Dropping columns here can produce a columns-mismatch error.
-        return self.column_transformer.transform(X)
+        extra = self._added_features()
+        if not extra:
+            return self.column_transformer.transform(X)
+        # Vocabulario ampliado con ``extend``: las categorías nuevas van en
+        # columnas al final y el ColumnTransformer original las sigue viendo
+        # como "Other", igual que antes de ampliarlo. Así los árboles ya
+        # entrenados reciben exactamente las mismas entradas.
+        blocks = []
+        for c, cats in self.rare.added_categories_.items():
+            values = X[c].to_numpy()
+            codes = pd.Index(cats, dtype=object).get_indexer(values)
+            rows = np.flatnonzero(codes >= 0)
+            blocks.append(sparse.csr_matrix((np.ones(len(rows)), (rows, codes[rows])),
+                                            shape=(len(X), len(cats))))
+            if len(rows):
+                X[c] = np.where(codes >= 0, self.rare.other_label, values)
+        out = self.column_transformer.transform(X)
+        if sparse.issparse(out):
+            return sparse.hstack([out] + blocks, format="csr")
+        return np.hstack([out] + [b.toarray() for b in blocks])
+
+    def _added_features(self):
+        added = getattr(self.rare, "added_categories_", None) or {}
+        return [(c, v) for c, cats in added.items() for v in cats]
+
+    def extend(self, X):
+        """Amplía el vocabulario categórico con los datos nuevos ``X`` (sin reajustar nada más).
+
+        Devuelve ``{columna: [categorías nuevas]}``. La salida de ``transform``
+        gana una columna por categoría nueva al final; las columnas existentes
+        no cambian de posición ni de significado.
+        """
+        X = self.time_features._transform(X.copy(deep=False), hour_bin=False)
+        return self.rare.extend(X[[c for c in self.cat_features_ if c in self.rare.columns and c in X]])
 
     def get_feature_names(self):
         num_names = list(self.num_features_)
         cat_ohe = self.column_transformer.named_transformers_["cat"]["onehot"]
         cat_names = cat_ohe.get_feature_names_out(self.cat_features_).tolist()
-        return num_names + cat_names
\ No newline at end of file
+        return num_names + cat_names + [f"{c}_{v}" for c, v in self._added_features()]
+
+# helper para crear features que espera el pipeline (usado por app.py y batch.py)
+def prepare_features(df: pd.DataFrame) -> pd.DataFrame:
+    # copia superficial: solo se añaden/reemplazan columnas, el df del llamador no cambia
+    df = df.copy(deep=False)
+    # asegurar tipos
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+        df['day_of_week'] = df['date'].dt.day_name()
+        df['is_weekend'] = (df['date'].dt.dayofweek >= 5).astype(int)
+        df['month'] = df['date'].dt.month
+    if 'time' in df.columns:
+        # intento 1: formato HH:MM (rápido y consistente)
+        df['time'] = pd.to_datetime(df['time'], format='%H:%M', errors='coerce')
+        # si todo salió NaT, intentar inferencia (fallback)
+        if df['time'].isna().all():
+            df['time'] = pd.to_datetime(df['time'].astype(str), errors='coerce')
+        df['hour'] = df['time'].dt.hour.fillna(0).astype(int)
+    if 'day' not in df.columns and 'day_of_week' in df.columns:
+        df['day'] = df['day_of_week']
+
+    # --- added: garantizar columnas que el pipeline espera (rellenar con NaN/0) ---
+    expected_cols = [
+        'avg_vtat', 'avg_ctat', 'booking_value', 'ride_distance',
+        'driver_ratings', 'customer_rating',
+        'month', 'day_of_week', 'is_weekend', 'hour'
+    ]
+    for c in expected_cols:
+        if c not in df.columns:
+            df[c] = np.nan
+
+    return df
@@ -0,0 +1,126 @@
+"""Scoring multi-núcleo por fragmentos de filas.
+
+``ShardedScorer`` divide un lote en fragmentos contiguos y ejecuta
+``prepare_features`` + transform + ``predict_proba`` de cada uno en un pool de
+procesos; los resultados se concatenan en el orden original.
+
+Cada worker usa ``n_jobs=1`` en el bosque para no sobresuscribir los núcleos.
+Por defecto los pools usan ``forkserver``: hacer fork de un proceso con hilos
+(el de Flask/gunicorn, el de recarga del modelo) puede dejar el hijo
+bloqueado en un lock que otro hilo tenía tomado. El servidor de forks arranca
+limpio, importa una vez los módulos de ``FORKSERVER_PRELOAD`` y cada worker
+carga el artefacto con ``joblib.load(mmap_mode='r')``: los arrays numpy se
+mapean en memoria en lugar de copiarse. Con ``start_method='fork'`` los
+workers heredan el pipeline ya cargado (páginas copy-on-write); solo es
+seguro si el proceso no tiene otros hilos, como un worker de ``jobs``.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+from explain import concat_explanations
+from inference import InferenceEngine, InferenceResult, STAGES
+
+DEFAULT_MIN_SHARD_ROWS = 2000
+# módulos que el servidor forkserver importa antes de crear workers
+FORKSERVER_PRELOAD = [
+    'numpy', 'pandas', 'scipy.sparse', 'joblib', 'sklearn.ensemble', 'sklearn.pipeline', 'sklearn.compose',
+    'preprocessing', 'inference', 'compiled_forest', 'incremental', 'explain', 'validation',
+    'formats', 'batch', 'database', 'sharded', 'jobs',
+]
+
+# Motor del proceso worker (heredado por fork o cargado en _init_shard_worker)
+_worker_engine = None
+
+
+def mp_context(start_method=None):
+    """Contexto de multiprocessing de los pools de scoring.
+
+    ``None`` usa ``forkserver`` donde existe y, si no (Windows), el método por defecto.
+    """
+    if start_method is None and 'forkserver' in multiprocessing.get_all_start_methods():
+        start_method = 'forkserver'
+    ctx = multiprocessing.get_context(start_method)
+    if ctx.get_start_method() == 'forkserver':
+        ctx.set_forkserver_preload(FORKSERVER_PRELOAD)
+    return ctx
+
+
+def _init_shard_worker(model_path, mmap_mode):
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = InferenceEngine(joblib.load(model_path, mmap_mode=mmap_mode))
+    if hasattr(_worker_engine.estimator, 'n_jobs'):
+        _worker_engine.estimator.n_jobs = 1
+
+
+def _score_shard(df, explain=0):
+    result = _worker_engine.predict_with_proba(df, explain=explain)
+    return result.labels, result.probabilities, result.timings, result.explanation
+
+
+class ShardedScorer:
+    """Misma interfaz que ``InferenceEngine`` (``classes``, ``predict_with_proba``)."""
+
+    def __init__(self, model_path, n_workers=None, engine=None,
+                 min_shard_rows=DEFAULT_MIN_SHARD_ROWS, mmap_mode='r', start_method=None):
+        self.model_path = model_path
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.engine = engine or InferenceEngine(joblib.load(model_path, mmap_mode=mmap_mode))
+        self.classes = self.engine.classes
+        self.min_shard_rows = min_shard_rows
+        self.mmap_mode = mmap_mode
+        self.start_method = start_method
+        self._executor = None
+
+    @property
+    def explainer(self):
+        # se construye en este proceso (con fork lo heredan los workers creados después)
+        return self.engine.explainer
+
+    def _get_executor(self):
+        global _worker_engine
+        if self._executor is None:
+            ctx = mp_context(self.start_method)
+            if ctx.get_start_method() == 'fork':
+                _worker_engine = self.engine
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.n_workers, mp_context=ctx,
+                initializer=_init_shard_worker, initargs=(self.model_path, self.mmap_mode),
+            )
+        return self._executor
+
+    def predict_with_proba(self, df, prepared=False, explain=0):
+        """Puntúa ``df`` repartiendo fragmentos de al menos ``min_shard_rows`` filas.
+
+        Lotes pequeños (o ``n_workers == 1``) se puntúan en el proceso actual.
+        En ``timings`` cada etapa es la suma de CPU de los fragmentos y
+        ``total`` el tiempo de pared.
+        """
+        n_shards = min(self.n_workers, len(df) // self.min_shard_rows)
+        if n_shards <= 1:
+            return self.engine.predict_with_proba(df, prepared=prepared, explain=explain)
+
+        t0 = time.perf_counter()
+        bounds = np.linspace(0, len(df), n_shards + 1).astype(int)
+        shards = [df.iloc[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        results = list(self._get_executor().map(_score_shard, shards, [explain] * n_shards))
+
+        labels = np.concatenate([r[0] for r in results])
+        probs = np.vstack([r[1] for r in results])
+        timings = {stage: sum(r[2].get(stage, 0.0) for r in results) for stage in STAGES}
+        if not explain:
+            del timings['explain']
+        timings['total'] = time.perf_counter() - t0
+        timings['shards'] = n_shards
+        explanation = concat_explanations([r[3] for r in results]) if explain else None
+        return InferenceResult(labels, probs, timings, explanation)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -0,0 +1,59 @@
+// Historial paginado: filtros + "Cargar más" sobre /api/history (cursor por keyset)
+const historyRows = document.getElementById('historyRows');
+const loadMoreButton = document.getElementById('loadMore');
+const filtersForm = document.getElementById('historyFilters');
+
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value == null ? '' : String(value);
+    return div.innerHTML;
+}
+
+function renderRow(pred) {
+    const prob = (pred.probabilities[pred.prediction] || 0) * 100;
+    const badge = pred.prediction === 'Completed' ? 'success' : 'warning';
+    return `
+        <tr>
+            <td>${pred.id}</td>
+            <td>${escapeHtml(pred.timestamp)}</td>
+            <td>${escapeHtml(pred.vehicle_type)}</td>
+            <td>${escapeHtml(pred.pickup_location)} → ${escapeHtml(pred.drop_location)}</td>
+            <td><span class="badge bg-${badge}">${escapeHtml(pred.prediction)}</span></td>
+            <td>${prob.toFixed(2)}%</td>
+        </tr>
+    `;
+}
+
+async function loadHistory(cursor) {
+    const params = new URLSearchParams(new FormData(filtersForm));
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    try {
+        const response = await fetch('/api/history?' + params.toString());
+        const result = await response.json();
+        if (!result.success) {
+            alert('Error: ' + result.error);
+            return;
+        }
+        const html = result.items.map(renderRow).join('');
+        if (cursor) {
+            historyRows.insertAdjacentHTML('beforeend', html);
+        } else {
+            historyRows.innerHTML = html;
+        }
+        loadMoreButton.dataset.cursor = result.next_cursor || '';
+        loadMoreButton.style.display = result.next_cursor ? 'block' : 'none';
+    } catch (error) {
+        alert('Error al cargar el historial: ' + error);
+    }
+}
+
+filtersForm.addEventListener('submit', (e) => {
+    e.preventDefault();
+    loadHistory(null);
+});
+
+loadMoreButton.addEventListener('click', () => {
+    loadHistory(loadMoreButton.dataset.cursor);
+});
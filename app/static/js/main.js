@@ -38,7 +38,7 @@ document.getElementById('predictionForm').addEventListener('submit', async (e) =
     }
 });
 
-// Predicción por lotes
+// Predicción por lotes: se encola el archivo y se consulta el progreso del trabajo
 document.getElementById('batchForm').addEventListener('submit', async (e) => {
     e.preventDefault();
     
@@ -55,17 +55,7 @@ document.getElementById('batchForm').addEventListener('submit', async (e) => {
         const data = await response.json();
         
         if (data.success) {
-            const downloadUrl = data.report?.download_url || `/download_predictions/${data.report?.saved_file}`;
-            // mostrar enlace o forzar descarga
-            const linkEl = document.getElementById('download-link');
-            if (linkEl) {
-                linkEl.href = downloadUrl;
-                linkEl.style.display = 'inline';
-                linkEl.textContent = 'Descargar predicciones';
-            } else {
-                // forzar descarga
-                window.location = downloadUrl;
-            }
+            pollBatchJob(data.status_url);
         } else {
             alert('Error: ' + data.error);
         }
@@ -74,6 +64,43 @@ document.getElementById('batchForm').addEventListener('submit', async (e) => {
     }
 });
 
+async function pollBatchJob(statusUrl) {
+    const progressBox = document.getElementById('batchProgress');
+    const bar = document.getElementById('batchProgressBar');
+    const text = document.getElementById('batchProgressText');
+    const linkEl = document.getElementById('download-link');
+    progressBox.style.display = 'block';
+    linkEl.style.display = 'none';
+
+    try {
+        const response = await fetch(statusUrl);
+        const job = await response.json();
+
+        if (!job.success || job.status === 'failed') {
+            text.textContent = 'Error: ' + (job.error || 'trabajo fallido');
+            return;
+        }
+
+        const pct = job.total_rows ? Math.min(100, (job.rows_processed / job.total_rows) * 100) : 0;
+        bar.style.width = `${pct.toFixed(1)}%`;
+        let msg = `${job.status}: ${job.rows_processed}${job.total_rows ? ' / ' + job.total_rows : ''} filas`;
+        if (job.throughput_rows_per_sec) msg += ` · ${Math.round(job.throughput_rows_per_sec)} filas/s`;
+        if (job.eta_seconds != null) msg += ` · ETA ${Math.ceil(job.eta_seconds)} s`;
+        text.textContent = msg;
+
+        if (job.status === 'done') {
+            bar.style.width = '100%';
+            linkEl.href = job.download_url;
+            linkEl.style.display = 'inline';
+            linkEl.textContent = 'Descargar predicciones';
+            return;
+        }
+        setTimeout(() => pollBatchJob(statusUrl), 1000);
+    } catch (error) {
+        text.textContent = 'Error al consultar el trabajo: ' + error;
+    }
+}
+
 function displayResult(result) {
     const resultCard = document.getElementById('resultCard');
     const predictionResult = document.getElementById('predictionResult');
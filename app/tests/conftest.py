@@ -0,0 +1,31 @@
+"""Fixtures compartidas: un pipeline pequeño entrenado sobre viajes sintéticos.
+
+Los tests no dependen de ``models/``: el pipeline (``RidePreprocessor`` +
+``RandomForestClassifier``) se entrena una vez por sesión sobre
+``benchmarks.synthetic``, con la misma estructura que publica ``train.py``.
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from benchmarks.synthetic import make_predictions, make_rides
+from preprocessing import RidePreprocessor, prepare_features
+
+
+@pytest.fixture(scope='session')
+def rides():
+    return make_rides(3000, seed=11)
+
+
+@pytest.fixture(scope='session')
+def pipeline(rides):
+    labels, _, _ = make_predictions(len(rides), seed=11)
+    # etiquetas ligadas a las entradas para que los árboles tengan cortes con sentido
+    labels = np.where(rides['avg_vtat'] > 15, 'No Driver Found', labels)
+    model = Pipeline([
+        ('prep', RidePreprocessor(date_col='date', time_col='time', min_cat_freq=0.01)),
+        ('model', RandomForestClassifier(n_estimators=15, max_depth=12, random_state=0, n_jobs=1)),
+    ])
+    model.fit(prepare_features(rides), labels)
+    return model
@@ -0,0 +1,105 @@
+"""Arranque documentado (``python app.py``) con pools de procesos activos.
+
+Los procesos de los pools reimportan el script principal como ``__mp_main__``;
+ni los workers de trabajos ni los de ``ShardedScorer`` deben volver a crear el
+registro del modelo (se vería un segundo "Model ... ready" en el log).
+"""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import joblib
+import pytest
+
+from benchmarks.synthetic import make_rides
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _request(url, data=None, headers=None, timeout=60):
+    req = urllib.request.Request(url, data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _upload(url, filename, content):
+    boundary = 'smoke-boundary'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+            f'Content-Type: text/csv\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return _request(url, body, {'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+
+@pytest.fixture
+def server(pipeline, tmp_path):
+    models = tmp_path / 'models'
+    models.mkdir()
+    joblib.dump(pipeline, models / 'booking_status_rf_model-1.joblib')
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), FLASK_DEBUG='0', PYTHONUNBUFFERED='1', MODEL_DIR=str(models),
+               MODEL_LOAD='eager', MODEL_WARMUP_PATH='', MODEL_WATCH_INTERVAL='0.2', BATCH_JOB_WORKERS='1',
+               SCORING_WORKERS='2', INPUT_VALIDATION='off')
+    env.pop('MP_START_METHOD', None)
+    log_path = tmp_path / 'app.log'
+    with open(log_path, 'w') as log:
+        # sesión propia: al final se termina el grupo completo (pools incluidos)
+        proc = subprocess.Popen([sys.executable, os.path.join(APP_DIR, 'app.py')], cwd=tmp_path, env=env,
+                                stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            assert proc.poll() is None, log_path.read_text()
+            try:
+                if _request(base + '/ready', timeout=2)[0] == 200:
+                    break
+            except OSError:
+                pass
+            assert time.monotonic() < deadline, log_path.read_text()
+            time.sleep(0.2)
+        yield base, log_path
+    finally:
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+
+
+def test_pool_workers_do_not_restart_the_app(server, tmp_path):
+    base, log_path = server
+    # 4000 filas: dos fragmentos de 2000 para los dos procesos de scoring
+    content = make_rides(4000, seed=7).to_csv(index=False).encode()
+
+    status, body = _upload(base + '/batch_predict?sync=1', 'rides.csv', content)
+    assert status == 200, body
+    assert body['report']['total'] == 4000
+
+    status, body = _upload(base + '/batch_predict?chunksize=4000', 'rides.csv', content)
+    assert status == 202, body
+    deadline = time.monotonic() + 60
+    while True:
+        status, job = _request(base + body['status_url'])
+        if job['status'] in ('done', 'failed'):
+            break
+        assert time.monotonic() < deadline, job
+        time.sleep(0.2)
+    assert job['status'] == 'done', job['error']
+    assert job['rows_processed'] == 4000
+
+    # un registro por proceso web: ni el worker del trabajo, ni su pool anidado,
+    # ni los workers de ShardedScorer cargan el modelo por segunda vez
+    time.sleep(0.5)
+    log = log_path.read_text()
+    assert log.count(' ready in ') == 1, log
@@ -0,0 +1,80 @@
+"""Micro-batching de ``RequestCoalescer``: resultados, plazos y fallos del hilo de fondo."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from coalescer import RequestCoalescer, CoalescerTimeout
+from inference import InferenceEngine
+
+
+class GatedEngine:
+    """Motor falso que no puntúa hasta que se abre ``gate``."""
+
+    def __init__(self, engine, gate):
+        self.engine = engine
+        self.gate = gate
+
+    def predict_with_proba(self, df):
+        self.gate.wait()
+        return self.engine.predict_with_proba(df)
+
+
+class ExitingEngine:
+    """Motor falso cuya primera llamada mata el hilo que lo usa."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.calls = 0
+
+    def predict_with_proba(self, df):
+        self.calls += 1
+        if self.calls == 1:
+            raise SystemExit
+        return self.engine.predict_with_proba(df)
+
+
+@pytest.fixture
+def engine(pipeline):
+    return InferenceEngine(pipeline)
+
+
+def test_concurrent_requests_match_engine(engine, rides):
+    coalescer = RequestCoalescer(engine, max_wait_ms=20, max_batch_size=16)
+    rows = [rides.iloc[[i]].reset_index(drop=True) for i in range(32)]
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(coalescer.predict_with_proba, rows))
+    expected = engine.predict_with_proba(rides.iloc[:32])
+    np.testing.assert_array_equal(np.concatenate([r.labels for r in results]), expected.labels)
+    np.testing.assert_allclose(np.vstack([r.probabilities for r in results]), expected.probabilities, atol=1e-12)
+    assert coalescer.stats()['batches'] < 32
+
+
+def test_unexpected_error_fails_request_instead_of_hanging(engine, rides):
+    coalescer = RequestCoalescer(engine, max_wait_ms=1, timeout_ms=5000)
+    # len(None) falla en el hilo de fondo antes de puntuar
+    with pytest.raises(TypeError):
+        coalescer.predict_with_proba(None)
+    result = coalescer.predict_with_proba(rides.iloc[:1])
+    assert len(result.labels) == 1
+
+
+def test_timeout_raises_and_cancels(engine, rides):
+    gate = threading.Event()
+    coalescer = RequestCoalescer(GatedEngine(engine, gate), max_wait_ms=1, timeout_ms=50)
+    with pytest.raises(CoalescerTimeout):
+        coalescer.predict_with_proba(rides.iloc[:1])
+    gate.set()
+    assert coalescer.predict_with_proba(rides.iloc[:1], timeout=5).labels.shape == (1,)
+    assert coalescer.stats()['timeouts'] == 1
+
+
+def test_dead_thread_is_restarted(engine, rides):
+    coalescer = RequestCoalescer(ExitingEngine(engine), max_wait_ms=1, timeout_ms=200)
+    with pytest.raises(CoalescerTimeout):
+        coalescer.predict_with_proba(rides.iloc[:1])
+    coalescer._thread.join(5)
+    result = coalescer.predict_with_proba(rides.iloc[:2], timeout=5)
+    assert len(result.labels) == 2
+    assert coalescer.stats()['thread_restarts'] == 1
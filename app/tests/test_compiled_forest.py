@@ -0,0 +1,136 @@
+"""Paridad de ``CompiledForest.predict_proba`` con ``predict_proba`` de sklearn."""
+import joblib
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+
+from compiled_forest import check_parity, compile_forest, compile_pipeline, load_compiled
+from incremental import Member, RollingForest
+from preprocessing import prepare_features
+
+ATOL = 1e-12
+
+
+def _forest(X, y, **kwargs):
+    params = dict(n_estimators=10, random_state=0, n_jobs=1)
+    params.update(kwargs)
+    return RandomForestClassifier(**params).fit(X, y)
+
+
+@pytest.fixture(scope='module')
+def dense_data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(600, 8))
+    y = np.where(X[:, 0] + X[:, 3] > 0.5, 'a', np.where(X[:, 1] > 0, 'b', 'c'))
+    return X, y
+
+
+def test_random_dense_input(dense_data):
+    X, y = dense_data
+    forest = _forest(X, y)
+    compiled = compile_forest(forest)
+    X_new = np.random.default_rng(1).normal(size=(1000, X.shape[1])) * 2
+    np.testing.assert_allclose(compiled.predict_proba(X_new), forest.predict_proba(X_new), rtol=0, atol=ATOL)
+    np.testing.assert_array_equal(compiled.predict(X_new), forest.predict(X_new))
+
+
+def test_sparse_one_hot_input():
+    rng = np.random.default_rng(3)
+    # dos numéricas y tres categóricas one-hot (4 + 6 + 3 columnas), como la salida del preprocesado
+    def one_hot(n):
+        blocks = [rng.normal(size=(n, 2))]
+        for width in (4, 6, 3):
+            blocks.append(np.eye(width)[rng.integers(0, width, n)])
+        return sparse.csr_matrix(np.hstack(blocks))
+    X = one_hot(800)
+    y = np.where(X[:, 2].toarray().ravel() + X[:, 7].toarray().ravel() > 0, 'a',
+                 np.where(X[:, 0].toarray().ravel() > 0, 'b', 'c'))
+    forest = _forest(X, y)
+    compiled = compile_forest(forest)
+    X_new = one_hot(1000)
+    np.testing.assert_allclose(compiled.predict_proba(X_new), forest.predict_proba(X_new), rtol=0, atol=ATOL)
+
+
+def test_pipeline_parity(pipeline, rides):
+    X = pipeline[:-1].transform(prepare_features(rides))
+    compiled = compile_forest(pipeline[-1])
+    for matrix in (X, sparse.csr_matrix(X)):
+        np.testing.assert_allclose(compiled.predict_proba(matrix), pipeline[-1].predict_proba(matrix),
+                                   rtol=0, atol=ATOL)
+    # el pipeline completo, de DataFrame a probabilidades
+    assert check_parity(pipeline, compile_pipeline(pipeline), rides.iloc[:500], atol=ATOL) <= ATOL
+
+
+def _threshold_rows(forest, n_features, offset=0.0):
+    """Una fila por nodo interno con la característica del corte exactamente en (o junto a) su umbral."""
+    rows = []
+    base = np.zeros(n_features)
+    for est in forest.estimators_:
+        tree = est.tree_
+        inner = np.flatnonzero(tree.children_left != -1)
+        for node in inner:
+            row = base.copy()
+            row[tree.feature[node]] = tree.threshold[node] + offset
+            rows.append(row)
+    return np.asarray(rows)
+
+
+def test_values_on_thresholds(dense_data):
+    X, y = dense_data
+    forest = _forest(X, y)
+    compiled = compile_forest(forest)
+    # umbral redondeado a float32: el caso en que "<=" decide la rama
+    on = _threshold_rows(forest, X.shape[1]).astype(np.float32)
+    np.testing.assert_allclose(compiled.predict_proba(on), forest.predict_proba(on), rtol=0, atol=ATOL)
+    just_above = np.nextafter(on, np.float32(np.inf))
+    np.testing.assert_allclose(compiled.predict_proba(just_above), forest.predict_proba(just_above),
+                               rtol=0, atol=ATOL)
+
+
+def test_float32_rounding(dense_data):
+    X, y = dense_data
+    forest = _forest(X, y)
+    compiled = compile_forest(forest)
+    # diferencias por debajo de la precisión de float32: sklearn las pierde al convertir la entrada
+    for offset in (1e-9, -1e-9, 1e-12):
+        X_new = _threshold_rows(forest, X.shape[1], offset)
+        np.testing.assert_allclose(compiled.predict_proba(X_new), forest.predict_proba(X_new), rtol=0, atol=ATOL)
+
+
+def test_fit_is_not_supported(dense_data):
+    X, y = dense_data
+    with pytest.raises(TypeError, match="solo de inferencia"):
+        compile_forest(_forest(X, y)).fit(X, y)
+
+
+def test_float32_leaf_probabilities(dense_data):
+    X, y = dense_data
+    forest = _forest(X, y)
+    compiled = compile_forest(forest, leaf_dtype=np.float32)
+    np.testing.assert_allclose(compiled.predict_proba(X), forest.predict_proba(X), rtol=0, atol=1e-6)
+
+
+def test_rolling_forest_members_of_different_widths(dense_data):
+    X, y = dense_data
+    # el miembro antiguo ve solo las 5 primeras columnas y no conoce la clase 'c'
+    old_rows = y != 'c'
+    old = _forest(X[old_rows, :5], y[old_rows], n_estimators=6)
+    new = _forest(X, y, n_estimators=4, random_state=1)
+    rolling = RollingForest([Member(old, 0.0, int(old_rows.sum()), 5), Member(new, 1.0, len(X), X.shape[1])])
+    compiled = compile_forest(rolling)
+    assert compiled.n_estimators == 10
+    np.testing.assert_array_equal(compiled.classes_, rolling.classes_)
+    X_new = np.random.default_rng(2).normal(size=(500, X.shape[1]))
+    np.testing.assert_allclose(compiled.predict_proba(X_new), rolling.predict_proba(X_new), rtol=0, atol=ATOL)
+    with pytest.raises(TypeError, match="update_pipeline"):
+        rolling.fit(X, y)
+
+
+def test_mmap_loaded_artifact(pipeline, rides, tmp_path):
+    path = tmp_path / 'model.compiled.joblib'
+    joblib.dump(compile_pipeline(pipeline), path)
+    loaded = load_compiled(str(path))
+    forest = loaded[-1]
+    assert isinstance(forest.threshold, np.memmap) and isinstance(forest.leaf_proba, np.memmap)
+    assert check_parity(pipeline, loaded, rides, atol=ATOL) <= ATOL
@@ -0,0 +1,65 @@
+"""Lectura de Parquet/Feather en ``score_stream``: columnas diccionario y reprocesar la propia salida."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch import score_stream
+from formats import iter_chunks
+from inference import InferenceEngine
+from validation import InputValidator
+
+CATEGORICAL = ['vehicle_type', 'pickup_location', 'drop_location', 'payment_method', 'day', 'month']
+
+
+@pytest.fixture(scope='module')
+def engine(pipeline):
+    return InferenceEngine(pipeline)
+
+
+@pytest.fixture(scope='module')
+def sample(rides):
+    df = rides.iloc[:400].reset_index(drop=True)
+    # categorías raras que el modelo agrupa en "Other"
+    df.loc[:4, 'pickup_location'] = 'Nowhere'
+    return df
+
+
+def _read(path, fmt):
+    return pd.concat(iter_chunks(str(path), fmt, 1000), ignore_index=True)
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'feather'])
+def test_dictionary_columns_read_as_text(sample, tmp_path, fmt):
+    path = tmp_path / f'in.{fmt}'
+    frame = sample.astype({c: 'category' for c in CATEGORICAL})
+    frame.to_parquet(path) if fmt == 'parquet' else frame.to_feather(path)
+    df = _read(path, fmt)
+    assert all(df[c].dtype == object for c in CATEGORICAL)
+
+
+@pytest.mark.parametrize('with_validator', [False, True])
+def test_categorical_parquet_scores_like_csv(engine, sample, tmp_path, with_validator):
+    validator = InputValidator.from_pipeline(engine.pipeline, unknown_categories='allow') if with_validator else None
+    sample.to_csv(tmp_path / 'in.csv', index=False)
+    sample.astype({c: 'category' for c in CATEGORICAL}).to_parquet(tmp_path / 'in.parquet')
+
+    score_stream(str(tmp_path / 'in.csv'), str(tmp_path / 'out.csv'), engine, chunksize=150,
+                 input_format='csv', validator=validator)
+    score_stream(str(tmp_path / 'in.parquet'), str(tmp_path / 'out.parquet'), engine, chunksize=150,
+                 input_format='parquet', validator=validator)
+    expected = pd.read_csv(tmp_path / 'out.csv')
+    got = _read(tmp_path / 'out.parquet', 'parquet')
+    np.testing.assert_array_equal(got['prediction'].to_numpy(), expected['prediction'].to_numpy())
+
+
+@pytest.mark.parametrize('fmt', ['parquet', 'feather'])
+def test_output_can_be_scored_again(engine, sample, tmp_path, fmt):
+    ext = 'arrow' if fmt == 'feather' else fmt
+    sample.to_csv(tmp_path / 'in.csv', index=False)
+    first = score_stream(str(tmp_path / 'in.csv'), str(tmp_path / f'out.{ext}'), engine, chunksize=150,
+                         input_format='csv', output_format=fmt)
+    # ArrowResultWriter escribe el texto como diccionario: la salida debe poder volver a entrar
+    second = score_stream(str(tmp_path / f'out.{ext}'), str(tmp_path / f'again.{ext}'), engine, chunksize=150,
+                          input_format=fmt)
+    assert second.total == first.total == len(sample)
+    assert second.to_dict()['counts'] == first.to_dict()['counts']
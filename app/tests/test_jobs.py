@@ -0,0 +1,69 @@
+"""Trabajos por lotes en el pool de procesos de ``JobManager``."""
+import threading
+import time
+
+import joblib
+import numpy as np
+import pytest
+
+import jobs
+from benchmarks.synthetic import make_rides
+from database import Database
+from inference import InferenceEngine
+from jobs import JobManager
+from sharded import ShardedScorer
+from validation import InputValidator
+
+
+def _wait(manager, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.status(job_id)
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.1)
+    raise TimeoutError(f"el trabajo {job_id} no terminó en {timeout}s")
+
+
+def _worker_state():
+    return threading.active_count(), jobs._engine.start_method
+
+
+@pytest.mark.parametrize('scoring_workers', [1, 2])
+def test_job_runs_and_pool_shuts_down(pipeline, tmp_path, scoring_workers):
+    model_path = str(tmp_path / 'model.joblib')
+    joblib.dump(pipeline, model_path)
+    # dos fragmentos de 2000 filas: con scoring_workers=2 el trabajo usa el pool anidado
+    make_rides(4000, seed=5).to_csv(tmp_path / 'in.csv', index=False)
+    manager = JobManager(Database(str(tmp_path / 'p.db')), max_workers=1, scoring_workers=scoring_workers)
+    # con forkserver el validador viaja serializado en los initargs del pool
+    manager.set_model(model_path, InferenceEngine(pipeline), 'v1', validator=InputValidator.from_pipeline(pipeline))
+    if scoring_workers > 1:
+        # recién iniciado, el worker solo tiene su hilo principal y el pool anidado usa fork
+        assert manager._get_executor().submit(_worker_state).result(30) == (1, 'fork')
+    manager.submit('job', str(tmp_path / 'in.csv'), str(tmp_path / 'out.csv'), chunksize=4000)
+    status = _wait(manager, 'job')
+    assert status['status'] == 'done', status['error']
+    assert status['rows_processed'] == 4000
+
+    # el worker debe poder terminar aunque haya creado su propio pool de scoring
+    closer = threading.Thread(target=manager.shutdown, daemon=True)
+    closer.start()
+    closer.join(30)
+    assert not closer.is_alive(), "JobManager.shutdown() no terminó"
+
+
+@pytest.mark.parametrize('start_method', ['forkserver', 'fork'])
+def test_sharded_scorer_matches_engine(pipeline, tmp_path, start_method):
+    model_path = str(tmp_path / 'model.joblib')
+    joblib.dump(pipeline, model_path)
+    df = make_rides(4000, seed=6)
+    expected = InferenceEngine(pipeline).predict_with_proba(df)
+    scorer = ShardedScorer(model_path, 2, min_shard_rows=1000, start_method=start_method)
+    try:
+        result = scorer.predict_with_proba(df)
+    finally:
+        scorer.shutdown()
+    assert result.timings['shards'] == 2
+    np.testing.assert_array_equal(result.labels, expected.labels)
+    np.testing.assert_allclose(result.probabilities, expected.probabilities, atol=1e-12)
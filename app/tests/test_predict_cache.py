@@ -0,0 +1,58 @@
+"""Caché de ``/predict``: un acierto no puede saltarse la validación de la entrada."""
+import importlib
+import os
+import sys
+
+import joblib
+import pytest
+
+
+@pytest.fixture(scope='module')
+def client(pipeline, tmp_path_factory):
+    root = tmp_path_factory.mktemp('predict_cache')
+    models = root / 'models'
+    models.mkdir()
+    joblib.dump(pipeline, models / 'booking_status_rf_model-1.joblib')
+    env = {'MODEL_DIR': str(models), 'MODEL_LOAD': 'eager', 'MODEL_WARMUP_PATH': '', 'MODEL_WATCH_INTERVAL': '0',
+           'INPUT_VALIDATION': 'strict', 'PREDICT_CACHE': '1', 'PREDICT_CACHE_ROUND_DIGITS': '0'}
+    saved_env = {k: os.environ.get(k) for k in env}
+    cwd = os.getcwd()
+    # app.py abre predictions.db y uploads/ en el directorio actual
+    os.chdir(root)
+    os.environ.update(env)
+    try:
+        sys.modules.pop('app', None)
+        appmod = importlib.import_module('app')
+        appmod.registry.get(timeout=30)
+        yield appmod.app.test_client()
+        appmod.jobs.shutdown()
+    finally:
+        sys.modules.pop('app', None)
+        os.chdir(cwd)
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def _payload(rides, **overrides):
+    payload = rides.iloc[0].to_dict()
+    payload.update(overrides)
+    return payload
+
+
+def test_cache_hit_for_equivalent_payload(client, rides):
+    first = client.post('/predict', json=_payload(rides, driver_ratings=4.6))
+    assert first.status_code == 200 and not first.get_json()['cached']
+    # 4.6 y 4.8 redondean a la misma clave con PREDICT_CACHE_ROUND_DIGITS=0
+    second = client.post('/predict', json=_payload(rides, driver_ratings=4.8))
+    assert second.status_code == 200 and second.get_json()['cached']
+
+
+def test_out_of_range_value_is_rejected_even_if_key_is_cached(client, rides):
+    assert client.post('/predict', json=_payload(rides, driver_ratings=4.6)).status_code == 200
+    # 5.4 redondea a 5, la misma clave que 4.6, pero está fuera del rango 1-5
+    response = client.post('/predict', json=_payload(rides, driver_ratings=5.4))
+    assert response.status_code == 400
+    assert any('driver_ratings' in reason for reason in response.get_json()['errors'])
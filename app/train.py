@@ -0,0 +1,500 @@
+"""Entrenamiento del modelo de estado de reserva desde la línea de comandos.
+
+Reproduce ``notebooks/002_Uber2024-Models.ipynb`` (limpieza, ``RidePreprocessor``,
+RandomForest, macro-F1 con ``StratifiedKFold``) sin Jupyter:
+
+    python train.py ../data/processed/UberdataResume.xlsx
+    python train.py rides.csv --grid '{"n_estimators": [200, 400], "min_samples_leaf": [1, 2]}'
+    python train.py rides.parquet --folds 0 --version 7 --compiled
+    python train.py new_rides.csv --incremental --trees 50 --max-age-days 90
+
+- El dataset se limpia una vez y se guarda en Parquet en ``--cache-dir``; las
+  ejecuciones siguientes lo leen de ahí (clave: ruta, mtime y tamaño).
+- Cada fold ajusta ``RidePreprocessor`` una sola vez y guarda las matrices ya
+  transformadas: todos los candidatos de la búsqueda entrenan sobre ellas.
+- Los pares (candidato, fold) se reparten entre núcleos con joblib; cada
+  bosque usa ``n_jobs=1`` para no sobresuscribir.
+- El artefacto se publica como ``models/<base>-<versión>.joblib`` (temporal +
+  rename, así que el servidor lo recoge en caliente) junto a
+  ``<base>-<versión>.manifest.json`` con tiempos, memoria y métricas.
+- ``--incremental`` no reentrena: añade al modelo publicado un bosque
+  entrenado solo con los datos nuevos (ver ``incremental.py``).
+
+Leer ``.xlsx`` requiere openpyxl (``pip install -r requirements-train.txt``); CSV y Parquet no.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report, f1_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+
+from preprocessing import RidePreprocessor
+
+TARGET = 'booking_status'
+# columnas con fuga de información (duplican el target), identificadores y texto libre
+DROP_COLUMNS = [
+    'cancelled_rides_by_customer', 'reason_for_cancelling_by_customer',
+    'cancelled_rides_by_driver', 'driver_cancellation_reason',
+    'incomplete_rides', 'incomplete_rides_reason',
+    'booking_id', 'customer_id', 'year', 'reason',
+]
+# numéricos con -1 como valor faltante
+NEG1_AS_NAN = ['avg_vtat', 'avg_ctat', 'driver_ratings', 'customer_rating']
+
+MIN_CAT_FREQ = 0.005
+RANDOM_STATE = 42
+SCORING = 'f1_macro'
+# configuración del notebook; la rejilla sobrescribe estos valores
+DEFAULT_PARAMS = {
+    'n_estimators': 400,
+    'max_depth': None,
+    'min_samples_split': 4,
+    'min_samples_leaf': 2,
+    'class_weight': 'balanced_subsample',
+}
+DEFAULT_GRID = {'min_samples_split': [2, 4], 'min_samples_leaf': [1, 2]}
+# sube si cambia clean(): invalida los Parquet y folds cacheados
+CACHE_VERSION = 1
+
+
+def to_snake(s):
+    return (str(s).strip()
+            .replace("(", "").replace(")", "")
+            .replace("/", " ").replace("-", " ").replace(".", " ")
+            .replace("%", "pct").replace("&", "and")
+            .replace("__", "_")
+            .lower()
+            .replace(" ", "_"))
+
+
+def read_raw(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xls'):
+        try:
+            return pd.read_excel(path)
+        except ImportError as e:
+            raise ImportError(f"Leer {path} requiere openpyxl (pip install -r requirements-train.txt); "
+                              f"también se puede convertir antes a CSV o Parquet") from e
+    if ext in ('.parquet', '.pq'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def clean(df):
+    """Misma limpieza que el notebook: nombres snake_case, fechas, columnas fuera y -1 -> NaN."""
+    df = df.copy()
+    df.columns = [to_snake(c) for c in df.columns]
+    if TARGET not in df:
+        raise ValueError(f"El dataset no tiene la columna objetivo {TARGET!r}")
+    if 'date' in df:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    if 'time' in df:
+        raw = df['time'].astype(str)
+        df['time'] = pd.to_datetime(raw, format='%H:%M:%S', errors='coerce')
+        if df['time'].isna().all():
+            df['time'] = pd.to_datetime(raw, format='%H:%M', errors='coerce')
+    df = df.drop(columns=[c for c in DROP_COLUMNS if c in df])
+    for c in NEG1_AS_NAN:
+        if c in df:
+            df[c] = df[c].replace(-1, np.nan)
+    df = df[df[TARGET].notna()].reset_index(drop=True)
+    df[TARGET] = df[TARGET].astype(str)
+    return df
+
+
+def _file_key(path, *extra):
+    st = os.stat(path)
+    raw = '|'.join(map(str, (os.path.abspath(path), st.st_mtime_ns, st.st_size, CACHE_VERSION) + extra))
+    return hashlib.blake2b(raw.encode(), digest_size=8).hexdigest()
+
+
+def _atomic_dump(obj, path):
+    tmp = path + '.tmp'
+    joblib.dump(obj, tmp)
+    os.replace(tmp, path)
+
+
+def load_dataset(path, cache_dir):
+    """DataFrame limpio; la primera vez lo convierte a Parquet en ``cache_dir``. Devuelve (df, ruta caché, acierto)."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(cache_dir, f"{stem}-{_file_key(path)}.parquet")
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path), cache_path, True
+    df = clean(read_raw(path))
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_parquet(cache_path + '.tmp', compression='zstd', index=False)
+    os.replace(cache_path + '.tmp', cache_path)
+    return df, cache_path, False
+
+
+def _fit_fold(X, y, train_idx, val_idx, min_cat_freq):
+    prep = RidePreprocessor(min_cat_freq=min_cat_freq).fit(X.iloc[train_idx], y.iloc[train_idx])
+    return (prep.transform(X.iloc[train_idx]), y.iloc[train_idx].to_numpy(),
+            prep.transform(X.iloc[val_idx]), y.iloc[val_idx].to_numpy())
+
+
+def fold_matrices(X, y, n_folds, min_cat_freq, cache_path=None, n_jobs=1):
+    """Matrices (X_train, y_train, X_val, y_val) por fold con el preprocesado ya ajustado.
+
+    Se calculan una vez por ejecución (y se reutilizan entre ejecuciones si se
+    da ``cache_path``) en lugar de una vez por candidato.
+    """
+    if cache_path and os.path.exists(cache_path):
+        return joblib.load(cache_path), True
+    cv = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=RANDOM_STATE)
+    folds = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(X, y, train_idx, val_idx, min_cat_freq) for train_idx, val_idx in cv.split(X, y))
+    if cache_path:
+        _atomic_dump(folds, cache_path)
+    return folds, False
+
+
+def _score_fold(params, X_train, y_train, X_val, y_val):
+    t0 = time.perf_counter()
+    model = RandomForestClassifier(**params, random_state=RANDOM_STATE, n_jobs=1).fit(X_train, y_train)
+    score = f1_score(y_val, model.predict(X_val), average='macro')
+    return score, time.perf_counter() - t0
+
+
+def search(folds, grid, n_jobs=-1):
+    """Evalúa cada candidato de la rejilla en todos los folds, en paralelo. Devuelve resultados ordenados."""
+    candidates = [{**DEFAULT_PARAMS, **params} for params in ParameterGrid(grid or {})]
+    tasks = [(i, fold) for i in range(len(candidates)) for fold in folds]
+    scores = Parallel(n_jobs=n_jobs)(delayed(_score_fold)(candidates[i], *fold) for i, fold in tasks)
+    results = []
+    for i, params in enumerate(candidates):
+        mine = [s for (j, _), s in zip(tasks, scores) if j == i]
+        values = np.array([s for s, _ in mine])
+        results.append({
+            'params': params,
+            'mean': float(values.mean()),
+            'std': float(values.std()),
+            'scores': values.tolist(),
+            'fit_seconds': float(sum(t for _, t in mine)),
+        })
+    return sorted(results, key=lambda r: -r['mean'])
+
+
+def next_version(models_dir, base_name):
+    """Siguiente entero tras la mayor versión numérica publicada en ``models_dir``."""
+    from model_registry import ModelRegistry
+    versions = [int(v) for v, _ in ModelRegistry(models_dir, base_name).artifacts() if v and v.isdigit()]
+    return str(max(versions, default=0) + 1)
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(1 << 20), b''):
+            h.update(buf)
+    return h.hexdigest()
+
+
+def _peak_rss_mb():
+    """Pico de memoria residente del proceso y de sus workers ya terminados (None fuera de Unix)."""
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+def _environment(n_jobs):
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'n_jobs': n_jobs,
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': __import__('sklearn').__version__,
+    }
+
+
+def evaluate(pipeline, X_test, y_test):
+    pred = pipeline.predict(X_test)
+    return {
+        SCORING: float(f1_score(y_test, pred, average='macro')),
+        'accuracy': float(accuracy_score(y_test, pred)),
+        'report': classification_report(y_test, pred, output_dict=True, zero_division=0),
+    }
+
+
+def _new_version(models_dir, base_name, version):
+    version = version or next_version(models_dir, base_name)
+    if os.path.exists(os.path.join(models_dir, f"{base_name}-{version}.joblib")):
+        raise FileExistsError(f"La versión {version} ya está publicada en {models_dir}; usa otra --version")
+    return version
+
+
+def _peak_after_workers():
+    # cerrar los workers de joblib para que su pico de memoria cuente en RUSAGE_CHILDREN
+    from joblib.externals.loky import get_reusable_executor
+    get_reusable_executor().shutdown(wait=True)
+    return _peak_rss_mb()
+
+
+def publish(pipeline, manifest, models_dir, base_name, version, compiled=False):
+    """Escribe artefacto(s) y manifiesto; el ``.joblib`` se renombra el último para que el registro lo vea completo."""
+    os.makedirs(models_dir, exist_ok=True)
+    path = os.path.join(models_dir, f"{base_name}-{version}.joblib")
+    if os.path.exists(path):
+        raise FileExistsError(f"{path} ya existe; usa otra --version")
+    # un temporal que no empieza por el nombre base: el registro lo ignora
+    tmp = os.path.join(models_dir, f".{base_name}-{version}.joblib.tmp")
+    joblib.dump(pipeline, tmp)
+    manifest['artifact'] = {'path': path, 'bytes': os.path.getsize(tmp), 'sha256': _sha256(tmp)}
+    if compiled:
+        from compiled_forest import compile_pipeline
+        compiled_path = os.path.join(models_dir, f"{base_name}-{version}.compiled.joblib")
+        _atomic_dump(compile_pipeline(pipeline), os.path.join(models_dir, f".{base_name}-{version}.compiled"))
+        os.replace(os.path.join(models_dir, f".{base_name}-{version}.compiled"), compiled_path)
+        manifest['artifact']['compiled_path'] = compiled_path
+    manifest_path = os.path.join(models_dir, f"{base_name}-{version}.manifest.json")
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    os.replace(tmp, path)
+    return path, manifest_path
+
+
+def train(data_path, models_dir='models', base_name='booking_status_rf_model', version=None,
+          cache_dir='.train_cache', folds=5, grid=None, n_jobs=-1, test_size=0.2,
+          min_cat_freq=MIN_CAT_FREQ, compiled=False):
+    version = _new_version(models_dir, base_name, version)
+    timings = {}
+    started = time.perf_counter()
+
+    t0 = time.perf_counter()
+    df, dataset_cache, dataset_hit = load_dataset(data_path, cache_dir)
+    timings['load'] = time.perf_counter() - t0
+    print(f"Dataset: {len(df)} rows ({'cache' if dataset_hit else 'converted to'} {dataset_cache}) "
+          f"in {timings['load']:.2f}s")
+
+    X, y = df.drop(columns=[TARGET]), df[TARGET]
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=RANDOM_STATE, stratify=y)
+
+    cv_info = None
+    best = dict(DEFAULT_PARAMS)
+    if folds > 1:
+        t0 = time.perf_counter()
+        key = _file_key(data_path, folds, min_cat_freq, test_size, RANDOM_STATE)
+        fold_data, folds_hit = fold_matrices(X_train, y_train, folds, min_cat_freq,
+                                             cache_path=os.path.join(cache_dir, f"folds-{key}.joblib"),
+                                             n_jobs=n_jobs)
+        timings['preprocess_folds'] = time.perf_counter() - t0
+        print(f"Preprocessed {folds} folds in {timings['preprocess_folds']:.2f}s"
+              f"{' (cache)' if folds_hit else ''}")
+
+        t0 = time.perf_counter()
+        results = search(fold_data, grid, n_jobs=n_jobs)
+        timings['search'] = time.perf_counter() - t0
+        print(f"Evaluated {len(results)} candidate(s) x {folds} folds in {timings['search']:.2f}s")
+        for r in results:
+            changed = {k: v for k, v in r['params'].items() if DEFAULT_PARAMS.get(k) != v or k in (grid or {})}
+            print(f"  {SCORING} {r['mean']:.4f} ± {r['std']:.4f}  {changed}")
+        best = results[0]['params']
+        cv_info = {'folds': folds, 'scoring': SCORING, 'folds_cache_hit': folds_hit, 'candidates': results}
+
+    t0 = time.perf_counter()
+    pipeline = Pipeline([
+        ('prep', RidePreprocessor(date_col='date', time_col='time', min_cat_freq=min_cat_freq)),
+        ('model', RandomForestClassifier(**best, random_state=RANDOM_STATE, n_jobs=n_jobs)),
+    ])
+    pipeline.fit(X_train, y_train)
+    timings['final_fit'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    test_metrics = evaluate(pipeline, X_test, y_test)
+    timings['evaluate'] = time.perf_counter() - t0
+    print(f"Test {SCORING} {test_metrics[SCORING]:.4f}, accuracy {test_metrics['accuracy']:.4f}")
+
+    peak, workers_peak = _peak_after_workers()
+
+    timings['total'] = time.perf_counter() - started
+    manifest = {
+        'version': version,
+        'mode': 'full',
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'command': sys.argv,
+        'dataset': {
+            'source': data_path,
+            'cache': dataset_cache,
+            'cache_hit': dataset_hit,
+            'rows': len(df),
+            'train_rows': len(X_train),
+            'test_rows': len(X_test),
+            'class_counts': y.value_counts().to_dict(),
+        },
+        'params': {**best, 'min_cat_freq': min_cat_freq, 'random_state': RANDOM_STATE},
+        'cv': cv_info,
+        'test': test_metrics,
+        'timings_seconds': timings,
+        'memory_mb': {'peak_rss': peak, 'workers_peak_rss': workers_peak},
+        'environment': _environment(n_jobs),
+    }
+    path, manifest_path = publish(pipeline, manifest, models_dir, base_name, version, compiled=compiled)
+    print(f"Saved {path} ({manifest['artifact']['bytes'] / 1e6:.1f} MB) and {manifest_path}; "
+          f"total {timings['total']:.1f}s, peak RSS {peak or 0:.0f} MB")
+    return manifest
+
+
+def _base_artifact(models_dir, base_name, base_path=None):
+    """``(versión, ruta)`` del modelo a actualizar: ``base_path`` o la versión más alta publicada."""
+    from model_registry import ModelRegistry
+    if base_path:
+        return None, base_path
+    artifacts = ModelRegistry(models_dir, base_name).artifacts()
+    if not artifacts:
+        raise FileNotFoundError(f"No hay ningún {base_name}*.joblib en {models_dir} que actualizar")
+    return artifacts[-1]
+
+
+def _trained_at(path):
+    """Fecha de entrenamiento del artefacto según su manifiesto, o su mtime si no lo tiene."""
+    manifest_path = path[:-len('.joblib')] + '.manifest.json'
+    try:
+        with open(manifest_path) as f:
+            return datetime.fromisoformat(json.load(f)['created_at']).timestamp()
+    except (OSError, KeyError, ValueError):
+        return os.path.getmtime(path)
+
+
+def update(data_path, models_dir='models', base_name='booking_status_rf_model', version=None, base_path=None,
+           cache_dir='.train_cache', n_estimators=None, max_members=None, max_age_days=None, n_jobs=-1,
+           test_size=0.2, compiled=False):
+    """Publica una versión nueva que añade al modelo publicado un bosque entrenado solo con ``data_path``.
+
+    Parte de los datos nuevos (``test_size``) se reserva para comparar el
+    modelo anterior y el actualizado; el manifiesto guarda ambas métricas.
+    """
+    from incremental import DEFAULT_MAX_MEMBERS, DEFAULT_TREES, update_pipeline
+
+    version = _new_version(models_dir, base_name, version)
+    base_version, base_path = _base_artifact(models_dir, base_name, base_path)
+    timings = {}
+    started = time.perf_counter()
+
+    t0 = time.perf_counter()
+    df, dataset_cache, dataset_hit = load_dataset(data_path, cache_dir)
+    pipeline = joblib.load(base_path)
+    timings['load'] = time.perf_counter() - t0
+    print(f"Base {base_path}; {len(df)} new rows in {timings['load']:.2f}s")
+
+    X, y = df.drop(columns=[TARGET]), df[TARGET]
+    X_test = y_test = None
+    if test_size:
+        # estratificar solo si todas las clases tienen al menos dos filas
+        stratify = y if y.value_counts().min() >= 2 else None
+        X, X_test, y, y_test = train_test_split(X, y, test_size=test_size, random_state=RANDOM_STATE,
+                                                stratify=stratify)
+    before = evaluate(pipeline, X_test, y_test) if X_test is not None else None
+
+    t0 = time.perf_counter()
+    pipeline, info = update_pipeline(
+        pipeline, X, y,
+        n_estimators=n_estimators or DEFAULT_TREES,
+        max_members=DEFAULT_MAX_MEMBERS if max_members is None else max_members,
+        max_age_days=max_age_days,
+        base_trained_at=_trained_at(base_path),
+        random_state=RANDOM_STATE + int(time.time()) % 100_000,
+        n_jobs=n_jobs,
+    )
+    timings['update'] = time.perf_counter() - t0
+    print(f"Added {info['trees_added']} trees on {info['rows']} rows in {timings['update']:.2f}s: "
+          f"{info['members']} member(s), {info['total_trees']} trees, {info['evicted']} evicted, "
+          f"new categories {info['added_categories'] or 'none'}")
+
+    after = None
+    if X_test is not None:
+        t0 = time.perf_counter()
+        after = evaluate(pipeline, X_test, y_test)
+        timings['evaluate'] = time.perf_counter() - t0
+        print(f"Held-out {SCORING}: {before[SCORING]:.4f} -> {after[SCORING]:.4f}, "
+              f"accuracy {before['accuracy']:.4f} -> {after['accuracy']:.4f}")
+
+    peak, workers_peak = _peak_after_workers()
+    timings['total'] = time.perf_counter() - started
+    manifest = {
+        'version': version,
+        'mode': 'incremental',
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'command': sys.argv,
+        'base': {'version': base_version, 'path': base_path},
+        'dataset': {
+            'source': data_path,
+            'cache': dataset_cache,
+            'cache_hit': dataset_hit,
+            'rows': len(df),
+            'train_rows': len(X),
+            'test_rows': 0 if X_test is None else len(X_test),
+            'class_counts': df[TARGET].value_counts().to_dict(),
+        },
+        'update': info,
+        'test': {'before': before, 'after': after},
+        'timings_seconds': timings,
+        'memory_mb': {'peak_rss': peak, 'workers_peak_rss': workers_peak},
+        'environment': _environment(n_jobs),
+    }
+    path, manifest_path = publish(pipeline, manifest, models_dir, base_name, version, compiled=compiled)
+    print(f"Saved {path} ({manifest['artifact']['bytes'] / 1e6:.1f} MB) and {manifest_path}; "
+          f"total {timings['total']:.1f}s")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entrena y publica una versión del modelo de estado de reserva")
+    parser.add_argument('data', help="dataset (.xlsx, .csv o .parquet) con la columna Booking Status")
+    parser.add_argument('--models-dir', default=os.environ.get('MODEL_DIR', 'models'))
+    parser.add_argument('--name', default=os.environ.get('MODEL_NAME', 'booking_status_rf_model'))
+    parser.add_argument('--version', help="por defecto, la siguiente versión numérica en --models-dir")
+    parser.add_argument('--cache-dir', default='.train_cache', help="Parquet del dataset y matrices por fold")
+    parser.add_argument('--folds', type=int, default=5, help="folds de validación cruzada (0 = sin CV ni búsqueda)")
+    parser.add_argument('--grid', default=json.dumps(DEFAULT_GRID),
+                        help="rejilla JSON (texto o ruta) sobre los parámetros del RandomForest; '{}' = solo los del notebook")
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--min-cat-freq', type=float, default=MIN_CAT_FREQ)
+    parser.add_argument('--compiled', action='store_true', help="publicar también el .compiled.joblib")
+    incremental = parser.add_argument_group("actualización incremental")
+    incremental.add_argument('--incremental', action='store_true',
+                             help="añadir árboles entrenados solo con DATA al modelo publicado en vez de reentrenar")
+    incremental.add_argument('--base', help="artefacto a actualizar (por defecto, la versión más alta)")
+    incremental.add_argument('--trees', type=int, help="árboles del bosque nuevo (por defecto 50)")
+    incremental.add_argument('--max-members', type=int, help="bosques que se conservan (por defecto 12)")
+    incremental.add_argument('--max-age-days', type=float, help="descartar bosques entrenados hace más días")
+    args = parser.parse_args()
+
+    if args.incremental:
+        update(args.data, models_dir=args.models_dir, base_name=args.name, version=args.version,
+               base_path=args.base, cache_dir=args.cache_dir, n_estimators=args.trees,
+               max_members=args.max_members, max_age_days=args.max_age_days, n_jobs=args.n_jobs,
+               test_size=args.test_size, compiled=args.compiled)
+        return
+
+    grid = args.grid
+    if os.path.exists(grid):
+        with open(grid) as f:
+            grid = f.read()
+    train(args.data, models_dir=args.models_dir, base_name=args.name, version=args.version,
+          cache_dir=args.cache_dir, folds=args.folds, grid=json.loads(grid), n_jobs=args.n_jobs,
+          test_size=args.test_size, min_cat_freq=args.min_cat_freq, compiled=args.compiled)
+
+
+if __name__ == '__main__':
+    main()
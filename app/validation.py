@@ -0,0 +1,231 @@
+"""Validación vectorizada de la entrada antes de inferir.
+
+``prepare_features`` convierte fechas y horas inválidas en NaT y rellena con
+NaN las columnas que faltan, y un texto en un campo numérico solo aparece
+como excepción de ``predict_proba`` que tumba todo el archivo. Aquí cada
+bloque se revisa columna a columna con operaciones de NumPy/pandas (sin
+bucles por fila):
+
+- columnas obligatorias presentes (si falta alguna se rechaza todo con ``SchemaError``)
+- ``date`` y ``time`` presentes y con formato válido
+- numéricos convertibles, finitos y dentro de ``NUMERIC_RANGES`` (vacío = se imputa, como en el entrenamiento)
+- categorías dentro del vocabulario del ``OneHotEncoder`` ajustado (más las
+  añadidas con ``RidePreprocessor.extend``); en columnas con categoría
+  ``Other`` cualquier valor es válido porque el modelo ya agrupa ahí lo raro
+
+Las filas válidas salen con fechas y numéricos ya convertidos (el
+``prepare_features`` posterior no repite el trabajo); las inválidas salen con
+su número de fila y los motivos.
+"""
+import warnings
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = 'date'
+TIME_COLUMN = 'time'
+TIME_FORMATS = ('%H:%M', '%H:%M:%S')
+# extremos incluidos; None = sin límite
+NUMERIC_RANGES = {
+    'avg_vtat': (0, None),
+    'avg_ctat': (0, None),
+    'booking_value': (0, None),
+    'ride_distance': (0, None),
+    'driver_ratings': (1, 5),
+    'customer_rating': (1, 5),
+}
+# categóricas que prepare_features deriva de la fecha si faltan
+DERIVED_CATEGORIES = {'day': lambda dates: dates.dt.day_name()}
+UNKNOWN_CATEGORY_POLICIES = ('reject', 'allow')
+
+
+class SchemaError(ValueError):
+    """Faltan columnas obligatorias: no hay ninguna fila que se pueda puntuar."""
+
+
+class ValidationError(ValueError):
+    """Una predicción individual no pasó la validación; ``reasons`` lista los motivos."""
+
+    def __init__(self, reasons):
+        super().__init__("Datos inválidos: " + "; ".join(reasons))
+        self.reasons = list(reasons)
+
+
+class ValidationResult(NamedTuple):
+    # filas válidas con tipos convertidos (entrada de la inferencia)
+    valid: pd.DataFrame
+    # filas rechazadas tal como llegaron, con row_number y reject_reason
+    rejected: pd.DataFrame
+    reason_counts: dict
+    # posiciones de las filas válidas en el bloque original
+    kept: np.ndarray
+
+
+def _parse_dates(values):
+    # ISO (YYYY-MM-DD) es el formato de los CSV y del formulario; el resto se infiere
+    dates = pd.to_datetime(values, format='ISO8601', errors='coerce')
+    retry = dates.isna()
+    if retry.any():
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            dates[retry] = pd.to_datetime(values[retry], errors='coerce')
+    return dates
+
+
+def _parse_times(values):
+    raw = values.astype(str)
+    times = pd.to_datetime(raw, format=TIME_FORMATS[0], errors='coerce')
+    for fmt in TIME_FORMATS[1:]:
+        retry = times.isna()
+        if retry.any():
+            times[retry] = pd.to_datetime(raw[retry], format=fmt, errors='coerce')
+    return times
+
+
+def _parse_distinct(values, parse):
+    """Aplica ``parse`` una vez por valor distinto (hay pocos días y minutos distintos) y expande."""
+    codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+    parsed = parse(pd.Series(uniques, dtype=object)).to_numpy(dtype='datetime64[ns]')
+    out = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    known = codes >= 0
+    out[known] = parsed[codes[known]]
+    return pd.Series(out, index=values.index)
+
+
+def _describe_range(low, high):
+    if high is None:
+        return f">= {low:g}"
+    if low is None:
+        return f"<= {high:g}"
+    return f"entre {low:g} y {high:g}"
+
+
+class InputValidator:
+    """Reglas de validación para un modelo concreto (ver ``from_pipeline``)."""
+
+    def __init__(self, categories=None, open_columns=(), numeric_ranges=None, unknown_categories='reject'):
+        if unknown_categories not in UNKNOWN_CATEGORY_POLICIES:
+            raise ValueError(f"unknown_categories debe ser uno de {UNKNOWN_CATEGORY_POLICIES}, "
+                             f"recibido: {unknown_categories}")
+        # columna -> pd.Index de categorías conocidas
+        self.categories = {c: pd.Index(list(v), dtype=object) for c, v in (categories or {}).items()}
+        # columnas donde el modelo agrupa los valores desconocidos en "Other"
+        self.open_columns = set(open_columns)
+        self.numeric_ranges = dict(NUMERIC_RANGES if numeric_ranges is None else numeric_ranges)
+        self.unknown_categories = unknown_categories
+
+    @classmethod
+    def from_pipeline(cls, pipeline, **kwargs):
+        """Vocabulario y columnas numéricas del ``RidePreprocessor`` ajustado de ``pipeline``."""
+        prep = pipeline[0]
+        cat_features = getattr(prep, 'cat_features_', None) or []
+        num_features = getattr(prep, 'num_features_', None)
+        categories, open_columns = {}, []
+        if cat_features:
+            onehot = prep.column_transformer.named_transformers_['cat']['onehot']
+            added = getattr(prep.rare, 'added_categories_', None) or {}
+            for c, cats in zip(cat_features, onehot.categories_):
+                categories[c] = list(cats) + list(added.get(c, []))
+                if prep.rare.other_label in categories[c]:
+                    open_columns.append(c)
+        ranges = kwargs.pop('numeric_ranges', NUMERIC_RANGES)
+        if num_features is not None:
+            ranges = {c: r for c, r in ranges.items() if c in num_features}
+        return cls(categories, open_columns, ranges, **kwargs)
+
+    @property
+    def required_columns(self):
+        derived = set(DERIVED_CATEGORIES)
+        return [DATE_COLUMN, TIME_COLUMN] + list(self.numeric_ranges) + \
+            [c for c in self.categories if c not in derived]
+
+    def check_schema(self, df):
+        missing = [c for c in self.required_columns if c not in df.columns]
+        if missing:
+            raise SchemaError(f"Faltan columnas obligatorias: {', '.join(missing)}")
+
+    def validate(self, df, offset=0):
+        """Separa ``df`` en filas válidas (convertidas) y rechazadas.
+
+        ``offset`` es el número de filas de bloques anteriores: ``row_number``
+        de las rechazadas es la posición 1-based en el archivo completo.
+        """
+        self.check_schema(df)
+        n = len(df)
+        clean = df.copy(deep=False)
+        checks = []
+
+        dates = df[DATE_COLUMN]
+        if not pd.api.types.is_datetime64_any_dtype(dates.dtype):
+            dates = _parse_distinct(dates, _parse_dates)
+        checks.append((dates.isna().to_numpy(), f"{DATE_COLUMN}: fecha vacía o inválida"))
+        clean[DATE_COLUMN] = dates
+
+        times = df[TIME_COLUMN]
+        if not pd.api.types.is_datetime64_any_dtype(times.dtype):
+            times = _parse_distinct(times, _parse_times)
+        checks.append((times.isna().to_numpy(), f"{TIME_COLUMN}: hora vacía o inválida (HH:MM)"))
+        clean[TIME_COLUMN] = times
+
+        for c, (low, high) in self.numeric_ranges.items():
+            col = df[c]
+            if pd.api.types.is_numeric_dtype(col.dtype):
+                values = col.to_numpy(dtype=float, na_value=np.nan)
+                unparsable = np.zeros(n, dtype=bool)
+            else:
+                values = pd.to_numeric(col, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+                unparsable = np.isnan(values) & col.notna().to_numpy()
+            checks.append((unparsable | np.isinf(values), f"{c}: no numérico"))
+            out = np.zeros(n, dtype=bool)
+            if low is not None:
+                out |= values < low
+            if high is not None:
+                out |= values > high
+            checks.append((out, f"{c}: fuera de rango ({_describe_range(low, high)})"))
+            clean[c] = values
+
+        for c, known in self.categories.items():
+            if c not in df:
+                continue
+            col = df[c]
+            missing = col.isna().to_numpy()
+            if c in DERIVED_CATEGORIES:
+                if missing.any():
+                    clean[c] = col.where(~missing, DERIVED_CATEGORIES[c](dates))
+            else:
+                checks.append((missing, f"{c}: vacío"))
+            if c in self.open_columns or self.unknown_categories == 'allow':
+                continue
+            unknown = (known.get_indexer(col.to_numpy()) < 0) & ~missing
+            checks.append((unknown, f"{c}: categoría desconocida"))
+
+        bad = np.zeros(n, dtype=bool)
+        reason_counts = {}
+        for mask, reason in checks:
+            count = int(mask.sum())
+            if count:
+                bad |= mask
+                reason_counts[reason] = count
+        if not reason_counts:
+            return ValidationResult(clean, df.iloc[:0], {}, np.arange(n))
+
+        rows = np.flatnonzero(bad)
+        reasons = np.full(len(rows), '', dtype=object)
+        for mask, reason in checks:
+            hit = mask[rows]
+            if hit.any():
+                # solo se tocan las filas rechazadas
+                reasons[hit] = np.where(reasons[hit] == '', reason, reasons[hit] + '; ' + reason)
+        rejected = df.iloc[rows].copy()
+        rejected.insert(0, 'reject_reason', reasons)
+        rejected.insert(0, 'row_number', offset + rows + 1)
+        kept = np.flatnonzero(~bad)
+        return ValidationResult(clean.iloc[kept], rejected, reason_counts, kept)
+
+    def validate_one(self, df):
+        """Valida un DataFrame de una fila; lanza ``ValidationError`` con los motivos si no es válida."""
+        result = self.validate(df)
+        if result.reason_counts:
+            raise ValidationError(list(result.reason_counts))
+        return result.valid